@@ -0,0 +1,255 @@
+import os
+import sys
+import time
+import ctypes
+import subprocess
+from datetime import datetime, timedelta
+from pathlib import Path
+from PySide6.QtCore import QObject, QTimer, Signal
+
+from config_utils import get_admission_settings, write_log_file
+from jobs import get_executor, PRIORITY_BACKGROUND
+
+
+GAME_PROCESSES = {
+    "sims 4": ["TS4_x64.exe", "TS4_DX9_x64.exe", "TS4.exe"],
+    "sims 3": ["TS3W.exe", "TS3.exe"],
+    "sims medieval": ["TSM.exe"],
+    "mysims": ["MySims.exe"],
+    "mysims kingdom": ["MySimsKingdom.exe"],
+}
+
+RECHECK_MS = 60 * 1000
+SAMPLE_INTERVAL_S = 1.0
+PDH_FMT_DOUBLE = 0x00000200
+
+
+def read_disk_ticks(diskstats_path):
+    ticks = {}
+    with open(diskstats_path, "r", encoding="utf-8") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 13:
+                continue
+            name = fields[2]
+            if name.startswith(("loop", "ram", "dm-", "zram")):
+                continue
+            ticks[name] = int(fields[12])
+    return ticks
+
+
+def _pdh_counter_percent(path, interval):
+    class PDH_FMT_COUNTERVALUE(ctypes.Structure):
+        _fields_ = [("CStatus", ctypes.c_ulong), ("doubleValue", ctypes.c_double)]
+
+    try:
+        pdh = ctypes.windll.pdh
+    except OSError:
+        return None
+    query = ctypes.c_void_p()
+    counter = ctypes.c_void_p()
+    if pdh.PdhOpenQueryW(None, None, ctypes.byref(query)) != 0:
+        return None
+    try:
+        if pdh.PdhAddEnglishCounterW(query, path, None, ctypes.byref(counter)) != 0:
+            return None
+        if pdh.PdhCollectQueryData(query) != 0:
+            return None
+        time.sleep(interval)
+        if pdh.PdhCollectQueryData(query) != 0:
+            return None
+        value = PDH_FMT_COUNTERVALUE()
+        if pdh.PdhGetFormattedCounterValue(counter, PDH_FMT_DOUBLE, None, ctypes.byref(value)) != 0:
+            return None
+        return value.doubleValue
+    finally:
+        pdh.PdhCloseQuery(query)
+
+
+def disk_busy_percent(diskstats_path="/proc/diskstats", interval=SAMPLE_INTERVAL_S):
+    if sys.platform == "win32":
+        idle = _pdh_counter_percent(r"\PhysicalDisk(_Total)\% Idle Time", interval)
+        return None if idle is None else min(100.0, max(0.0, 100.0 - idle))
+    if not Path(diskstats_path).exists():
+        return None
+    try:
+        started, before = time.monotonic(), read_disk_ticks(diskstats_path)
+        time.sleep(interval)
+        now, after = time.monotonic(), read_disk_ticks(diskstats_path)
+    except (OSError, ValueError):
+        return None
+    elapsed_ms = (now - started) * 1000
+    if elapsed_ms <= 0:
+        return None
+    busy = [(after[name] - before[name]) / elapsed_ms * 100 for name in after if name in before]
+    return min(100.0, max(busy)) if busy else None
+
+
+def _windows_cpu_times():
+    class FILETIME(ctypes.Structure):
+        _fields_ = [("low", ctypes.c_ulong), ("high", ctypes.c_ulong)]
+
+    idle, kernel, user = FILETIME(), FILETIME(), FILETIME()
+    if not ctypes.windll.kernel32.GetSystemTimes(ctypes.byref(idle), ctypes.byref(kernel), ctypes.byref(user)):
+        return None
+    return [(t.high << 32) | t.low for t in (idle, kernel, user)]
+
+
+def cpu_load_percent(loadavg_path="/proc/loadavg", interval=SAMPLE_INTERVAL_S):
+    if sys.platform == "win32":
+        before = _windows_cpu_times()
+        time.sleep(interval)
+        after = _windows_cpu_times()
+        if before is None or after is None:
+            return None
+        idle, kernel, user = (a - b for a, b in zip(after, before))
+        total = kernel + user
+        return (total - idle) / total * 100 if total > 0 else None
+    try:
+        with open(loadavg_path, "r", encoding="utf-8") as f:
+            load = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        if not hasattr(os, "getloadavg"):
+            return None
+        try:
+            load = os.getloadavg()[0]
+        except OSError:
+            return None
+    return load / (os.cpu_count() or 1) * 100
+
+
+def _running_process_names():
+    if sys.platform == "win32":
+        try:
+            out = subprocess.run(
+                ["tasklist", "/FO", "CSV", "/NH"], capture_output=True, text=True,
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0), timeout=10
+            ).stdout
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return {line.split('","')[0].strip('"').lower() for line in out.splitlines() if line}
+    proc = Path("/proc")
+    if not proc.exists():
+        return None
+    names = set()
+    for entry in proc.iterdir():
+        if entry.name.isdigit():
+            try:
+                names.add((entry / "comm").read_text(encoding="utf-8").strip().lower())
+            except OSError:
+                continue
+    return names
+
+
+def game_process_running(process_names):
+    running = _running_process_names()
+    if running is None:
+        return None
+    wanted = {n.lower() for n in process_names}
+    wanted |= {n[:15] for n in wanted}
+    return bool(running & wanted)
+
+
+def user_idle_seconds():
+    if sys.platform != "win32":
+        return None
+
+    class LASTINPUTINFO(ctypes.Structure):
+        _fields_ = [("cbSize", ctypes.c_uint), ("dwTime", ctypes.c_uint)]
+
+    info = LASTINPUTINFO()
+    info.cbSize = ctypes.sizeof(info)
+    if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+        return None
+    millis = (ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF
+    return millis / 1000.0
+
+
+class AdmissionController:
+    def __init__(self, sources=None, settings=None):
+        self._settings = settings
+        self.sources = {
+            "disk_busy": disk_busy_percent,
+            "cpu_load": cpu_load_percent,
+            "game_running": lambda game: game_process_running(self.process_names(game)),
+            "idle_seconds": user_idle_seconds,
+        }
+        if sources:
+            self.sources.update(sources)
+
+    @property
+    def settings(self):
+        if self._settings is None:
+            return get_admission_settings()
+        return self._settings() if callable(self._settings) else self._settings
+
+    def process_names(self, game_name):
+        names = self.settings.get("game_processes")
+        if names:
+            return names
+        return GAME_PROCESSES.get(game_name.strip().lower(), [])
+
+    def check(self, game_name):
+        s = self.settings
+        running = self.sources["game_running"](game_name)
+        if running:
+            return False, f"{game_name} is running"
+        disk = self.sources["disk_busy"]()
+        if disk is not None and disk > s["max_disk_busy"]:
+            return False, f"disk busy {disk:.0f}%"
+        cpu = self.sources["cpu_load"]()
+        if cpu is not None and cpu > s["max_cpu_load"]:
+            return False, f"CPU load {cpu:.0f}%"
+        if s["min_idle_minutes"] > 0:
+            idle = self.sources["idle_seconds"]()
+            if idle is not None and idle < s["min_idle_minutes"] * 60:
+                return False, f"user active ({idle / 60:.0f} min idle)"
+        return True, "conditions favourable"
+
+
+class AdmissionGate(QObject):
+    admitted = Signal(str)
+
+    def __init__(self, controller=None, parent=None):
+        super().__init__(parent)
+        self.controller = controller or AdmissionController()
+        self.deferred = {}
+        self.checking = set()
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.recheck)
+
+    def submit(self, game_name):
+        window = self.controller.settings["defer_window_minutes"]
+        if window <= 0:
+            self.admitted.emit(game_name)
+            return
+        if game_name not in self.deferred:
+            self.deferred[game_name] = datetime.now() + timedelta(minutes=window)
+        self.recheck()
+
+    def recheck(self):
+        for game_name in list(self.deferred):
+            if game_name in self.checking:
+                continue
+            self.checking.add(game_name)
+            future = get_executor().submit(f"Admission check {game_name}", self.controller.check, game_name,
+                                           priority=PRIORITY_BACKGROUND, kind="task")
+            future.add_done_callback(lambda f, game_name=game_name: self.on_checked(game_name, f))
+
+    def on_checked(self, game_name, future):
+        self.checking.discard(game_name)
+        if game_name not in self.deferred:
+            return
+        error = future.exception()
+        ok, reason = (True, f"check failed: {error}") if error is not None else future.result()
+        if ok or datetime.now() >= self.deferred[game_name]:
+            del self.deferred[game_name]
+            if not ok:
+                write_log_file(f"Deferral window for {game_name} expired ({reason}), running backup anyway.")
+            self.admitted.emit(game_name)
+        else:
+            write_log_file(f"Deferring scheduled backup for {game_name}: {reason}.")
+        if self.deferred and not self.timer.isActive():
+            self.timer.start(RECHECK_MS)
+        elif not self.deferred:
+            self.timer.stop()
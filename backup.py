@@ -1,11 +1,27 @@
-from PySide6.QtCore import QThread, Signal
+from PySide6.QtCore import Signal
 from datetime import datetime
 from pathlib import Path
 import zipfile
 import shutil
+import json
+import re
+import time
 
-from config_utils import write_log_file, get_max_backups
-from paths import get_game_folder, APPDATA_DIR
+from config_utils import (
+    write_log_file, get_max_backups, get_verify_after_backup, get_extra_backup_paths, get_retention_policy,
+    get_cc_backup_enabled, get_save_rotations_kept, get_pack_small_files
+)
+from paths import APPDATA_DIR
+from discovery import find_game_folder
+from scrubber import verify_archive, record_verification
+from fingerprint import FingerprintCache, manifest_digest
+from streaming import ChunkSizer, StreamCancelled, copy_stream
+from tee import TeeWriter, catch_up
+from retention import plan_folder, delete_archives
+from salvage import salvage_folder
+from smallpack import PACK_NAME, split_small_files, train_dictionary, write_pack
+from jobs import Job, PRIORITY_INTERACTIVE, PRIORITY_NORMAL
+from cc_store import CCStore, CCCancelled, CC_STORE_DIRNAME, MODS_DIRNAME, backup_mods
 
 
 INCLUDE_MAP = {
@@ -16,14 +32,73 @@ INCLUDE_MAP = {
     "mysims kingdom": ["SaveData1", "SaveData2", "SaveData3"],
 }
 
+RECENT_WINDOW_S = 60 * 60
 
-class BackupWorker(QThread):
+SAVE_ROTATION_RULES = {
+    "sims 4": re.compile(r"^(slot_[0-9a-f]{8}\.save)(?:\.ver(\d+))?$", re.IGNORECASE),
+}
+
+
+def save_rotation(game_key: str, name: str):
+    rule = SAVE_ROTATION_RULES.get(game_key)
+    match = rule.match(name) if rule else None
+    if not match:
+        return None
+    return match.group(1), int(match.group(2)) if match.group(2) is not None else None
+
+
+def select_backup_files(game_key: str, files, keep_rotations: int):
+    if keep_rotations < 0 or game_key not in SAVE_ROTATION_RULES:
+        return files
+    selected = []
+    for file_path, root in files:
+        rotation = save_rotation(game_key, file_path.name)
+        if rotation is None or rotation[1] is None or rotation[1] < keep_rotations:
+            selected.append((file_path, root))
+    return selected
+
+
+def order_for_protection(game_key: str, files):
+    units = {}
+    for file_path, root in files:
+        try:
+            st = file_path.stat()
+        except OSError:
+            continue
+        rotation = save_rotation(game_key, file_path.name)
+        version = rotation[1] if rotation and rotation[1] is not None else -1
+        key = (file_path.parent, (rotation[0] if rotation else file_path.name).lower())
+        unit = units.setdefault(key, {"mtime": 0, "size": 0, "files": []})
+        unit["mtime"] = max(unit["mtime"], st.st_mtime)
+        unit["size"] += st.st_size
+        unit["files"].append((version, file_path, root))
+    ordered = []
+    for unit in sorted(units.values(), key=lambda u: (-u["mtime"], u["size"])):
+        ordered += [(file_path, root) for _, file_path, root in sorted(unit["files"], key=lambda f: f[0])]
+    return ordered
+
+
+def recently_modified(files, window_s: float = RECENT_WINDOW_S):
+    cutoff = time.time() - window_s
+    recent = set()
+    for file_path, _ in files:
+        try:
+            if file_path.stat().st_mtime >= cutoff:
+                recent.add(file_path)
+        except OSError:
+            pass
+    return recent
+
+
+class BackupWorker(Job):
     log_signal = Signal(str)
     progress_signal = Signal(int)
     max_signal = Signal(int)
+    file_progress_signal = Signal(str, int)
     done_signal = Signal()
     cleanup_done_signal = Signal(str)
     error_signal = Signal(str)
+    diagnosable = True
 
     def __init__(self, dialog=None, backup_folder=None, game_name: str = "", silent=False):
         super().__init__()
@@ -31,13 +106,22 @@ class BackupWorker(QThread):
         self.game_name = game_name
         self.game_key = self.game_name.strip().lower()
         self.backup_folder = Path(backup_folder).resolve() if backup_folder else None
-        self.cancel_requested = False
+        self.target_folders = [self.backup_folder] if self.backup_folder else []
+        if self.backup_folder:
+            for extra in get_extra_backup_paths(game_name):
+                extra = Path(extra).resolve()
+                if extra not in self.target_folders:
+                    self.target_folders.append(extra)
         self.silent = silent
+        self.priority = PRIORITY_NORMAL if silent else PRIORITY_INTERACTIVE
+        self.skipped_unchanged = False
+        self.time_to_protect = None
 
         if dialog and not silent:
             self.log_signal.connect(dialog.log)
             self.progress_signal.connect(dialog.update_progress)
             self.max_signal.connect(dialog.set_max)
+            self.file_progress_signal.connect(dialog.update_file_progress)
 
     def run(self):
         try:
@@ -45,8 +129,10 @@ class BackupWorker(QThread):
 
             if self.backup_folder:
                 self.backup_folder.mkdir(parents=True, exist_ok=True)
+            for folder in self.target_folders:
+                salvage_folder(folder, self.game_key.replace(' ', '_'), self.log)
 
-            game_root = get_game_folder(self.game_name)
+            game_root = find_game_folder(self.game_name)
             if not game_root.exists():
                 error_msg = f"[ERROR] {self.game_name} folder not found: {game_root}"
                 self.log(error_msg)
@@ -68,32 +154,71 @@ class BackupWorker(QThread):
                     if f.is_file():
                         files_to_backup.append((f, game_root))
 
+            keep_rotations = get_save_rotations_kept() if self.game_key in SAVE_ROTATION_RULES else -1
+            all_files = len(files_to_backup)
+            files_to_backup = select_backup_files(self.game_key, files_to_backup, keep_rotations)
+            if len(files_to_backup) < all_files:
+                self.log(f"Skipping {all_files - len(files_to_backup)} older save version(s).")
+
             if not files_to_backup:
                 error_msg = "[ERROR] No files found to back up."
                 self.log(error_msg)
                 self.error_signal.emit(error_msg)
                 return
 
-            if not self.silent:
-                self.progress_signal.emit(0)
-                self.max_signal.emit(len(files_to_backup))
+            self.log("Checking for changes since the last backup...")
+            with FingerprintCache() as fingerprints:
+                entries = [
+                    (file_path.relative_to(root).as_posix(), fingerprints.fingerprint(file_path))
+                    for file_path, root in files_to_backup
+                ]
+                _, last_digest = fingerprints.latest_archive_digest(self.backup_folder, self.game_key)
+            if last_digest == manifest_digest(entries):
+                self.skipped_unchanged = True
+                summary = "No changes since the last backup. No new archive was created."
+                self.log(summary)
+                self.backup_custom_content(game_root)
+                if not self.skipped_unchanged:
+                    summary = "Saves unchanged. Custom content backed up."
+                self.cleanup_done_signal.emit(summary)
+                self.done_signal.emit()
+                return
+
+            files_to_backup = order_for_protection(self.game_key, files_to_backup)
+            recent = recently_modified(files_to_backup)
+            self.progress_signal.emit(0)
+            self.max_signal.emit(len(files_to_backup))
 
             backup_name = f"{self.game_key.replace(' ', '_')}_backup_{datetime.now():%Y%m%d_%H%M%S}.zip"
-            backup_path = self.backup_folder / backup_name
-            self.log(f"Creating backup: {backup_path}")
+            for folder in self.target_folders:
+                self.log(f"Creating backup: {folder / backup_name}")
 
-            with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for step, (file_path, root) in enumerate(files_to_backup, start=1):
-                    if self.cancel_requested:
-                        self.log("Backup cancelled by user.")
+            try:
+                backup_paths = self.write_archive(backup_name, files_to_backup, keep_rotations, recent)
+            except StreamCancelled:
+                self.log("Backup cancelled by user.")
+                return
+
+            with FingerprintCache() as fingerprints:
+                for backup_path in backup_paths:
+                    fingerprints.record_archive(backup_path, self.game_key, entries)
+
+            if get_verify_after_backup():
+                for backup_path in backup_paths:
+                    ok, error = verify_archive(backup_path)
+                    record_verification(backup_path, ok, error)
+                    if not ok:
+                        error_msg = f"[ERROR] Backup verification failed for {backup_path}: {error}"
+                        self.log(error_msg)
+                        self.error_signal.emit(error_msg)
                         return
-                    arcname = file_path.relative_to(root)
-                    zipf.write(file_path, arcname)
-                    self.log(f"Added: {arcname}")
-                    if not self.silent:
-                        self.progress_signal.emit(step)
+                self.log("Backup verified.")
 
-            self.log("Backup complete.")
+            if self.time_to_protect is not None:
+                self.log(f"Backup complete. Recent saves were protected after {self.time_to_protect:.1f}s.")
+            else:
+                self.log("Backup complete.")
+            self.backup_custom_content(game_root)
             self.cleanup_folders()
             self.done_signal.emit()
 
@@ -102,6 +227,110 @@ class BackupWorker(QThread):
             self.log(error_msg)
             self.error_signal.emit(error_msg)
 
+    def write_archive(self, backup_name: str, files_to_backup, keep_rotations: int = -1, recent=None):
+        sizer = ChunkSizer()
+        pending = set(recent or ())
+        started = time.monotonic()
+        cancelled = lambda: self.cancel_requested
+        tee = TeeWriter([folder / backup_name for folder in self.target_folders])
+        try:
+            with zipfile.ZipFile(tee, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                if keep_rotations >= 0:
+                    zipf.comment = json.dumps({"save_rotations": keep_rotations}).encode("utf-8")
+                regular, small = split_small_files(files_to_backup, pending) if get_pack_small_files() else (files_to_backup, [])
+                for step, (file_path, root) in enumerate(regular, start=1):
+                    if self.cancel_requested:
+                        raise StreamCancelled()
+                    arcname = file_path.relative_to(root).as_posix()
+                    zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+                    zinfo.compress_type = zipfile.ZIP_DEFLATED
+                    with open(file_path, "rb") as src, zipf.open(zinfo, "w", force_zip64=True) as dst:
+                        copy_stream(
+                            src, dst, zinfo.file_size, cancelled,
+                            lambda percent, name=arcname: self.file_progress_signal.emit(name, percent),
+                            sizer
+                        )
+                    self.log(f"Added: {arcname}")
+                    self.progress_signal.emit(step)
+                    if file_path in pending:
+                        pending.discard(file_path)
+                        if not pending:
+                            self.protected(tee, len(recent), started)
+                if small:
+                    self.write_pack(zipf, small, len(regular))
+            written, lagging, failed = tee.finish()
+            if recent is not None and not recent:
+                self.log("Time to protect: no saves were modified in the last hour.")
+        except BaseException:
+            tee.abort()
+            raise
+
+        for path, error in failed.items():
+            self.log(f"[ERROR] Backup target failed: {path.parent} ({error})")
+        if not written:
+            raise OSError("All backup targets failed")
+        for path in lagging:
+            self.log(f"Backup target {path.parent} fell behind, copying the finished archive...")
+            try:
+                catch_up(written[0], path)
+                written.append(path)
+            except OSError as e:
+                self.log(f"[ERROR] Failed to copy backup to {path.parent}: {e}")
+        return written
+
+    def write_pack(self, zipf: zipfile.ZipFile, small, done: int):
+        self.log(f"Packing {len(small)} small file(s) with a shared dictionary...")
+        zdict = train_dictionary([file_path for file_path, _ in small])
+        zinfo = zipfile.ZipInfo(PACK_NAME, time.localtime()[:6])
+        zinfo.compress_type = zipfile.ZIP_STORED
+        with zipf.open(zinfo, "w", force_zip64=True) as dst:
+            write_pack(
+                dst, [(file_path, file_path.relative_to(root).as_posix()) for file_path, root in small], zdict,
+                lambda: self.cancel_requested, lambda step, _: self.progress_signal.emit(done + step)
+            )
+        self.log(f"Packed {len(small)} small file(s) using a {len(zdict) // 1024} KB dictionary.")
+
+    def title(self):
+        return f"Backup {self.game_name}"
+
+    def protected(self, tee: TeeWriter, count: int, started: float):
+        tee.checkpoint()
+        self.time_to_protect = time.monotonic() - started
+        self.log(f"Time to protect: {count} recently modified file(s) committed to disk in {self.time_to_protect:.1f}s.")
+
+    def backup_custom_content(self, game_root: Path):
+        mods_root = game_root / MODS_DIRNAME
+        if self.game_key != "sims 4" or not get_cc_backup_enabled() or not mods_root.is_dir():
+            return
+        self.log("Checking Mods and custom content...")
+        store = CCStore(self.backup_folder / CC_STORE_DIRNAME)
+        try:
+            with FingerprintCache() as fingerprints:
+                manifest, stored, stored_bytes = backup_mods(
+                    mods_root, store, fingerprints, self.log,
+                    cancel=lambda: self.cancel_requested,
+                    progress=self.cc_progress
+                )
+        except CCCancelled:
+            self.log("Custom content backup cancelled.")
+            return
+        except OSError as e:
+            self.log(f"[ERROR] Custom content backup failed: {e}")
+            return
+        if manifest is None:
+            self.log("Custom content unchanged.")
+            return
+        self.skipped_unchanged = False
+        self.log(f"Custom content backed up: {stored} new package(s), {stored_bytes / (1024 * 1024):.1f} MB stored.")
+        pruned, reclaimed = store.prune(get_retention_policy(), get_max_backups())
+        if pruned:
+            self.log(f"Removed {pruned} old custom content snapshot(s), {reclaimed / (1024 * 1024):.1f} MB reclaimed.")
+
+    def cc_progress(self, step: int, total: int):
+        if step == 1:
+            self.max_signal.emit(total)
+        self.progress_signal.emit(step)
+
     def log(self, message: str):
         if not self.silent and self.dialog:
             self.log_signal.emit(message)
@@ -117,23 +346,22 @@ class BackupWorker(QThread):
                 except Exception as e:
                     self.log(f"[ERROR] Failed to clean temp folder: {e}")
 
-            backup_files = sorted(
-                self.backup_folder.glob("*.zip"),
-                key=lambda x: x.stat().st_mtime
-            )
+            policy = get_retention_policy()
             max_backups = get_max_backups()
             removed_count = 0
 
-            if max_backups > 0 and len(backup_files) > max_backups:
-                for old_backup in backup_files[:-max_backups]:
-                    try:
-                        old_backup.unlink()
-                        removed_count += 1
-                        self.log(f"Deleted old backup: {old_backup.name}")
-                    except Exception as e:
-                        self.log(f"[ERROR] Failed to delete {old_backup.name}: {e}")
+            for folder in self.target_folders:
+                if not folder.is_dir():
+                    continue
+                _, pruned = plan_folder(folder, policy, max_backups)
+                removed, failed = delete_archives(pruned)
+                removed_count += len(removed)
+                for old_backup in removed:
+                    self.log(f"Deleted old backup: {old_backup.path}")
+                for old_backup, e in failed:
+                    self.log(f"[ERROR] Failed to delete {old_backup.path.name}: {e}")
 
-            if max_backups == 0:
+            if policy is None and max_backups == 0:
                 summary = "Cleanup complete. Unlimited backups retained."
             elif removed_count > 0:
                 summary = f"Cleanup complete. {removed_count} old backup(s) removed."
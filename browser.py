@@ -0,0 +1,486 @@
+import os
+import json
+import queue
+import base64
+import hashlib
+import zipfile
+from collections import OrderedDict
+from pathlib import Path
+from PySide6.QtCore import Qt, QAbstractItemModel, QModelIndex, QThread, QObject, QBuffer, QIODevice, QSize, Signal
+from PySide6.QtGui import QImage, QPixmap
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QTreeView, QPushButton, QLabel, QFileDialog, QAbstractItemView
+)
+
+from paths import APPDATA_DIR
+from retention import scan_archives
+from smallpack import PACK_NAME, iter_pack
+from streaming import StreamCancelled
+from backup import save_rotation
+from config_utils import get_default_backup_path, get_extra_backup_paths
+from theme import Theme
+
+
+BROWSER_CACHE_DIR = APPDATA_DIR / "browser_cache"
+PAGE_SIZE = 50
+MEMORY_CACHE_ENTRIES = 256
+DISK_CACHE_BYTES = 64 * 1024 * 1024
+LOADER_THREADS = 2
+THUMBNAIL_SIZE = 96
+ICON_SIZE = 40
+MAX_THUMBNAILS = 4
+MAX_MEMBER_READ = 4 * 1024 * 1024
+TRAY_HOUSEHOLD = 1
+JPEG_START = b"\xff\xd8\xff"
+THUMBNAIL_SUFFIXES = (".hhi", ".sgi")
+COLUMNS = ("Date", "Size", "Saves", "Households")
+LOADING = "…"
+
+
+def read_varint(data, pos):
+    result = shift = 0
+    while True:
+        if pos >= len(data) or shift > 63:
+            raise ValueError("Truncated varint")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def tray_household_name(data):
+    fields = {}
+    pos = 0
+    try:
+        while pos < len(data):
+            key, pos = read_varint(data, pos)
+            number, wire = key >> 3, key & 7
+            if wire == 0:
+                value, pos = read_varint(data, pos)
+            elif wire == 2:
+                length, pos = read_varint(data, pos)
+                value = data[pos:pos + length]
+                pos += length
+            elif wire in (1, 5):
+                value = None
+                pos += 8 if wire == 1 else 4
+            else:
+                break
+            fields.setdefault(number, value)
+    except ValueError:
+        pass
+    name = fields.get(4)
+    if fields.get(2) != TRAY_HOUSEHOLD or not isinstance(name, bytes):
+        return None
+    try:
+        return name.decode("utf-8").strip() or None
+    except UnicodeDecodeError:
+        return None
+
+
+def decode_thumbnail(data):
+    start = data.find(JPEG_START)
+    if start < 0:
+        return None
+    image = QImage.fromData(data[start:])
+    if image.isNull():
+        return None
+    return image.scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+
+def image_to_png(image):
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+
+def slot_name(game_key, arcname):
+    parts = arcname.split("/")
+    rotation = save_rotation(game_key, parts[-1])
+    if rotation:
+        return rotation[0] if rotation[1] is None else None
+    if len(parts) > 2 and parts[0].lower() == "saves":
+        return parts[1].rsplit(".", 1)[0]
+    if len(parts) > 1 and parts[0].lower().startswith("savedata"):
+        return parts[0]
+    return None
+
+
+def archive_members(zipf, wanted, cancel=None):
+    for info in zipf.infolist():
+        if cancel and cancel():
+            raise StreamCancelled()
+        if info.filename == PACK_NAME:
+            with zipf.open(info, "r") as src:
+                yield from iter_pack(src, cancel, wanted)
+        elif not info.is_dir():
+            read = wanted(info.filename) and info.file_size <= MAX_MEMBER_READ
+            yield info.filename, zipf.read(info) if read else None
+
+
+def read_metadata(path, game_key, cancel=None):
+    slots, households, thumbnails = [], [], []
+    files = 0
+
+    def wanted(name):
+        lower = name.lower()
+        return lower.endswith(".trayitem") or (lower.endswith(THUMBNAIL_SUFFIXES) and len(thumbnails) < MAX_THUMBNAILS)
+
+    with zipfile.ZipFile(path, "r") as zipf:
+        for name, data in archive_members(zipf, wanted, cancel):
+            files += 1
+            slot = slot_name(game_key, name)
+            if slot and slot not in slots:
+                slots.append(slot)
+            if data is None:
+                continue
+            if name.lower().endswith(".trayitem"):
+                household = tray_household_name(data)
+                if household and household not in households:
+                    households.append(household)
+            elif len(thumbnails) < MAX_THUMBNAILS:
+                image = decode_thumbnail(data)
+                if image is not None:
+                    thumbnails.append(image_to_png(image))
+    return {"files": files, "slots": sorted(slots), "households": sorted(households, key=str.lower),
+            "thumbnails": thumbnails}
+
+
+def cache_key(path, st):
+    return hashlib.sha1(f"{Path(path).resolve()}|{st.st_size}|{st.st_mtime_ns}".encode("utf-8")).hexdigest()
+
+
+def load_cached(key):
+    entry = BROWSER_CACHE_DIR / f"{key}.json"
+    try:
+        with open(entry, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        os.utime(entry)
+    except (OSError, ValueError):
+        return None
+    meta["thumbnails"] = [base64.b64decode(t) for t in meta.get("thumbnails", [])]
+    return meta
+
+
+def store_cached(key, meta):
+    try:
+        BROWSER_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        stored = dict(meta, thumbnails=[base64.b64encode(t).decode("ascii") for t in meta["thumbnails"]])
+        tmp = BROWSER_CACHE_DIR / f"{key}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(stored, f)
+        os.replace(tmp, BROWSER_CACHE_DIR / f"{key}.json")
+        prune_disk_cache()
+    except OSError:
+        pass
+
+
+def prune_disk_cache(limit=DISK_CACHE_BYTES):
+    entries = []
+    for entry in os.scandir(BROWSER_CACHE_DIR):
+        if entry.name.endswith(".json"):
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+class ArchiveScanner(QThread):
+    found = Signal(list)
+
+    def __init__(self, game_name: str):
+        super().__init__()
+        self.game_name = game_name
+
+    def run(self):
+        prefix = self.game_name.strip().lower().replace(" ", "_")
+        folders = []
+        for folder in [get_default_backup_path(self.game_name)] + get_extra_backup_paths(self.game_name):
+            if folder and Path(folder).resolve() not in folders:
+                folders.append(Path(folder).resolve())
+        archives = []
+        for folder in folders:
+            for archive in scan_archives(folder):
+                if archive.group == prefix:
+                    archive.size()
+                    archives.append(archive)
+        archives.sort(key=lambda a: a.timestamp, reverse=True)
+        self.found.emit(archives)
+
+
+class MetadataWorker(QThread):
+    loaded = Signal(str, object)
+
+    def __init__(self, requests, game_key: str):
+        super().__init__()
+        self.requests = requests
+        self.game_key = game_key
+        self.cancel_requested = False
+
+    def run(self):
+        self.setPriority(QThread.LowPriority)
+        while True:
+            path = self.requests.get()
+            if path is None:
+                return
+            try:
+                st = os.stat(path)
+                key = cache_key(path, st)
+                meta = load_cached(key)
+                if meta is None:
+                    meta = read_metadata(path, self.game_key, lambda: self.cancel_requested)
+                    store_cached(key, meta)
+            except StreamCancelled:
+                return
+            except (OSError, zipfile.BadZipFile, ValueError, EOFError) as e:
+                meta = {"error": str(e)}
+            images = [QImage.fromData(png) for png in meta.pop("thumbnails", [])]
+            meta["images"] = [image for image in images if not image.isNull()]
+            self.loaded.emit(path, meta)
+
+
+class MetadataLoader(QObject):
+    loaded = Signal(str, object)
+
+    def __init__(self, game_key: str, parent=None):
+        super().__init__(parent)
+        self.requests = queue.LifoQueue()
+        self.workers = [MetadataWorker(self.requests, game_key) for _ in range(LOADER_THREADS)]
+        for worker in self.workers:
+            worker.loaded.connect(self.loaded.emit)
+            worker.start()
+
+    def request(self, path: str):
+        self.requests.put(path)
+
+    def stop(self):
+        while not self.requests.empty():
+            try:
+                self.requests.get_nowait()
+            except queue.Empty:
+                break
+        for worker in self.workers:
+            worker.cancel_requested = True
+            self.requests.put(None)
+        for worker in self.workers:
+            worker.wait()
+
+
+class BackupModel(QAbstractItemModel):
+    def __init__(self, game_name: str, parent=None):
+        super().__init__(parent)
+        self.archives = []
+        self.rows = {}
+        self.visible = 0
+        self.cache = OrderedDict()
+        self.requested = set()
+        self.loader = MetadataLoader(game_name.strip().lower(), self)
+        self.loader.loaded.connect(self.on_loaded)
+
+    def set_archives(self, archives):
+        self.beginResetModel()
+        self.archives = archives
+        self.rows = {str(a.path): row for row, a in enumerate(archives)}
+        self.visible = 0
+        self.endResetModel()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=None):
+        if index is None:
+            return super().parent()
+        return QModelIndex()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.visible
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.visible < len(self.archives)
+
+    def fetchMore(self, parent=QModelIndex()):
+        count = min(PAGE_SIZE, len(self.archives) - self.visible)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.visible, self.visible + count - 1)
+        self.visible += count
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def archive(self, index):
+        return self.archives[index.row()] if index.isValid() else None
+
+    def metadata(self, archive):
+        key = str(archive.path)
+        meta = self.cache.get(key)
+        if meta is not None:
+            self.cache.move_to_end(key)
+            return meta
+        if key not in self.requested:
+            self.requested.add(key)
+            self.loader.request(key)
+        return None
+
+    def on_loaded(self, path, meta):
+        self.requested.discard(path)
+        meta["pixmaps"] = [QPixmap.fromImage(image) for image in meta.pop("images")]
+        self.cache[path] = meta
+        while len(self.cache) > MEMORY_CACHE_ENTRIES:
+            self.cache.popitem(last=False)
+        row = self.rows.get(path)
+        if row is not None and row < self.visible:
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(COLUMNS) - 1))
+
+    def data(self, index, role=Qt.DisplayRole):
+        archive = self.archive(index)
+        if archive is None:
+            return None
+        column = index.column()
+        if role == Qt.ToolTipRole:
+            return str(archive.path)
+        if role == Qt.DisplayRole and column == 0:
+            stamp = archive.timestamp.strftime("%Y-%m-%d %H:%M:%S")
+            return f"{stamp} (partial)" if archive.salvaged else stamp
+        if role == Qt.DisplayRole and column == 1:
+            return f"{archive.size() / (1024 * 1024):.1f} MB"
+        if role not in (Qt.DisplayRole, Qt.DecorationRole):
+            return None
+        meta = self.metadata(archive)
+        if role == Qt.DecorationRole:
+            return meta["pixmaps"][0] if column == 0 and meta and meta.get("pixmaps") else None
+        if meta is None:
+            return LOADING
+        if "error" in meta:
+            return "Unreadable" if column == 2 else ""
+        return ", ".join(meta["slots"] if column == 2 else meta["households"])
+
+    def stop(self):
+        self.loader.stop()
+
+
+class BackupBrowser(QDialog):
+    def __init__(self, game_name: str, theme: Theme = None, parent=None):
+        super().__init__(parent)
+        self.game_name = game_name
+        self.theme = theme or Theme()
+        self.selected_path = None
+        self.setWindowTitle(f"Backups — {game_name}")
+        self.resize(760, 520)
+        self.setStyleSheet(f"background-color: {self.theme.bg}; color: {self.theme.fg};")
+
+        layout = QVBoxLayout()
+        self.status_label = QLabel("Looking for backups...")
+        layout.addWidget(self.status_label)
+
+        self.model = BackupModel(game_name, self)
+        self.view = QTreeView()
+        self.view.setModel(self.model)
+        self.view.setRootIsDecorated(False)
+        self.view.setUniformRowHeights(True)
+        self.view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.view.setIconSize(QSize(ICON_SIZE, ICON_SIZE))
+        self.view.setColumnWidth(0, 200)
+        self.view.setColumnWidth(1, 80)
+        self.view.setColumnWidth(2, 220)
+        self.view.selectionModel().currentRowChanged.connect(lambda current, _: self.show_details(current))
+        self.view.doubleClicked.connect(lambda _: self.accept_selection())
+        self.model.dataChanged.connect(lambda *_: self.show_details(self.view.currentIndex()))
+        layout.addWidget(self.view, 1)
+
+        self.detail_label = QLabel()
+        self.detail_label.setWordWrap(True)
+        layout.addWidget(self.detail_label)
+        thumbs = QHBoxLayout()
+        self.thumbnail_labels = []
+        for _ in range(MAX_THUMBNAILS):
+            label = QLabel()
+            label.setFixedSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+            thumbs.addWidget(label)
+            self.thumbnail_labels.append(label)
+        thumbs.addStretch(1)
+        layout.addLayout(thumbs)
+
+        buttons = QHBoxLayout()
+        browse_btn = QPushButton("Browse for File...")
+        self.restore_btn = QPushButton("Restore")
+        self.restore_btn.setEnabled(False)
+        cancel_btn = QPushButton("Cancel")
+        for btn in (browse_btn, self.restore_btn, cancel_btn):
+            btn.setStyleSheet(self.theme.button_style())
+            buttons.addWidget(btn)
+        browse_btn.clicked.connect(self.browse_for_file)
+        self.restore_btn.clicked.connect(self.accept_selection)
+        cancel_btn.clicked.connect(self.reject)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+        self.scanner = ArchiveScanner(game_name)
+        self.scanner.found.connect(self.on_archives_found)
+        self.scanner.start()
+
+    def on_archives_found(self, archives):
+        self.model.set_archives(archives)
+        self.status_label.setText(f"{len(archives)} backup(s) found." if archives else
+                                  "No backups found in the backup folders. Use Browse to pick a zip.")
+
+    def show_details(self, index):
+        archive = self.model.archive(index)
+        self.restore_btn.setEnabled(archive is not None)
+        if archive is None:
+            self.detail_label.clear()
+            for label in self.thumbnail_labels:
+                label.clear()
+            return
+        meta = self.model.metadata(archive)
+        if meta is None:
+            text = f"{archive.path.name}\nLoading details..."
+        elif "error" in meta:
+            text = f"{archive.path.name}\nCould not read this backup: {meta['error']}"
+        else:
+            text = (f"{archive.path.name} — {meta['files']} file(s)\n"
+                    f"Saves: {', '.join(meta['slots']) or 'none'}\n"
+                    f"Households: {', '.join(meta['households']) or 'none'}")
+        self.detail_label.setText(text)
+        pixmaps = meta.get("pixmaps", []) if meta else []
+        for i, label in enumerate(self.thumbnail_labels):
+            if i < len(pixmaps):
+                label.setPixmap(pixmaps[i])
+            else:
+                label.clear()
+
+    def accept_selection(self):
+        archive = self.model.archive(self.view.currentIndex())
+        if archive is not None:
+            self.selected_path = str(archive.path)
+            self.accept()
+
+    def browse_for_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, f"Select {self.game_name} Backup Zip", filter="Zip Files (*.zip)")
+        if path:
+            self.selected_path = path
+            self.accept()
+
+    def done(self, result):
+        self.scanner.wait()
+        self.model.stop()
+        super().done(result)
@@ -0,0 +1,217 @@
+import os
+import json
+import struct
+import shutil
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+from fingerprint import HASH_SIZE
+from retention import Archive, parse_archive_name, plan_retention
+
+
+MODS_DIRNAME = "Mods"
+CC_STORE_DIRNAME = "sims_4_cc"
+CC_MANIFEST_PREFIX = "sims_4_cc"
+DBPF_MAGIC = b"DBPF"
+DBPF_HEADER_SIZE = 96
+MAX_INDEX_SIZE = 64 * 1024 * 1024
+PACKAGE_SUFFIX = ".package"
+
+
+class CCCancelled(Exception):
+    pass
+
+
+def dbpf_fingerprint(path):
+    with open(path, "rb") as f:
+        header = f.read(DBPF_HEADER_SIZE)
+        if len(header) < DBPF_HEADER_SIZE or header[:4] != DBPF_MAGIC:
+            return None
+        major = struct.unpack_from("<I", header, 0x04)[0]
+        index_size = struct.unpack_from("<I", header, 0x2C)[0]
+        position = struct.unpack_from("<I", header, 0x40)[0] if major >= 2 else 0
+        if not position:
+            position = struct.unpack_from("<I", header, 0x28)[0]
+        size = os.fstat(f.fileno()).st_size
+        if index_size > MAX_INDEX_SIZE or position < DBPF_HEADER_SIZE or position + index_size > size:
+            return None
+        f.seek(position)
+        index = f.read(index_size)
+    h = hashlib.blake2b(digest_size=HASH_SIZE)
+    h.update(header)
+    h.update(index)
+    h.update(size.to_bytes(8, "little"))
+    return h.digest()
+
+
+def quick_fingerprint(path, fingerprints, st=None):
+    if path.suffix.lower() != PACKAGE_SUFFIX:
+        return None
+    st = st or os.stat(path)
+    key = f"dbpf:{path}"
+    digest = fingerprints.lookup(key, st)
+    if digest is None:
+        digest = dbpf_fingerprint(path)
+        if digest is None:
+            return None
+        fingerprints.put(key, digest, st)
+    return digest
+
+
+def matches_entry(path, entry, fingerprints):
+    st = path.stat()
+    if st.st_size != entry["size"]:
+        return False
+    quick = quick_fingerprint(path, fingerprints, st)
+    if quick is not None and entry.get("dbpf") and quick.hex() != entry["dbpf"]:
+        return False
+    return fingerprints.fingerprint(path).hex() == entry["digest"]
+
+
+class CCStore:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.manifests_dir = self.root / "manifests"
+
+    def object_path(self, digest_hex):
+        return self.objects_dir / digest_hex[:2] / digest_hex
+
+    def has(self, digest_hex):
+        return self.object_path(digest_hex).exists()
+
+    def put(self, src, digest_hex):
+        dest = self.object_path(digest_hex)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(dest.name + ".tmp")
+        try:
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dest)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    def manifests(self):
+        if not self.manifests_dir.is_dir():
+            return []
+        return sorted(p.name for p in self.manifests_dir.glob(f"{CC_MANIFEST_PREFIX}_backup_*.json"))
+
+    def load_manifest(self, name):
+        with open(self.manifests_dir / name, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def latest_manifest(self):
+        names = self.manifests()
+        return (names[-1], self.load_manifest(names[-1])) if names else (None, None)
+
+    def write_manifest(self, entries):
+        self.manifests_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{CC_MANIFEST_PREFIX}_backup_{datetime.now():%Y%m%d_%H%M%S}.json"
+        tmp = self.manifests_dir / (name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(tmp, self.manifests_dir / name)
+        return name
+
+    def manifest_before(self, when=None):
+        chosen = None
+        for name in self.manifests():
+            parsed = parse_archive_name(name.replace(".json", ".zip"))
+            if parsed and (when is None or parsed[1] < when):
+                chosen = name
+        return chosen
+
+    def prune(self, policy, max_backups):
+        archives = []
+        for name in self.manifests():
+            parsed = parse_archive_name(name.replace(".json", ".zip"))
+            if parsed:
+                archives.append(Archive(self.manifests_dir / name, parsed[1], parsed[0]))
+        _, pruned = plan_retention(archives, policy, max_backups)
+        for archive in pruned:
+            archive.path.unlink(missing_ok=True)
+        return len(pruned), self.collect_garbage()
+
+    def collect_garbage(self):
+        referenced = set()
+        for name in self.manifests():
+            referenced.update(entry["digest"] for entry in self.load_manifest(name).values())
+        removed = 0
+        if not self.objects_dir.is_dir():
+            return removed
+        for obj in self.objects_dir.glob("*/*"):
+            if obj.name not in referenced:
+                try:
+                    removed += obj.stat().st_size
+                    obj.unlink()
+                except OSError:
+                    pass
+        return removed
+
+
+def scan_mods(mods_root, fingerprints, cancel=None):
+    entries = {}
+    for dirpath, dirnames, filenames in os.walk(mods_root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if cancel and cancel():
+                raise CCCancelled()
+            path = Path(dirpath) / name
+            try:
+                st = path.stat()
+                digest = fingerprints.fingerprint(path)
+                quick = quick_fingerprint(path, fingerprints, st)
+            except OSError:
+                continue
+            entry = {"digest": digest.hex(), "size": st.st_size, "mtime": st.st_mtime}
+            if quick is not None:
+                entry["dbpf"] = quick.hex()
+            entries[path.relative_to(mods_root).as_posix()] = entry
+    return entries
+
+
+def backup_mods(mods_root, store, fingerprints, log, cancel=None, progress=None):
+    entries = scan_mods(mods_root, fingerprints, cancel)
+    _, latest = store.latest_manifest()
+    digests = {rel: entry["digest"] for rel, entry in entries.items()}
+    if latest is not None and {rel: entry["digest"] for rel, entry in latest.items()} == digests:
+        return None, 0, 0
+    missing = {}
+    for rel, entry in entries.items():
+        if entry["digest"] not in missing and not store.has(entry["digest"]):
+            missing[entry["digest"]] = rel
+    stored_bytes = 0
+    for step, (digest_hex, rel) in enumerate(missing.items(), start=1):
+        if cancel and cancel():
+            raise CCCancelled()
+        store.put(mods_root / rel, digest_hex)
+        stored_bytes += entries[rel]["size"]
+        log(f"Stored CC: {rel}")
+        if progress:
+            progress(step, len(missing))
+    return store.write_manifest(entries), len(missing), stored_bytes
+
+
+def restore_mods(store, manifest_name, mods_root, fingerprints, log, cancel=None):
+    manifest = store.load_manifest(manifest_name)
+    restored = 0
+    for rel, entry in manifest.items():
+        if cancel and cancel():
+            raise CCCancelled()
+        dest = mods_root / rel
+        try:
+            if dest.exists() and matches_entry(dest, entry, fingerprints):
+                continue
+        except OSError:
+            pass
+        src = store.object_path(entry["digest"])
+        if not src.exists():
+            log(f"[ERROR] CC object missing for {rel}")
+            continue
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(src, dest)
+        os.utime(dest, (entry["mtime"], entry["mtime"]))
+        restored += 1
+        log(f"Restored CC: {rel}")
+    return restored
@@ -0,0 +1,230 @@
+import os
+import json
+import lzma
+import time
+import zlib
+import zipfile
+from datetime import datetime, timedelta
+from PySide6.QtCore import QObject, QTimer, Signal
+
+from paths import APPDATA_DIR
+from jobs import Job, PRIORITY_BACKGROUND
+from admission import AdmissionController
+from retention import scan_archives
+from scrubber import backup_folders, verify_archive, record_verification
+from config_utils import GAMES, get_admission_settings, get_compaction_settings, write_log_file
+
+
+COMPACTION_STATE_PATH = APPDATA_DIR / "compaction_state.json"
+COMPACT_INTERVAL_MS = 60 * 60 * 1000
+COMPACT_STARTUP_DELAY_MS = 15 * 60 * 1000
+COPY_CHUNK = 1024 * 1024
+RECHECK_BYTES = 64 * 1024 * 1024
+COMPACTION_ERRORS = (OSError, EOFError, zipfile.BadZipFile, zipfile.LargeZipFile, lzma.LZMAError, zlib.error)
+MIN_IDLE_MINUTES = 10
+
+
+class CompactionDeferred(Exception):
+    pass
+
+
+def load_compaction_state():
+    try:
+        with open(COMPACTION_STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_compaction_state(state):
+    try:
+        APPDATA_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = COMPACTION_STATE_PATH.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, COMPACTION_STATE_PATH)
+    except OSError:
+        pass
+
+
+def is_compacted(path):
+    try:
+        with zipfile.ZipFile(path, "r") as zipf:
+            infos = [i for i in zipf.infolist() if not i.is_dir()]
+    except (zipfile.BadZipFile, OSError):
+        return True
+    return all(i.compress_type == zipfile.ZIP_LZMA for i in infos)
+
+
+def archives_to_compact(folders, min_age_days, state, now=None):
+    cutoff = (now or datetime.now()) - timedelta(days=min_age_days)
+    due = []
+    for folder in folders:
+        for archive in scan_archives(folder):
+            if archive.timestamp > cutoff:
+                continue
+            entry = state.get(str(archive.path))
+            try:
+                st = archive.entry.stat()
+            except OSError:
+                continue
+            if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+                continue
+            due.append(archive)
+    due.sort(key=lambda a: a.timestamp)
+    return due
+
+
+def recompress(source, dest, check=None):
+    processed = 0
+    next_check = RECHECK_BYTES
+    with zipfile.ZipFile(source, "r") as src, zipfile.ZipFile(dest, "w", zipfile.ZIP_LZMA) as out:
+        for info in src.infolist():
+            zinfo = zipfile.ZipInfo(info.filename, info.date_time)
+            zinfo.external_attr = info.external_attr
+            zinfo.comment = info.comment
+            zinfo.compress_type = zipfile.ZIP_STORED if info.is_dir() else zipfile.ZIP_LZMA
+            with src.open(info, "r") as reader, out.open(zinfo, "w", force_zip64=True) as writer:
+                for block in iter(lambda: reader.read(COPY_CHUNK), b""):
+                    writer.write(block)
+                    processed += len(block)
+                    if check and processed >= next_check:
+                        next_check += RECHECK_BYTES
+                        check()
+
+
+def same_contents(original, candidate):
+    with zipfile.ZipFile(original, "r") as a, zipfile.ZipFile(candidate, "r") as b:
+        left = [(i.filename, i.CRC, i.file_size) for i in a.infolist()]
+        right = [(i.filename, i.CRC, i.file_size) for i in b.infolist()]
+    return left == right
+
+
+def game_for_archive(archive):
+    keys = {g.strip().lower().replace(" ", "_"): g for g in GAMES}
+    return keys.get(archive.group, GAMES[0])
+
+
+def compaction_admission_settings():
+    admission = dict(get_admission_settings())
+    admission["min_idle_minutes"] = max(admission["min_idle_minutes"], MIN_IDLE_MINUTES)
+    return admission
+
+
+class CompactionWorker(Job):
+    done_signal = Signal(str)
+    priority = PRIORITY_BACKGROUND
+
+    def __init__(self, folders=None, controller=None):
+        super().__init__()
+        self.folders = folders
+        self.controller = controller
+
+    def title(self):
+        return "Compact old backups"
+
+    def run(self):
+        settings = get_compaction_settings()
+        if self.controller is None:
+            self.controller = AdmissionController(settings=compaction_admission_settings)
+        folders = self.folders if self.folders is not None else backup_folders()
+        state = load_compaction_state()
+        compacted = 0
+        reclaimed = 0
+        started = time.monotonic()
+        try:
+            for archive in archives_to_compact(folders, settings["min_age_days"], state):
+                if self.cancel_requested:
+                    break
+                try:
+                    saved = self.compact(archive, state)
+                except COMPACTION_ERRORS as e:
+                    write_log_file(f"[ERROR] Could not compact {archive.path.name}: {e}")
+                    continue
+                if saved is not None:
+                    compacted += 1
+                    reclaimed += saved
+        except CompactionDeferred as e:
+            write_log_file(f"Backup compaction paused: {e}.")
+        except OSError as e:
+            write_log_file(f"[ERROR] Backup compaction stopped: {e}")
+        save_compaction_state(state)
+        summary = (f"Compacted {compacted} old backup(s), reclaimed {reclaimed / (1024 * 1024):.1f} MB "
+                   f"in {time.monotonic() - started:.0f}s.")
+        if compacted:
+            write_log_file(summary)
+        self.done_signal.emit(summary)
+
+    def admit(self, game_name):
+        if self.cancel_requested:
+            raise CompactionDeferred("cancelled")
+        ok, reason = self.controller.check(game_name)
+        if not ok:
+            raise CompactionDeferred(reason)
+
+    def compact(self, archive, state):
+        path = archive.path
+        game_name = game_for_archive(archive)
+        self.admit(game_name)
+        original = path.stat()
+        if is_compacted(path):
+            state[str(path)] = {"size": original.st_size, "mtime_ns": original.st_mtime_ns, "result": "lzma"}
+            return None
+        temp = path.with_name(path.name + ".compact")
+        try:
+            recompress(path, temp, check=lambda: self.admit(game_name))
+            ok, error = verify_archive(temp)
+            if not ok or not same_contents(path, temp):
+                write_log_file(f"[ERROR] Compacted copy of {path.name} failed verification: {error or 'contents differ'}")
+                temp.unlink(missing_ok=True)
+                return None
+            new_size = temp.stat().st_size
+            if new_size >= original.st_size:
+                temp.unlink(missing_ok=True)
+                state[str(path)] = {"size": original.st_size, "mtime_ns": original.st_mtime_ns, "result": "no_gain"}
+                return None
+            os.utime(temp, ns=(original.st_atime_ns, original.st_mtime_ns))
+            os.replace(temp, path)
+        except BaseException:
+            temp.unlink(missing_ok=True)
+            raise
+        record_verification(path, True)
+        current = path.stat()
+        state[str(path)] = {"size": current.st_size, "mtime_ns": current.st_mtime_ns, "result": "lzma"}
+        write_log_file(f"Compacted {path.name}: {original.st_size // 1024} KB -> {new_size // 1024} KB")
+        return original.st_size - new_size
+
+
+class CompactionService(QObject):
+    compacted = Signal(str)
+
+    def __init__(self, parent=None, busy=None):
+        super().__init__(parent)
+        self.busy = busy or (lambda: False)
+        self.worker = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.run_now)
+
+    def start(self):
+        QTimer.singleShot(COMPACT_STARTUP_DELAY_MS, self.run_now)
+        self.timer.start(COMPACT_INTERVAL_MS)
+
+    def stop(self):
+        self.timer.stop()
+        if self.worker:
+            self.worker.cancel_requested = True
+            self.worker.wait(5000)
+
+    def run_now(self):
+        if self.worker or not self.timer.isActive() or self.busy():
+            return
+        if not get_compaction_settings()["enabled"]:
+            return
+        self.worker = CompactionWorker()
+        self.worker.done_signal.connect(self.compacted.emit)
+        self.worker.finished.connect(self._on_finished)
+        self.worker.start()
+
+    def _on_finished(self):
+        self.worker.deleteLater()
+        self.worker = None
@@ -1,56 +1,111 @@
+import os
+import threading
 import configparser
 from pathlib import Path
 from datetime import datetime
+from contextlib import contextmanager
 from paths import APPDATA_DIR
 
 
 CONFIG_PATH = APPDATA_DIR / "config.ini"
 LOGFILE_PATH = APPDATA_DIR / "sbu_log.txt"
+LOCK_PATH = APPDATA_DIR / "sbu.lock"
 
 GAMES = ["Sims 4", "Sims 3", "Sims Medieval", "MySims", "MySims Kingdom"]
 
 
+_settings_lock = threading.RLock()
+_settings_lock_depth = 0
+_settings_lock_file = None
+
+
+def _lock_file(f):
+    if os.name == "nt":
+        import msvcrt
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+    import fcntl
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+def _unlock_file(f):
+    if os.name == "nt":
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        return
+    import fcntl
+    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+@contextmanager
+def settings_lock():
+    global _settings_lock_depth, _settings_lock_file
+    with _settings_lock:
+        if _settings_lock_depth == 0:
+            APPDATA_DIR.mkdir(parents=True, exist_ok=True)
+            _settings_lock_file = open(LOCK_PATH, "a+b")
+            _lock_file(_settings_lock_file)
+        _settings_lock_depth += 1
+        try:
+            yield
+        finally:
+            _settings_lock_depth -= 1
+            if _settings_lock_depth == 0:
+                try:
+                    _unlock_file(_settings_lock_file)
+                finally:
+                    _settings_lock_file.close()
+                    _settings_lock_file = None
+
 def ensure_config():
-    if not CONFIG_PATH.exists():
-        APPDATA_DIR.mkdir(parents=True, exist_ok=True)
-        config = configparser.ConfigParser()
-        config["Settings"] = {
-            "max_backups": "5",
-            "theme": "dark",
-            "last_selected_game": "Sims 4",
-            "minimize_to_tray": "false",
-        }
-        for g in GAMES:
-            key = game_key(g)
-            config[f"Path:{key}"] = {"default_backup_path": ""}
-        config["General"] = {
-            "update_available": "false",
-            "last_installed_version": "1.0.0"
-        }
-        with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-            config.write(f)
+    with settings_lock():
+        if not CONFIG_PATH.exists():
+            APPDATA_DIR.mkdir(parents=True, exist_ok=True)
+            config = configparser.ConfigParser()
+            config["Settings"] = {
+                "max_backups": "5",
+                "theme": "dark",
+                "last_selected_game": "Sims 4",
+                "minimize_to_tray": "false",
+            }
+            for g in GAMES:
+                key = game_key(g)
+                config[f"Path:{key}"] = {"default_backup_path": ""}
+            config["General"] = {
+                "update_available": "false",
+                "last_installed_version": "1.0.0"
+            }
+            with open(CONFIG_PATH, "w", encoding="utf-8") as f:
+                config.write(f)
 
 def get_config():
-    ensure_config()
-    config = configparser.ConfigParser()
-    if CONFIG_PATH.exists():
-        config.read(CONFIG_PATH, encoding="utf-8")
-    return config
+    with settings_lock():
+        ensure_config()
+        config = configparser.ConfigParser()
+        if CONFIG_PATH.exists():
+            config.read(CONFIG_PATH, encoding="utf-8")
+        return config
 
 def save_config(config):
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        config.write(f)
+    with settings_lock():
+        with open(CONFIG_PATH, "w", encoding="utf-8") as f:
+            config.write(f)
 
 def get_config_value(section, key, default=""):
     config = get_config()
     return config.get(section, key, fallback=default)
 
 def set_config_value(section, key, value):
-    config = get_config()
-    if section not in config:
-        config[section] = {}
-    config[section][key] = str(value)
-    save_config(config)
+    with settings_lock():
+        config = get_config()
+        if section not in config:
+            config[section] = {}
+        config[section][key] = str(value)
+        save_config(config)
 
 def get_max_backups():
     return int(get_config_value("Settings", "max_backups", 5))
@@ -58,6 +113,33 @@ def get_max_backups():
 def save_max_backups(value: int):
     set_config_value("Settings", "max_backups", str(value))
 
+def get_retention_policy():
+    config = get_config()
+    if config.get("Settings", "retention_mode", fallback="count") != "tiered":
+        return None
+    return {
+        "hours": config.getint("Settings", "keep_all_hours", fallback=24),
+        "daily": config.getint("Settings", "keep_daily", fallback=7),
+        "weekly": config.getint("Settings", "keep_weekly", fallback=4),
+        "monthly": config.getint("Settings", "keep_monthly", fallback=12),
+    }
+
+def save_retention_policy(policy):
+    with settings_lock():
+        config = get_config()
+        if "Settings" not in config:
+            config["Settings"] = {}
+        config["Settings"]["retention_mode"] = "tiered" if policy else "count"
+        if policy:
+            config["Settings"]["keep_all_hours"] = str(policy["hours"])
+            config["Settings"]["keep_daily"] = str(policy["daily"])
+            config["Settings"]["keep_weekly"] = str(policy["weekly"])
+            config["Settings"]["keep_monthly"] = str(policy["monthly"])
+        save_config(config)
+
+def get_max_concurrent_backups():
+    return max(1, int(get_config_value("Settings", "max_concurrent_backups", 1)))
+
 def get_theme_mode():
     return get_config_value("Settings", "theme", "dark")
 
@@ -70,6 +152,121 @@ def get_minimize_to_tray() -> bool:
 def save_minimize_to_tray(flag: bool):
     set_config_value("Settings", "minimize_to_tray", str(flag).lower())
 
+def get_admission_settings():
+    config = get_config()
+    processes = config.get("Settings", "game_process_names", fallback="")
+    return {
+        "defer_window_minutes": config.getint("Settings", "defer_window_minutes", fallback=60),
+        "max_disk_busy": config.getfloat("Settings", "max_disk_busy", fallback=50.0),
+        "max_cpu_load": config.getfloat("Settings", "max_cpu_load", fallback=75.0),
+        "min_idle_minutes": config.getint("Settings", "min_idle_minutes", fallback=0),
+        "game_processes": [p.strip() for p in processes.split(";") if p.strip()],
+    }
+
+def get_scrub_settings():
+    config = get_config()
+    return {
+        "cadence_days": config.getint("Settings", "scrub_cadence_days", fallback=7),
+        "rate_limit_mb": config.getint("Settings", "scrub_rate_mb", fallback=20),
+    }
+
+def get_compaction_settings():
+    config = get_config()
+    return {
+        "enabled": config.getboolean("Settings", "compact_old_backups", fallback=False),
+        "min_age_days": config.getint("Settings", "compact_after_days", fallback=30),
+    }
+
+def save_compact_old_backups(flag: bool):
+    set_config_value("Settings", "compact_old_backups", str(flag).lower())
+
+def get_cc_backup_enabled() -> bool:
+    return get_config_value("Settings", "backup_custom_content", "false").lower() == "true"
+
+def save_cc_backup_enabled(flag: bool):
+    set_config_value("Settings", "backup_custom_content", str(flag).lower())
+
+def get_save_rotations_kept():
+    return int(get_config_value("Settings", "save_rotations_kept", -1))
+
+def save_save_rotations_kept(value: int):
+    set_config_value("Settings", "save_rotations_kept", str(value))
+
+def get_pack_small_files() -> bool:
+    return get_config_value("Settings", "pack_small_files", "false").lower() == "true"
+
+def save_pack_small_files(flag: bool):
+    set_config_value("Settings", "pack_small_files", str(flag).lower())
+
+def get_diagnostics_next_run() -> bool:
+    return get_config_value("Settings", "diagnostics_next_run", "false").lower() == "true"
+
+def save_diagnostics_next_run(flag: bool):
+    set_config_value("Settings", "diagnostics_next_run", str(flag).lower())
+
+def get_standby_settings():
+    config = get_config()
+    return {
+        "enabled": config.getboolean("Settings", "warm_standby", fallback=False),
+        "max_mb": config.getint("Settings", "warm_standby_max_mb", fallback=4096),
+    }
+
+def save_warm_standby(flag: bool):
+    set_config_value("Settings", "warm_standby", str(flag).lower())
+
+def get_verify_after_backup() -> bool:
+    return get_config_value("Settings", "verify_after_backup", "false").lower() == "true"
+
+def save_verify_after_backup(flag: bool):
+    set_config_value("Settings", "verify_after_backup", str(flag).lower())
+
+def get_offsite_settings():
+    config = get_config()
+    if not config.getboolean("Offsite", "enabled", fallback=False):
+        return None
+    settings = {
+        "endpoint": config.get("Offsite", "endpoint", fallback="").strip(),
+        "bucket": config.get("Offsite", "bucket", fallback="").strip(),
+        "region": config.get("Offsite", "region", fallback="us-east-1").strip(),
+        "access_key": config.get("Offsite", "access_key", fallback="").strip(),
+        "secret_key": config.get("Offsite", "secret_key", fallback="").strip(),
+        "prefix": config.get("Offsite", "prefix", fallback="SimsBackupUtility").strip(),
+        "part_size_mb": config.getint("Offsite", "part_size_mb", fallback=8),
+        "parallel_uploads": config.getint("Offsite", "parallel_uploads", fallback=4),
+        "bandwidth_limit_kb": config.getint("Offsite", "bandwidth_limit_kb", fallback=0),
+        "mirror_deletes": config.getboolean("Offsite", "mirror_deletes", fallback=True),
+    }
+    if not (settings["endpoint"] and settings["bucket"] and settings["access_key"] and settings["secret_key"]):
+        return None
+    return settings
+
+def get_peer_settings():
+    config = get_config()
+    if not config.getboolean("Peer", "enabled", fallback=False):
+        return None
+    secret = config.get("Peer", "secret", fallback="").strip()
+    if not secret:
+        return None
+    port = config.getint("Peer", "port", fallback=47321)
+    peers = []
+    for entry in config.get("Peer", "peers", fallback="").split(";"):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, _, peer_port = entry.rpartition(":") if ":" in entry else (entry, "", "")
+        peers.append((host, int(peer_port) if peer_port else port))
+    return {
+        "port": port,
+        "secret": secret,
+        "peers": peers,
+        "bind": config.get("Peer", "bind", fallback="").strip(),
+        "allow_public": config.getboolean("Peer", "allow_public", fallback=False),
+        "interval_minutes": max(1, config.getint("Peer", "interval_minutes", fallback=30)),
+    }
+
+def get_quiet_backup_seconds():
+    return int(get_config_value("Settings", "backup_on_quiet_seconds", 0))
+
 def get_update_available():
     return get_config_value("General", "update_available", "false").lower() == "true"
 
@@ -93,6 +290,32 @@ def save_default_backup_path(game_name: str, path: str):
     key = game_key(game_name)
     set_config_value(f"Path:{key}", "default_backup_path", path)
 
+def get_extra_backup_paths(game_name: str):
+    key = game_key(game_name)
+    raw = get_config_value(f"Path:{key}", "extra_backup_paths", "")
+    return [p.strip() for p in raw.split(";") if p.strip()]
+
+def save_extra_backup_paths(game_name: str, paths):
+    key = game_key(game_name)
+    set_config_value(f"Path:{key}", "extra_backup_paths", ";".join(paths))
+
+def get_game_folder_overrides():
+    config = get_config()
+    overrides = {}
+    for g in GAMES:
+        value = config.get(f"Path:{game_key(g)}", "game_folder", fallback="").strip()
+        if value:
+            overrides[g.strip().lower()] = value
+    return overrides
+
+def save_game_folder_override(game_name: str, path: str):
+    key = game_key(game_name)
+    set_config_value(f"Path:{key}", "game_folder", path)
+
+def get_extra_game_roots():
+    raw = get_config_value("Settings", "extra_game_roots", "")
+    return [p.strip() for p in raw.split(";") if p.strip()]
+
 def get_last_selected_game():
     return get_config_value("Settings", "last_selected_game", "Sims 4")
 
@@ -100,55 +323,104 @@ def save_last_selected_game(game_name: str):
     set_config_value("Settings", "last_selected_game", game_name)
 
 def write_log_file(message: str):
-    APPDATA_DIR.mkdir(parents=True, exist_ok=True)
-    now = datetime.now()
-    today_prefix = now.strftime("[%Y-%m-%d")
-    timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"[{timestamp}] {message}"
-
-    existing = []
-    if LOGFILE_PATH.exists():
-        with open(LOGFILE_PATH, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.startswith(today_prefix):
-                    existing.append(line.rstrip("\n"))
-
-    existing.append(log_entry)
-
-    with open(LOGFILE_PATH, "w", encoding="utf-8") as f:
-        for line in existing:
-            f.write(line + "\n")
-
-def get_schedule_config():
-    config = get_config()
-    if "Schedule" not in config:
-        return None
-    mode = config["Schedule"].get("mode", "")
+    with settings_lock():
+        APPDATA_DIR.mkdir(parents=True, exist_ok=True)
+        now = datetime.now()
+        today_prefix = now.strftime("[%Y-%m-%d")
+        timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+        log_entry = f"[{timestamp}] {message}"
+
+        existing = []
+        if LOGFILE_PATH.exists():
+            with open(LOGFILE_PATH, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith(today_prefix):
+                        existing.append(line.rstrip("\n"))
+
+        existing.append(log_entry)
+
+        with open(LOGFILE_PATH, "w", encoding="utf-8") as f:
+            for line in existing:
+                f.write(line + "\n")
+
+def _parse_schedule_section(section):
+    mode = section.get("mode", "")
     if mode == "interval":
-        return {"mode": "interval", "hours": config["Schedule"].getint("hours", 6)}
+        schedule = {"mode": "interval", "hours": section.getint("hours", 6)}
     elif mode == "daily":
-        time_str = config["Schedule"].get("time", "12:00")
+        time_str = section.get("time", "12:00")
         try:
             h, m = map(int, time_str.split(":"))
         except ValueError:
             h, m = 12, 0
-        return {"mode": "daily", "time": (h, m)}
-    return None
+        schedule = {"mode": "daily", "time": (h, m)}
+    elif mode == "cron":
+        schedule = {"mode": "cron", "cron": section.get("cron", "")}
+    else:
+        return None
+    last_run = section.get("last_run", "")
+    try:
+        schedule["last_run"] = datetime.fromisoformat(last_run) if last_run else None
+    except ValueError:
+        schedule["last_run"] = None
+    return schedule
 
-def save_schedule_config(schedule: dict):
-    config = get_config()
+def _migrate_legacy_schedule(config):
     if "Schedule" not in config:
-        config["Schedule"] = {}
-    config["Schedule"]["mode"] = schedule["mode"]
-    if schedule["mode"] == "interval":
-        config["Schedule"]["hours"] = str(schedule["hours"])
-    elif schedule["mode"] == "daily":
-        h, m = schedule["time"]
-        config["Schedule"]["time"] = f"{h:02d}:{m:02d}"
+        return
+    key = game_key(config.get("Settings", "last_selected_game", fallback="Sims 4"))
+    if f"Schedule:{key}" not in config:
+        config[f"Schedule:{key}"] = dict(config["Schedule"])
+    config.remove_section("Schedule")
     save_config(config)
 
-def clear_schedule_config():
-    config = get_config()
-    if "Schedule" in config:
-        config.remove_section("Schedule")
-        save_config(config)
\ No newline at end of file
+def get_schedule_jobs():
+    with settings_lock():
+        config = get_config()
+        _migrate_legacy_schedule(config)
+        jobs = {}
+        for g in GAMES:
+            section = f"Schedule:{game_key(g)}"
+            if section in config:
+                schedule = _parse_schedule_section(config[section])
+                if schedule:
+                    jobs[g] = schedule
+        return jobs
+
+def get_schedule_config(game_name: str):
+    return get_schedule_jobs().get(game_name)
+
+def save_schedule_config(schedule: dict, game_name: str):
+    with settings_lock():
+        config = get_config()
+        _migrate_legacy_schedule(config)
+        section = f"Schedule:{game_key(game_name)}"
+        last_run = config.get(section, "last_run", fallback="")
+        config[section] = {"mode": schedule["mode"]}
+        if schedule["mode"] == "interval":
+            config[section]["hours"] = str(schedule["hours"])
+        elif schedule["mode"] == "daily":
+            h, m = schedule["time"]
+            config[section]["time"] = f"{h:02d}:{m:02d}"
+        elif schedule["mode"] == "cron":
+            config[section]["cron"] = schedule["cron"]
+        if last_run:
+            config[section]["last_run"] = last_run
+        save_config(config)
+
+def set_schedule_last_run(game_name: str, when: datetime):
+    with settings_lock():
+        config = get_config()
+        section = f"Schedule:{game_key(game_name)}"
+        if section in config:
+            config[section]["last_run"] = when.isoformat(timespec="seconds")
+            save_config(config)
+
+def clear_schedule_config(game_name: str):
+    with settings_lock():
+        config = get_config()
+        _migrate_legacy_schedule(config)
+        section = f"Schedule:{game_key(game_name)}"
+        if section in config:
+            config.remove_section(section)
+            save_config(config)
@@ -0,0 +1,144 @@
+import sys
+from PySide6.QtCore import QObject, QCoreApplication, QTimer
+from PySide6.QtNetwork import QLocalServer, QLocalSocket
+
+from ipc import server_name, encode_message, decode_lines
+from engine import BackupEngine
+from job_queue import PRIORITY_MANUAL, PRIORITY_SCHEDULED
+from config_utils import write_log_file
+
+
+class BackupDaemon(QObject):
+    def __init__(self, parent=None, name=None):
+        super().__init__(parent)
+        self.name = name or server_name()
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self._on_new_connection)
+        self.buffers = {}
+        self.subscribers = []
+        self._last_percent = {}
+
+        self.engine = BackupEngine(self)
+        self.engine.queue_changed.connect(self._broadcast_queue)
+        self.engine.job_done.connect(lambda g, s: self.broadcast({"event": "done", "game": g, "summary": s}))
+        self.engine.job_failed.connect(lambda g, m: self.broadcast({"event": "failed", "game": g, "message": m}))
+        self.engine.job_progress.connect(self._on_progress)
+        self.engine.skipped.connect(lambda g, m: self.broadcast({"event": "skipped", "game": g, "message": m}))
+        self.engine.corrupt_found.connect(
+            lambda path, error: self.broadcast({"event": "corrupt", "path": path, "message": error})
+        )
+
+    def start(self):
+        if not self.server.listen(self.name):
+            if daemon_running(self.name):
+                write_log_file("Background service is already running, exiting.")
+                return False
+            QLocalServer.removeServer(self.name)
+            if not self.server.listen(self.name):
+                write_log_file(f"[ERROR] Background service could not listen: {self.server.errorString()}")
+                return False
+        write_log_file("Background service started.")
+        self.engine.start()
+        return True
+
+    def stop(self):
+        self.engine.stop()
+        self.engine.queue.cancel_all()
+        for socket in list(self.buffers):
+            socket.blockSignals(True)
+        self.server.close()
+
+    def handle(self, socket, message):
+        cmd = message.get("cmd")
+        if cmd == "status":
+            return self.engine.status()
+        if cmd == "trigger":
+            priority = PRIORITY_SCHEDULED if message.get("priority") == "scheduled" else PRIORITY_MANUAL
+            return {"ok": self.engine.trigger(message.get("game", ""), priority)}
+        if cmd == "cancel":
+            game = message.get("game")
+            if game:
+                self.engine.queue.cancel(game)
+            else:
+                self.engine.queue.cancel_all()
+            return {"ok": True}
+        if cmd == "reserve":
+            return {"ok": self.engine.queue.reserve(message.get("game", ""), socket)}
+        if cmd == "release":
+            self.engine.queue.release(message.get("game", ""), socket)
+            return {"ok": True}
+        if cmd == "backup_finished":
+            self.engine.after_backup(message.get("game", ""))
+            return {"ok": True}
+        if cmd == "reload":
+            self.engine.reload()
+            return {"ok": True}
+        if cmd == "subscribe":
+            if socket not in self.subscribers:
+                self.subscribers.append(socket)
+            socket.write(encode_message({"event": "queue", "state": self.engine.state_text()}))
+            return None
+        if cmd == "shutdown":
+            QTimer.singleShot(0, QCoreApplication.instance().quit)
+            return {"ok": True}
+        return {"ok": False, "error": f"Unknown command: {cmd}"}
+
+    def broadcast(self, event):
+        data = encode_message(event)
+        for socket in list(self.subscribers):
+            if socket.state() == QLocalSocket.ConnectedState:
+                socket.write(data)
+            else:
+                self.subscribers.remove(socket)
+
+    def _on_progress(self, game, value, maximum):
+        percent = int(value * 100 / maximum) if maximum else 0
+        if self._last_percent.get(game) == percent and value != maximum:
+            return
+        self._last_percent[game] = percent
+        self.broadcast({"event": "progress", "game": game, "value": value, "max": maximum})
+
+    def _broadcast_queue(self):
+        self.broadcast({"event": "queue", "state": self.engine.state_text()})
+
+    def _on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self.buffers[socket] = bytearray()
+            socket.readyRead.connect(lambda s=socket: self._on_ready_read(s))
+            socket.disconnected.connect(lambda s=socket: self._on_disconnected(s))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def _on_ready_read(self, socket):
+        buffer = self.buffers.setdefault(socket, bytearray())
+        buffer += bytes(socket.readAll())
+        for message in decode_lines(buffer):
+            reply = self.handle(socket, message)
+            if reply is not None:
+                socket.write(encode_message(reply))
+
+    def _on_disconnected(self, socket):
+        self.buffers.pop(socket, None)
+        self.engine.queue.release_owner(socket)
+        if socket in self.subscribers:
+            self.subscribers.remove(socket)
+
+
+def daemon_running(name=None):
+    probe = QLocalSocket()
+    probe.connectToServer(name or server_name())
+    if probe.waitForConnected(500):
+        probe.disconnectFromServer()
+        return True
+    return False
+
+
+def run_daemon():
+    app = QCoreApplication(sys.argv)
+    if daemon_running():
+        return 0
+    daemon = BackupDaemon()
+    if not daemon.start():
+        return 0 if daemon_running() else 1
+    app.aboutToQuit.connect(daemon.stop)
+    return app.exec()
@@ -0,0 +1,98 @@
+import io
+import pstats
+import zipfile
+import cProfile
+import tracemalloc
+from datetime import datetime
+
+from paths import APPDATA_DIR
+from config_utils import LOGFILE_PATH, get_diagnostics_next_run, save_diagnostics_next_run, write_log_file
+
+
+TOP_ALLOCATIONS = 50
+TOP_FUNCTIONS = 40
+TRACE_FRAMES = 10
+LOG_TAIL_BYTES = 256 * 1024
+
+
+def claim_diagnostics_run():
+    if not get_diagnostics_next_run():
+        return False
+    save_diagnostics_next_run(False)
+    return True
+
+
+def allocation_report(before, after):
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+    before, after = before.filter_traces(ignore), after.filter_traces(ignore)
+    lines = []
+    lines.append(f"Top {TOP_ALLOCATIONS} allocation growth by line")
+    for stat in after.compare_to(before, "lineno")[:TOP_ALLOCATIONS]:
+        lines.append(str(stat))
+    lines.append("")
+    lines.append(f"Top {TOP_ALLOCATIONS // 5} allocation sites by traceback")
+    for stat in after.compare_to(before, "traceback")[:TOP_ALLOCATIONS // 5]:
+        lines.append(f"{stat.size_diff / 1024:.1f} KiB in {stat.count_diff} blocks")
+        lines.extend(f"    {line}" for line in stat.traceback.format())
+    return "\n".join(lines) + "\n"
+
+
+def profile_summary(profile):
+    out = io.StringIO()
+    stats = pstats.Stats(profile, stream=out)
+    stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    stats.sort_stats("tottime").print_stats(TOP_FUNCTIONS)
+    return out.getvalue()
+
+
+def log_tail():
+    try:
+        with open(LOGFILE_PATH, "rb") as f:
+            f.seek(0, 2)
+            f.seek(max(0, f.tell() - LOG_TAIL_BYTES))
+            return f.read()
+    except OSError:
+        return b""
+
+
+def write_capture(title, profile, before, after, peak, elapsed):
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base = APPDATA_DIR / f"sbu_diagnostics_{stamp}"
+    prof_path = base.with_suffix(".prof")
+    report_path = base.with_name(base.name + "_allocations.txt")
+    zip_path = base.with_suffix(".zip")
+    profile.dump_stats(prof_path)
+    report = (f"{title}\nDuration: {elapsed:.2f}s\nPeak traced memory: {peak / (1024 * 1024):.1f} MB\n\n"
+              + allocation_report(before, after))
+    report_path.write_text(report, encoding="utf-8")
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
+        zipf.write(prof_path, prof_path.name)
+        zipf.write(report_path, report_path.name)
+        zipf.writestr("profile_summary.txt", profile_summary(profile))
+        zipf.writestr(LOGFILE_PATH.name, log_tail())
+    return zip_path
+
+
+def run_with_diagnostics(title, fn):
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(TRACE_FRAMES)
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    profile = cProfile.Profile()
+    started = datetime.now()
+    profile.enable()
+    try:
+        return fn()
+    finally:
+        profile.disable()
+        elapsed = (datetime.now() - started).total_seconds()
+        after = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        if started_tracing:
+            tracemalloc.stop()
+        try:
+            path = write_capture(title, profile, before, after, peak, elapsed)
+            write_log_file(f"Diagnostics for {title} saved to {path}")
+        except OSError as e:
+            write_log_file(f"[ERROR] Could not save diagnostics for {title}: {e}")
@@ -0,0 +1,176 @@
+import os
+import json
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from paths import APPDATA_DIR, get_documents_dirs, get_local_appdata_dir
+from config_utils import CONFIG_PATH, get_game_folder_overrides, get_extra_game_roots
+
+
+DISCOVERY_CACHE_PATH = APPDATA_DIR / "discovery_cache.json"
+
+DOCUMENTS_CANDIDATES = {
+    "sims 4": [Path("Electronic Arts") / "The Sims 4", Path("The Sims 4")],
+    "sims 3": [Path("Electronic Arts") / "The Sims 3", Path("The Sims 3")],
+    "sims medieval": [Path("Electronic Arts") / "The Sims Medieval", Path("The Sims Medieval")],
+}
+
+LOCALAPPDATA_CANDIDATES = {
+    "mysims": [Path("Electronic Arts") / "MySims"],
+    "mysims kingdom": [Path("Electronic Arts") / "MySims Kingdom"],
+}
+
+_lock = threading.Lock()
+_discovered = None
+_overrides = None
+
+
+def _override(game_name: str):
+    global _overrides
+    try:
+        stamp = CONFIG_PATH.stat().st_mtime_ns
+    except OSError:
+        stamp = None
+    with _lock:
+        if _overrides is None or _overrides[0] != stamp:
+            _overrides = (stamp, get_game_folder_overrides())
+        value = _overrides[1].get(game_name.strip().lower())
+    return Path(value) if value else None
+
+
+def _scan_roots():
+    docs = get_documents_dirs()
+    local = [get_local_appdata_dir()]
+    extra = [Path(p) for p in get_extra_game_roots()]
+    return docs, local, extra
+
+
+def _probes(docs, local, extra):
+    probes = []
+    for g, subs in DOCUMENTS_CANDIDATES.items():
+        for base in docs:
+            probes.extend((g, base / sub) for sub in subs)
+    for g, subs in LOCALAPPDATA_CANDIDATES.items():
+        for base in local:
+            probes.extend((g, base / sub) for sub in subs)
+    for base in extra:
+        for g, subs in {**DOCUMENTS_CANDIDATES, **LOCALAPPDATA_CANDIDATES}.items():
+            seen = []
+            for sub in subs:
+                for candidate in (base / sub, base / sub.name):
+                    if candidate not in seen:
+                        seen.append(candidate)
+                        probes.append((g, candidate))
+    return probes
+
+
+def _root_signature(roots):
+    sig = {}
+    for root in roots:
+        for p in (root, root / "Electronic Arts"):
+            try:
+                sig[str(p)] = p.stat().st_mtime_ns
+            except OSError:
+                sig[str(p)] = None
+    return sig
+
+
+def scan_game_folders():
+    docs, local, extra = _scan_roots()
+    probes = _probes(docs, local, extra)
+    with ThreadPoolExecutor(max_workers=min(16, max(1, len(probes)))) as pool:
+        exists = list(pool.map(lambda probe: probe[1].is_dir(), probes))
+
+    found = {g: [] for g in (*DOCUMENTS_CANDIDATES, *LOCALAPPDATA_CANDIDATES)}
+    for (g, candidate), ok in zip(probes, exists):
+        if ok and str(candidate) not in found[g]:
+            found[g].append(str(candidate))
+
+    return {
+        "signature": _root_signature([*docs, *local, *extra]),
+        "games": found,
+    }
+
+
+def _load_cache():
+    try:
+        with open(DISCOVERY_CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cache(data):
+    try:
+        APPDATA_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = DISCOVERY_CACHE_PATH.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, DISCOVERY_CACHE_PATH)
+    except OSError:
+        pass
+
+
+def _cache_is_valid(data):
+    if not data or "signature" not in data or "games" not in data:
+        return False
+    docs, local, extra = _scan_roots()
+    if data["signature"] != _root_signature([*docs, *local, *extra]):
+        return False
+    for folders in data["games"].values():
+        if folders and not Path(folders[0]).is_dir():
+            return False
+    return True
+
+
+def discover_games(refresh=False):
+    global _discovered
+    with _lock:
+        if _discovered is not None and not refresh:
+            return _discovered
+        data = None if refresh else _load_cache()
+        if not _cache_is_valid(data):
+            data = scan_game_folders()
+            _save_cache(data)
+        _discovered = {g: [Path(p) for p in folders] for g, folders in data["games"].items()}
+        return _discovered
+
+
+def invalidate_discovery():
+    global _discovered
+    with _lock:
+        _discovered = None
+        try:
+            DISCOVERY_CACHE_PATH.unlink()
+        except OSError:
+            pass
+
+
+def _default_folder(g: str) -> Path:
+    if g in LOCALAPPDATA_CANDIDATES:
+        return get_local_appdata_dir() / LOCALAPPDATA_CANDIDATES[g][0]
+    docs = get_documents_dirs()
+    base = docs[0] if docs else Path.home() / "Documents"
+    return base / DOCUMENTS_CANDIDATES.get(g, DOCUMENTS_CANDIDATES["sims 4"])[0]
+
+
+def get_game_folder(game_name: str) -> Path:
+    override = _override(game_name)
+    if override:
+        return override
+    g = game_name.strip().lower()
+    if g not in DOCUMENTS_CANDIDATES and g not in LOCALAPPDATA_CANDIDATES:
+        g = "sims 4"
+    folders = discover_games().get(g)
+    if folders:
+        return folders[0]
+    return _default_folder(g)
+
+
+def find_game_folder(game_name: str) -> Path:
+    root = get_game_folder(game_name)
+    if not root.exists() and discover_games().get(game_name.strip().lower()):
+        invalidate_discovery()
+        root = get_game_folder(game_name)
+    return root
@@ -0,0 +1,178 @@
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+import requests
+
+
+BUFFER_SIZE = 1024 * 1024
+SEGMENT_COUNT = 4
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+STATE_SAVE_BYTES = 4 * 1024 * 1024
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+def sha256_of(path, buffer_size=BUFFER_SIZE):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(buffer_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def plan_segments(size, count=SEGMENT_COUNT, min_size=MIN_SEGMENT_SIZE):
+    count = max(1, min(count, size // min_size or 1))
+    step = size // count
+    segments = []
+    for i in range(count):
+        start = i * step
+        end = size - 1 if i == count - 1 else start + step - 1
+        segments.append({"start": start, "end": end, "done": 0})
+    return segments
+
+
+class SegmentedDownload:
+    def __init__(self, url, dest, expected_sha256=None, session=None,
+                 segments=SEGMENT_COUNT, progress=None, cancel_event=None):
+        self.url = url
+        self.dest = Path(dest)
+        self.part_path = self.dest.with_name(self.dest.name + ".part")
+        self.state_path = self.dest.with_name(self.dest.name + ".part.json")
+        self.expected_sha256 = expected_sha256.lower() if expected_sha256 else None
+        self.session = session or requests.Session()
+        self.segment_count = segments
+        self.progress = progress
+        self.cancel_event = cancel_event or threading.Event()
+        self._lock = threading.Lock()
+        self._state = None
+        self._unsaved = 0
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _probe(self):
+        r = self.session.head(self.url, allow_redirects=True, timeout=10)
+        r.raise_for_status()
+        size = int(r.headers.get("Content-Length", 0) or 0)
+        ranges = r.headers.get("Accept-Ranges", "").lower() == "bytes"
+        return r.url, size, ranges, r.headers.get("ETag") or r.headers.get("Last-Modified")
+
+    def _load_state(self, size, validator):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (state.get("url") != self.url or state.get("size") != size
+                or state.get("validator") != validator or not self.part_path.exists()
+                or self.part_path.stat().st_size != size):
+            return None
+        return state
+
+    def _save_state(self):
+        tmp = self.state_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._state, f)
+        os.replace(tmp, self.state_path)
+
+    def _downloaded(self):
+        return sum(seg["done"] for seg in self._state["segments"])
+
+    def _report(self):
+        if self.progress:
+            self.progress(self._downloaded(), self._state["size"])
+
+    def _fetch_segment(self, url, seg):
+        offset = seg["start"] + seg["done"]
+        if offset > seg["end"]:
+            return
+        headers = {"Range": f"bytes={offset}-{seg['end']}"}
+        with self.session.get(url, headers=headers, stream=True, timeout=30) as r:
+            if r.status_code != 206:
+                raise requests.HTTPError(f"Server ignored range request ({r.status_code})")
+            with open(self.part_path, "r+b", buffering=0) as f:
+                f.seek(offset)
+                for block in r.iter_content(chunk_size=BUFFER_SIZE):
+                    if self.cancel_event.is_set():
+                        raise DownloadCancelled()
+                    if not block:
+                        continue
+                    f.write(block)
+                    with self._lock:
+                        seg["done"] += len(block)
+                        self._unsaved += len(block)
+                        if self._unsaved >= STATE_SAVE_BYTES:
+                            self._save_state()
+                            self._unsaved = 0
+                        self._report()
+
+    def _download_ranged(self, url, size, validator):
+        self._state = self._load_state(size, validator)
+        if self._state is None:
+            with open(self.part_path, "wb") as f:
+                f.truncate(size)
+            self._state = {
+                "url": self.url, "size": size, "validator": validator,
+                "segments": plan_segments(size, self.segment_count),
+            }
+            self._save_state()
+        self._report()
+        pending = [seg for seg in self._state["segments"] if seg["start"] + seg["done"] <= seg["end"]]
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, len(pending))) as pool:
+                futures = [pool.submit(self._fetch_segment, url, seg) for seg in pending]
+                done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+                if any(future.exception() is not None for future in done):
+                    self.cancel_event.set()
+                wait(futures)
+        finally:
+            with self._lock:
+                self._save_state()
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        for error in errors:
+            if not isinstance(error, DownloadCancelled):
+                raise error
+        if errors:
+            raise errors[0]
+
+    def _download_single(self, url):
+        with self.session.get(url, stream=True, timeout=30) as r:
+            r.raise_for_status()
+            total = int(r.headers.get("Content-Length", 0) or 0)
+            done = 0
+            with open(self.part_path, "wb") as f:
+                for block in r.iter_content(chunk_size=BUFFER_SIZE):
+                    if self.cancel_event.is_set():
+                        raise DownloadCancelled()
+                    if block:
+                        f.write(block)
+                        done += len(block)
+                        if self.progress:
+                            self.progress(done, total)
+
+    def run(self):
+        url, size, ranges, validator = self._probe()
+        if ranges and size > 0:
+            self._download_ranged(url, size, validator)
+        else:
+            self._download_single(url)
+
+        if self.expected_sha256:
+            actual = sha256_of(self.part_path)
+            if actual != self.expected_sha256:
+                self.part_path.unlink(missing_ok=True)
+                self.state_path.unlink(missing_ok=True)
+                raise ChecksumMismatch(f"SHA-256 mismatch: expected {self.expected_sha256}, got {actual}")
+
+        os.replace(self.part_path, self.dest)
+        self.state_path.unlink(missing_ok=True)
+        return self.dest
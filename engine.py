@@ -0,0 +1,111 @@
+from pathlib import Path
+from PySide6.QtCore import QObject, Signal
+
+from scheduler import BackupScheduler
+from admission import AdmissionGate
+from scrubber import ScrubService
+from offsite import OffsiteService
+from peer_sync import PeerService
+from compactor import CompactionService
+from standby import StandbyService
+from watcher import WatcherService
+from job_queue import BackupQueue, PRIORITY_MANUAL, PRIORITY_SCHEDULED
+from config_utils import get_default_backup_path, write_log_file
+
+
+class BackupEngine(QObject):
+    queue_changed = Signal()
+    job_done = Signal(str, str)
+    job_failed = Signal(str, str)
+    job_progress = Signal(str, int, int)
+    skipped = Signal(str, str)
+    corrupt_found = Signal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.running = False
+
+        self.watcher = WatcherService(parent=self)
+        self.watcher.game_quiet.connect(lambda game: self.trigger(game, PRIORITY_SCHEDULED))
+
+        self.queue = BackupQueue(self, watcher=self.watcher)
+        self.queue.queue_changed.connect(self.queue_changed.emit)
+        self.queue.job_done.connect(self.job_done.emit)
+        self.queue.job_failed.connect(self.job_failed.emit)
+        self.queue.job_progress.connect(self.job_progress.emit)
+
+        self.admission = AdmissionGate(parent=self)
+        self.admission.admitted.connect(lambda game: self.trigger(game, PRIORITY_SCHEDULED))
+        self.scheduler = BackupScheduler(self)
+        self.scheduler.job_due.connect(self.admission.submit)
+
+        self.scrubber = ScrubService(self)
+        self.scrubber.corrupt_found.connect(self.corrupt_found.emit)
+
+        self.offsite = OffsiteService(self)
+        self.standby = StandbyService(self)
+        self.queue.job_done.connect(lambda game, _: self.after_backup(game))
+
+        self.peers = PeerService(self)
+
+        self.compactor = CompactionService(
+            self, busy=lambda: bool(self.queue.running or self.queue.pending or self.queue.reserved)
+        )
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.watcher.start()
+        self.scheduler.reload()
+        self.scrubber.start()
+        self.peers.start()
+        self.compactor.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.scheduler.stop()
+        self.scrubber.stop()
+        self.offsite.stop()
+        self.standby.stop()
+        self.peers.stop()
+        self.compactor.stop()
+        self.watcher.stop()
+
+    def reload(self):
+        self.scheduler.reload()
+        if self.running:
+            self.watcher.refresh()
+
+    def trigger(self, game, priority=PRIORITY_MANUAL):
+        folder = get_default_backup_path(game)
+        if not folder or not Path(folder).exists():
+            message = f"No folder set for {game}"
+            write_log_file(f"[Scheduled Backup] {message}, skipping.")
+            self.skipped.emit(game, message)
+            return False
+        self.queue.enqueue(game, folder, priority)
+        return True
+
+    def after_backup(self, game):
+        self.offsite.replicate(game)
+        self.standby.refresh(game)
+
+    def is_busy(self, game):
+        return self.queue.is_busy(game)
+
+    def state_text(self):
+        return self.queue.state_text()
+
+    def status(self):
+        return {
+            "ok": True,
+            "state": self.queue.state_text(),
+            "running": list(self.queue.running),
+            "pending": list(self.queue.pending),
+            "reserved": list(self.queue.reserved),
+            "deferred": list(self.admission.deferred),
+            "next_run_seconds": self.scheduler.seconds_until_next(),
+        }
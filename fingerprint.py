@@ -0,0 +1,139 @@
+import os
+import time
+import sqlite3
+import hashlib
+from pathlib import Path
+
+from paths import APPDATA_DIR
+
+
+FINGERPRINT_DB_PATH = APPDATA_DIR / "fingerprints.db"
+HASH_SIZE = 16
+READ_CHUNK = 1024 * 1024
+MAX_FILE_ENTRIES = 250000
+EVICT_BATCH = 25000
+
+
+def hash_file(path, chunk_size=READ_CHUNK) -> bytes:
+    h = hashlib.blake2b(digest_size=HASH_SIZE)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.digest()
+
+
+def manifest_digest(entries) -> bytes:
+    h = hashlib.blake2b(digest_size=HASH_SIZE)
+    for arcname, digest in sorted(entries):
+        h.update(arcname.encode("utf-8", "surrogatepass"))
+        h.update(b"\0")
+        h.update(digest)
+    return h.digest()
+
+
+class FingerprintCache:
+    def __init__(self, db_path=FINGERPRINT_DB_PATH):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER,
+                inode INTEGER, hash BLOB, last_used INTEGER
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS files_last_used ON files(last_used);
+            CREATE TABLE IF NOT EXISTS archives (
+                path TEXT PRIMARY KEY, folder TEXT, game TEXT, digest BLOB, created INTEGER
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS archive_entries (
+                archive TEXT, arcname TEXT, hash BLOB, PRIMARY KEY (archive, arcname)
+            ) WITHOUT ROWID;
+        """)
+        self._now = int(time.time())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        try:
+            self._evict()
+            self.conn.commit()
+        finally:
+            self.conn.close()
+
+    def _evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        if count > MAX_FILE_ENTRIES:
+            self.conn.execute(
+                "DELETE FROM files WHERE path IN (SELECT path FROM files ORDER BY last_used LIMIT ?)",
+                (count - MAX_FILE_ENTRIES + EVICT_BATCH,)
+            )
+
+    def lookup(self, path, st=None):
+        path = str(path)
+        st = st or os.stat(path)
+        row = self.conn.execute(
+            "SELECT hash FROM files WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+            (path, st.st_size, st.st_mtime_ns, st.st_ino)
+        ).fetchone()
+        if row:
+            self.conn.execute("UPDATE files SET last_used = ? WHERE path = ?", (self._now, path))
+            return row[0]
+        return None
+
+    def put(self, path, digest, st=None):
+        path = str(path)
+        st = st or os.stat(path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, hash, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, st.st_size, st.st_mtime_ns, st.st_ino, digest, self._now)
+        )
+
+    def fingerprint(self, path) -> bytes:
+        st = os.stat(path)
+        digest = self.lookup(path, st)
+        if digest is None:
+            digest = hash_file(path)
+            self.put(path, digest, st)
+        return digest
+
+    def record_archive(self, archive, game, entries):
+        archive = str(Path(archive).resolve())
+        self.conn.execute(
+            "INSERT OR REPLACE INTO archives (path, folder, game, digest, created) VALUES (?, ?, ?, ?, ?)",
+            (archive, str(Path(archive).parent), game, manifest_digest(entries), int(time.time()))
+        )
+        self.conn.execute("DELETE FROM archive_entries WHERE archive = ?", (archive,))
+        self.conn.executemany(
+            "INSERT INTO archive_entries (archive, arcname, hash) VALUES (?, ?, ?)",
+            [(archive, arcname, digest) for arcname, digest in entries]
+        )
+        self.conn.commit()
+
+    def latest_archive_digest(self, folder, game):
+        rows = self.conn.execute(
+            "SELECT path, digest FROM archives WHERE folder = ? AND game = ? ORDER BY created DESC",
+            (str(Path(folder).resolve()), game)
+        ).fetchall()
+        for path, digest in rows:
+            if Path(path).exists():
+                return path, digest
+            self.forget_archive(path)
+        return None, None
+
+    def archive_manifest(self, archive):
+        rows = self.conn.execute(
+            "SELECT arcname, hash FROM archive_entries WHERE archive = ?",
+            (str(Path(archive).resolve()),)
+        ).fetchall()
+        return dict(rows)
+
+    def forget_archive(self, archive):
+        archive = str(Path(archive).resolve())
+        self.conn.execute("DELETE FROM archives WHERE path = ?", (archive,))
+        self.conn.execute("DELETE FROM archive_entries WHERE archive = ?", (archive,))
+        self.conn.commit()
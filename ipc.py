@@ -0,0 +1,184 @@
+import os
+import sys
+import json
+import getpass
+import subprocess
+from pathlib import Path
+from PySide6.QtCore import QObject, Signal, QElapsedTimer, QTimer
+from PySide6.QtNetwork import QLocalSocket
+
+
+SPAWN_TIMEOUT_MS = 10000
+ATTACH_RETRY_MS = 250
+
+
+def server_name():
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = "user"
+    return f"SimsBackupUtility-{user}"
+
+
+def encode_message(message: dict) -> bytes:
+    return (json.dumps(message) + "\n").encode("utf-8")
+
+
+def decode_lines(buffer: bytearray):
+    messages = []
+    while True:
+        idx = buffer.find(b"\n")
+        if idx < 0:
+            break
+        line = bytes(buffer[:idx])
+        del buffer[:idx + 1]
+        if line.strip():
+            try:
+                messages.append(json.loads(line.decode("utf-8")))
+            except ValueError:
+                continue
+    return messages
+
+
+def daemon_command():
+    if getattr(sys, "frozen", False):
+        return [sys.executable, "--daemon"]
+    return [sys.executable, str(Path(__file__).parent / "main.py"), "--daemon"]
+
+
+def spawn_daemon():
+    kwargs = {"stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    if os.name == "nt":
+        kwargs["creationflags"] = (
+            getattr(subprocess, "DETACHED_PROCESS", 0) | getattr(subprocess, "CREATE_NO_WINDOW", 0)
+        )
+    else:
+        kwargs["start_new_session"] = True
+    subprocess.Popen(daemon_command(), **kwargs)
+
+
+class DaemonClient(QObject):
+    event_received = Signal(dict)
+    attached = Signal()
+    attach_failed = Signal()
+    disconnected = Signal()
+
+    def __init__(self, parent=None, name=None):
+        super().__init__(parent)
+        self.name = name or server_name()
+        self.control = QLocalSocket(self)
+        self.events = QLocalSocket(self)
+        self._control_buffer = bytearray()
+        self._event_buffer = bytearray()
+        self._pending = []
+        self._outbox = []
+        self._attaching = False
+        self._spawn = False
+        self._spawned = False
+        self._attach_timer = QElapsedTimer()
+        self._retry = QTimer(self)
+        self._retry.setSingleShot(True)
+        self._retry.timeout.connect(self._try_connect)
+        self.control.connected.connect(lambda: self.events.connectToServer(self.name))
+        self.control.errorOccurred.connect(self._on_connect_error)
+        self.control.readyRead.connect(self._read_replies)
+        self.events.connected.connect(self._on_attached)
+        self.events.errorOccurred.connect(self._on_connect_error)
+        self.events.readyRead.connect(self._read_events)
+        self.events.disconnected.connect(self._on_disconnected)
+
+    @property
+    def connected(self):
+        return (not self._attaching and self.control.state() == QLocalSocket.ConnectedState
+                and self.events.state() == QLocalSocket.ConnectedState)
+
+    def attach(self, spawn=True):
+        if self.connected or self._attaching:
+            return
+        self._attaching = True
+        self._spawn = spawn
+        self._spawned = False
+        self._attach_timer.start()
+        self._try_connect()
+
+    def request(self, cmd, callback=None, **kwargs):
+        message = {"cmd": cmd, **kwargs}
+        if self.connected:
+            self._send(message, callback)
+            return
+        self._outbox.append((message, callback))
+        self.attach()
+
+    def _send(self, message, callback):
+        self._pending.append(callback)
+        self.control.write(encode_message(message))
+        self.control.flush()
+
+    def _try_connect(self):
+        self.control.abort()
+        self.events.abort()
+        self.control.connectToServer(self.name)
+
+    def _on_attached(self):
+        self._attaching = False
+        self.events.write(encode_message({"cmd": "subscribe"}))
+        self.events.flush()
+        self.attached.emit()
+        outbox, self._outbox = self._outbox, []
+        for message, callback in outbox:
+            self._send(message, callback)
+
+    def _on_connect_error(self, error):
+        if not self._attaching:
+            return
+        if self._spawn and not self._spawned:
+            self._spawned = True
+            try:
+                spawn_daemon()
+            except OSError:
+                self._give_up()
+                return
+        if self._attach_timer.elapsed() >= SPAWN_TIMEOUT_MS:
+            self._give_up()
+            return
+        self._retry.start(ATTACH_RETRY_MS)
+
+    def _give_up(self):
+        self._attaching = False
+        self.control.abort()
+        self.events.abort()
+        outbox, self._outbox = self._outbox, []
+        for _, callback in outbox:
+            if callback:
+                callback(None)
+        self.attach_failed.emit()
+
+    def _read_replies(self):
+        self._control_buffer += bytes(self.control.readAll())
+        for reply in decode_lines(self._control_buffer):
+            if self._pending:
+                callback = self._pending.pop(0)
+                if callback:
+                    callback(reply)
+
+    def _read_events(self):
+        self._event_buffer += bytes(self.events.readAll())
+        for message in decode_lines(self._event_buffer):
+            self.event_received.emit(message)
+
+    def _on_disconnected(self):
+        if self._attaching:
+            return
+        self.control.abort()
+        self._control_buffer.clear()
+        self._event_buffer.clear()
+        pending, self._pending = self._pending, []
+        for callback in pending:
+            if callback:
+                callback(None)
+        self.disconnected.emit()
+
+    def close(self):
+        self._retry.stop()
+        self.control.disconnectFromServer()
+        self.events.disconnectFromServer()
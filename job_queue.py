@@ -0,0 +1,148 @@
+import itertools
+from PySide6.QtCore import QObject, Signal
+
+from backup import BackupWorker
+from config_utils import get_max_concurrent_backups, write_log_file
+
+
+PRIORITY_MANUAL = 0
+PRIORITY_SCHEDULED = 1
+
+
+class BackupJob:
+    def __init__(self, game_name, backup_folder, priority, seq):
+        self.game_name = game_name
+        self.backup_folder = backup_folder
+        self.priority = priority
+        self.seq = seq
+        self.coalesced = 0
+
+    def sort_key(self):
+        return (self.priority, self.seq)
+
+
+class BackupQueue(QObject):
+    queue_changed = Signal()
+    job_done = Signal(str, str)
+    job_failed = Signal(str, str)
+    job_progress = Signal(str, int, int)
+
+    def __init__(self, parent=None, worker_factory=None, watcher=None):
+        super().__init__(parent)
+        self.watcher = watcher
+        self.pending = {}
+        self.running = {}
+        self.reserved = {}
+        self._seq = itertools.count()
+        self.worker_factory = worker_factory or (
+            lambda job: BackupWorker(dialog=None, backup_folder=job.backup_folder,
+                                     game_name=job.game_name, silent=True)
+        )
+
+    def enqueue(self, game_name, backup_folder, priority=PRIORITY_SCHEDULED):
+        job = self.pending.get(game_name)
+        if job:
+            job.coalesced += 1
+            job.backup_folder = backup_folder
+            if priority < job.priority:
+                job.priority = priority
+            write_log_file(f"Coalesced backup trigger for {game_name} into the pending job.")
+        else:
+            self.pending[game_name] = BackupJob(game_name, backup_folder, priority, next(self._seq))
+            if game_name in self.running:
+                write_log_file(f"Backup for {game_name} is running, queued one follow-up run.")
+            elif game_name in self.reserved:
+                write_log_file(f"{game_name} is in use by a manual backup or restore, queued one follow-up run.")
+        self._pump()
+        self.queue_changed.emit()
+
+    def is_busy(self, game_name):
+        return game_name in self.running or game_name in self.pending or game_name in self.reserved
+
+    def reserve(self, game_name, owner):
+        if self.is_busy(game_name):
+            return False
+        self.reserved[game_name] = owner
+        self.queue_changed.emit()
+        return True
+
+    def release(self, game_name, owner=None):
+        if game_name not in self.reserved or (owner is not None and self.reserved[game_name] is not owner):
+            return
+        del self.reserved[game_name]
+        self._pump()
+        self.queue_changed.emit()
+
+    def release_owner(self, owner):
+        for game_name in [g for g, o in self.reserved.items() if o is owner]:
+            self.release(game_name)
+
+    def cancel(self, game_name):
+        self.pending.pop(game_name, None)
+        worker = self.running.get(game_name)
+        if worker:
+            worker.cancel_requested = True
+        self.queue_changed.emit()
+
+    def cancel_all(self):
+        self.pending.clear()
+        for worker in self.running.values():
+            worker.cancel_requested = True
+        self.queue_changed.emit()
+
+    def _pump(self):
+        limit = get_max_concurrent_backups()
+        ready = sorted(
+            (job for g, job in self.pending.items() if g not in self.running and g not in self.reserved),
+            key=BackupJob.sort_key
+        )
+        for job in ready:
+            if len(self.running) >= limit:
+                break
+            del self.pending[job.game_name]
+            if (self.watcher and job.priority == PRIORITY_SCHEDULED
+                    and self.watcher.is_watching(job.game_name)
+                    and not self.watcher.journal.is_dirty(job.game_name)):
+                write_log_file(f"No changes in {job.game_name} saves since the last backup, skipping.")
+                continue
+            self._start(job)
+
+    def _start(self, job):
+        game = job.game_name
+        worker = self.worker_factory(job)
+        self.running[game] = worker
+        generation = self.watcher.journal.begin_backup(game) if self.watcher else None
+        totals = {"max": 0}
+
+        def on_max(value):
+            totals["max"] = value
+            self.job_progress.emit(game, 0, value)
+
+        worker.max_signal.connect(on_max)
+        worker.progress_signal.connect(lambda value: self.job_progress.emit(game, value, totals["max"]))
+        worker.cleanup_done_signal.connect(lambda summary: self.job_done.emit(game, summary))
+        if self.watcher:
+            worker.cleanup_done_signal.connect(lambda _: self.watcher.mark_clean(game, generation))
+        worker.error_signal.connect(lambda msg: self.job_failed.emit(game, msg))
+        worker.finished.connect(lambda: self._on_finished(game, worker))
+        worker.start()
+
+    def _on_finished(self, game, worker):
+        if self.running.get(game) is worker:
+            del self.running[game]
+        worker.deleteLater()
+        self._pump()
+        self.queue_changed.emit()
+
+    def state_text(self):
+        if not self.running and not self.pending and not self.reserved:
+            return "Queue: idle"
+        parts = []
+        if self.running:
+            parts.append("Running: " + ", ".join(self.running))
+        if self.reserved:
+            parts.append("In use: " + ", ".join(self.reserved))
+        if self.pending:
+            queued = sorted(self.pending.values(), key=BackupJob.sort_key)
+            parts.append("Queued: " + ", ".join(j.game_name for j in queued))
+        return " | ".join(parts)
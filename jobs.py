@@ -0,0 +1,302 @@
+import heapq
+import itertools
+import threading
+from PySide6.QtCore import QObject, QCoreApplication, Signal
+
+from config_utils import write_log_file
+from diagnostics import claim_diagnostics_run, run_with_diagnostics
+
+
+EXECUTOR_THREADS = 6
+INTERACTIVE_RESERVED_THREADS = 2
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class CancellationToken:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback):
+        with self._lock:
+            if not self._cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def raise_if_cancelled(self):
+        if self._cancelled:
+            raise JobCancelled()
+
+
+class Reply:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._set = False
+        self.value = None
+
+    def set(self, value):
+        with self._condition:
+            self.value = value
+            self._set = True
+            self._condition.notify_all()
+
+    def wait(self, token=None, timeout=None):
+        if token is not None:
+            token.on_cancel(self._wake)
+        with self._condition:
+            self._condition.wait_for(lambda: self._set or (token is not None and token.cancelled), timeout)
+            return self.value if self._set else None
+
+    def _wake(self):
+        with self._condition:
+            self._condition.notify_all()
+
+
+class _Dispatcher(QObject):
+    call = Signal(object)
+
+    def __init__(self):
+        super().__init__()
+        app = QCoreApplication.instance()
+        if app is not None:
+            self.moveToThread(app.thread())
+        self.call.connect(self._run)
+
+    def _run(self, fn):
+        fn()
+
+
+class JobFuture:
+    def __init__(self, executor, name, kind, fn, args, kwargs, priority, token):
+        self.executor = executor
+        self.name = name
+        self.kind = kind
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.token = token or CancellationToken()
+        self.state = QUEUED
+        self._result = None
+        self._error = None
+        self._done = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self._done.is_set()
+
+    def cancel(self):
+        self.token.cancel()
+        self.executor._discard(self)
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def result(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{self.name} did not finish in time")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def exception(self):
+        return self._error
+
+    def add_done_callback(self, fn):
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(fn)
+                return
+        self.executor.dispatcher.call.emit(lambda: fn(self))
+
+    def _finish(self, state, result=None, error=None):
+        with self._lock:
+            self.state = state
+            self._result = result
+            self._error = error
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            self.executor.dispatcher.call.emit(lambda fn=fn: fn(self))
+
+    def _run(self):
+        if self.token.cancelled:
+            self._finish(CANCELLED, error=JobCancelled())
+            return
+        self.state = RUNNING
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except JobCancelled as e:
+            self._finish(CANCELLED, error=e)
+        except Exception as e:
+            write_log_file(f"[ERROR] {self.name} failed: {e}")
+            self._finish(DONE, error=e)
+        else:
+            self._finish(DONE, result)
+
+
+class JobExecutor(QObject):
+    jobs_changed = Signal(str)
+
+    def __init__(self, threads=EXECUTOR_THREADS, reserved=INTERACTIVE_RESERVED_THREADS):
+        super().__init__()
+        self.dispatcher = _Dispatcher()
+        self._condition = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._active = []
+        self._threads = [
+            threading.Thread(target=self._worker, args=(i < reserved,), daemon=True, name=f"job-{i}")
+            for i in range(threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, name, fn, *args, priority=PRIORITY_NORMAL, token=None, kind="job", **kwargs):
+        future = JobFuture(self, name, kind, fn, args, kwargs, priority, token)
+        with self._condition:
+            heapq.heappush(self._heap, (priority, next(self._seq), future))
+            self._condition.notify_all()
+        self._changed()
+        return future
+
+    def run_parallel(self, name, fn, items, priority=PRIORITY_NORMAL):
+        futures = [self.submit(name, fn, item, priority=priority, kind="task") for item in items]
+        for future in futures:
+            if self._claim(future):
+                future._run()
+                self._changed()
+        return [future.result() for future in futures]
+
+    def jobs(self):
+        with self._condition:
+            queued = [entry[2] for entry in sorted(self._heap)]
+            return list(self._active) + queued
+
+    def state_text(self):
+        jobs = [job for job in self.jobs() if job.kind != "task"]
+        if not jobs:
+            return "Jobs: idle"
+        return "Jobs: " + ", ".join(f"{job.name} ({job.state})" for job in jobs)
+
+    def _claim(self, future):
+        with self._condition:
+            for i, entry in enumerate(self._heap):
+                if entry[2] is future:
+                    self._heap.pop(i)
+                    heapq.heapify(self._heap)
+                    return True
+        return False
+
+    def _discard(self, future):
+        if self._claim(future):
+            future._finish(CANCELLED, error=JobCancelled())
+            self._changed()
+
+    def _runnable(self, interactive_only):
+        return bool(self._heap) and (not interactive_only or self._heap[0][0] <= PRIORITY_INTERACTIVE)
+
+    def _worker(self, interactive_only):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._runnable(interactive_only))
+                _, _, future = heapq.heappop(self._heap)
+                self._active.append(future)
+            self._changed()
+            try:
+                future._run()
+            finally:
+                with self._condition:
+                    self._active.remove(future)
+                self._changed()
+
+    def _changed(self):
+        self.jobs_changed.emit(self.state_text())
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = JobExecutor()
+        return _executor
+
+
+class Job(QObject):
+    finished = Signal()
+    priority = PRIORITY_NORMAL
+    kind = "job"
+    diagnosable = False
+
+    def __init__(self):
+        super().__init__()
+        self.token = CancellationToken()
+        self.future = None
+        self.diagnose = False
+
+    @property
+    def cancel_requested(self):
+        return self.token.cancelled
+
+    @cancel_requested.setter
+    def cancel_requested(self, value):
+        if value:
+            self.token.cancel()
+
+    def title(self):
+        return type(self).__name__
+
+    def start(self):
+        self.diagnose = self.diagnosable and claim_diagnostics_run()
+        self.future = get_executor().submit(self.title(), self._execute, priority=self.priority, kind=self.kind)
+
+    def _execute(self):
+        try:
+            if self.diagnose:
+                run_with_diagnostics(self.title(), self.run)
+            else:
+                self.run()
+        finally:
+            self.finished.emit()
+
+    def run(self):
+        raise NotImplementedError
+
+    def isRunning(self):
+        return self.future is not None and not self.future.done()
+
+    def wait(self, timeout_ms=None):
+        if self.future is None:
+            return True
+        return self.future.wait(None if timeout_ms is None else timeout_ms / 1000)
@@ -1,3 +1,13 @@
+import sys
+
+if __name__ == "__main__" and "--daemon" in sys.argv:
+    from daemon import run_daemon
+    sys.exit(run_daemon())
+
+if __name__ == "__main__" and "--diagnostics" in sys.argv:
+    from config_utils import save_diagnostics_next_run
+    save_diagnostics_next_run(True)
+
 from theme import Theme
 from config_utils import get_theme_mode, get_update_available
 from main_window import MainWindow
@@ -6,7 +16,6 @@ from version import __version__
 
 from PySide6.QtWidgets import QApplication
 from PySide6.QtCore import QTimer
-import sys
 
 
 if __name__ == "__main__":
@@ -1,7 +1,5 @@
 import sys
-import threading
 from pathlib import Path
-import requests
 from PySide6 import QtCore, QtWidgets
 from PySide6.QtWidgets import (
     QMainWindow, QPushButton, QVBoxLayout, QHBoxLayout, QWidget,
@@ -13,20 +11,22 @@ from PySide6.QtGui import QIcon, QPainter, QColor, QAction
 from progress_dialog import ProgressDialog
 from backup import BackupWorker
 from restore import RestoreWorker
+from browser import BackupBrowser
 from settings_window import SettingsWindow
 from schedule_dialog import ScheduleDialog
+from job_queue import PRIORITY_MANUAL
+from ipc import DaemonClient
+from jobs import get_executor, PRIORITY_BACKGROUND
+from updater import get_latest_github_release
 from config_utils import (
     get_default_backup_path, save_default_backup_path,
     get_update_available, set_update_available,
     get_last_installed_version,
     get_last_selected_game, save_last_selected_game,
-    get_schedule_config, save_schedule_config,
+    save_schedule_config, write_log_file,
     get_minimize_to_tray
 )
 
-GITHUB_USER = "J0ttenmiller"
-GITHUB_REPO = "Sims-Backup-Utility"
-
 GAMES = ["Sims 4", "Sims 3", "Sims Medieval", "MySims", "MySims Kingdom"]
 
 
@@ -49,18 +49,15 @@ class MainWindow(QMainWindow):
         self.installed_version = get_last_installed_version()
         self.settings_btn_red_dot = False
 
-        self.schedule = None
-        self.schedule_timer = QtCore.QTimer(self)
-        self.schedule_timer.timeout.connect(self.check_schedule)
-
-        self.silent_workers = []
+        self.daemon = DaemonClient(self)
+        self.daemon.event_received.connect(self.on_daemon_event)
+        self.daemon.disconnected.connect(self.on_daemon_lost)
+        self.daemon.attach_failed.connect(self.on_daemon_unavailable)
 
         self.init_ui()
         self.init_tray()
 
-        self.schedule = get_schedule_config()
-        if self.schedule:
-            self.schedule_timer.start(60000)
+        self.daemon.attach()
 
         if not get_update_available():
             QtCore.QTimer.singleShot(2000, self.check_updates_silent)
@@ -121,9 +118,18 @@ class MainWindow(QMainWindow):
         menu.addAction(show_action)
 
         backup_action = QAction("Run Backup Now", self)
-        backup_action.triggered.connect(lambda: self.run_backup(silent=True))
+        backup_action.triggered.connect(lambda: self.run_backup(silent=True, priority=PRIORITY_MANUAL))
         menu.addAction(backup_action)
 
+        self.queue_action = QAction("Background service: connecting", self)
+        self.queue_action.setEnabled(False)
+        menu.addAction(self.queue_action)
+
+        self.jobs_action = QAction(get_executor().state_text(), self)
+        self.jobs_action.setEnabled(False)
+        menu.addAction(self.jobs_action)
+        get_executor().jobs_changed.connect(self.jobs_action.setText)
+
         sched_action = QAction("Schedule Backup…", self)
         sched_action.triggered.connect(self.open_schedule)
         menu.addAction(sched_action)
@@ -201,27 +207,24 @@ class MainWindow(QMainWindow):
         self.update()
 
     def check_updates_silent(self):
-        def run_check():
-            try:
-                api_url = f"https://api.github.com/repos/{GITHUB_USER}/{GITHUB_REPO}/releases/latest"
-                r = requests.get(api_url, timeout=5)
-                r.raise_for_status()
-                latest_version = r.json().get("tag_name", "").lstrip("v")
-                if latest_version and latest_version != self.installed_version:
-                    set_update_available(True)
-                    self.show_settings_red_dot()
-            except Exception:
-                pass
-        threading.Thread(target=run_check, daemon=True).start()
-
-    def run_backup(self, silent=False):
-        game = self.game_combo.currentText()
+        def on_done(future):
+            if future.exception() is not None:
+                return
+            latest_version, _ = future.result()
+            if latest_version and latest_version != self.installed_version:
+                set_update_available(True)
+                self.show_settings_red_dot()
+
+        get_executor().submit("Update check", get_latest_github_release, priority=PRIORITY_BACKGROUND).add_done_callback(on_done)
+
+    def run_backup(self, silent=False, game=None, priority=PRIORITY_MANUAL):
+        game = game or self.game_combo.currentText()
         folder = get_default_backup_path(game)
 
         if not folder or not Path(folder).exists():
             if silent:
                 self.show_tray_notification("Scheduled backup skipped", f"No folder set for {game}")
-                print(f"[Scheduled Backup] No folder set for {game}, skipping.")
+                write_log_file(f"[Scheduled Backup] No folder set for {game}, skipping.")
                 return
             folder = QFileDialog.getExistingDirectory(self, f"Select {game} Backup Destination")
             if not folder:
@@ -229,37 +232,84 @@ class MainWindow(QMainWindow):
             save_default_backup_path(game, folder)
 
         if silent:
-            worker = BackupWorker(dialog=None, backup_folder=folder, game_name=game, silent=True)
-            self.silent_workers.append(worker)
-            worker.cleanup_done_signal.connect(
-                lambda summary: self.show_tray_notification(f"{game} Backup Complete", summary)
-            )
-            worker.finished.connect(lambda: self.silent_workers.remove(worker))
-            worker.start()
+            self.daemon.request("trigger", game=game,
+                                priority="manual" if priority == PRIORITY_MANUAL else "scheduled")
         else:
-            dialog = ProgressDialog(f"Backup in Progress — {game}", self.theme)
-            worker = BackupWorker(dialog, folder, game, silent=False)
-            dialog.worker = worker
+            self.with_reservation(game, lambda: self.run_interactive_backup(game, folder))
+
+    def run_interactive_backup(self, game, folder):
+        dialog = ProgressDialog(f"Backup in Progress — {game}", self.theme)
+        worker = BackupWorker(dialog, folder, game, silent=False)
+        dialog.worker = worker
 
-            def backup_done():
+        def backup_done():
+            if worker.skipped_unchanged:
+                QMessageBox.information(self, "No Changes", f"Your {game} saves have not changed since the last backup.")
+            else:
+                self.daemon.request("backup_finished", game=game)
                 QMessageBox.information(self, "Backup Complete", f"Your {game} backup has been created successfully.")
-                dialog.accept()
+            dialog.accept()
 
-            if hasattr(worker, "cleanup_done_signal"):
-                worker.cleanup_done_signal.connect(
-                    lambda summary: QMessageBox.information(self, "Cleanup Complete", summary)
-                )
+        if hasattr(worker, "cleanup_done_signal"):
+            worker.cleanup_done_signal.connect(
+                lambda summary: None if worker.skipped_unchanged
+                else QMessageBox.information(self, "Cleanup Complete", summary)
+            )
 
-            worker.done_signal.connect(backup_done)
-            worker.start()
-            dialog.exec()
+        worker.done_signal.connect(backup_done)
+        worker.start()
+        worker.future.add_done_callback(lambda _: self.daemon.request("release", game=game))
+        dialog.exec()
+
+    def with_reservation(self, game, start):
+        def on_reply(reply):
+            if reply is not None and not reply.get("ok"):
+                QMessageBox.information(self, "Backup Running",
+                                        f"A background backup for {game} is already running or queued.")
+                return
+            QtCore.QTimer.singleShot(0, start)
+
+        self.daemon.request("reserve", callback=on_reply, game=game)
+
+    def on_daemon_event(self, event):
+        kind = event.get("event")
+        game = event.get("game", "")
+        if kind == "queue":
+            self.queue_action.setText(event.get("state", ""))
+        elif kind == "progress" and event.get("max"):
+            percent = int(event["value"] * 100 / event["max"])
+            self.tray.setToolTip(f"Sims Backup Utility — {game} backup {percent}%")
+        elif kind == "done":
+            self.tray.setToolTip("Sims Backup Utility")
+            self.show_tray_notification(f"{game} Backup Complete", event.get("summary", ""))
+        elif kind == "failed":
+            self.tray.setToolTip("Sims Backup Utility")
+            self.show_tray_notification(f"{game} Backup Failed", event.get("message", ""))
+        elif kind == "skipped":
+            self.show_tray_notification("Scheduled backup skipped", event.get("message", ""))
+        elif kind == "corrupt":
+            self.on_corrupt_backup(event.get("path", ""), event.get("message", ""))
+
+    def on_daemon_lost(self):
+        self.queue_action.setText("Background service: reconnecting")
+        self.daemon.attach()
+
+    def on_daemon_unavailable(self):
+        self.queue_action.setText("Background service: not running")
+        write_log_file("[ERROR] Could not start or reach the background service.")
+
+    def on_corrupt_backup(self, path, error):
+        self.show_tray_notification("Damaged Backup Found", f"{Path(path).name} failed verification: {error}")
 
     def run_restore(self):
         game = self.game_combo.currentText()
-        path, _ = QFileDialog.getOpenFileName(self, f"Select {game} Backup Zip", filter="Zip Files (*.zip)")
-        if not path:
+        browser = BackupBrowser(game, self.theme, self)
+        if browser.exec() != QDialog.Accepted or not browser.selected_path:
             return
+        path = browser.selected_path
+        self.with_reservation(game, lambda: self.run_interactive_restore(game, path))
 
+    def run_interactive_restore(self, game, path):
         dialog = ProgressDialog(f"Restore in Progress — {game}", self.theme)
         worker = RestoreWorker(dialog, path, game)
         dialog.worker = worker
@@ -298,44 +348,25 @@ class MainWindow(QMainWindow):
         worker.request_confirmation_signal.connect(on_confirm_required)
         worker.done_signal.connect(restore_done)
         worker.start()
+        worker.future.add_done_callback(lambda _: self.daemon.request("release", game=game))
         dialog.exec()
 
     def open_settings(self):
         settings = SettingsWindow(self.theme, self)
         if settings.exec() == QDialog.Accepted:
             self.apply_theme()
+        self.daemon.request("reload")
         self.hide_settings_red_dot()
 
     def open_schedule(self):
-        dlg = ScheduleDialog(self)
+        game = self.game_combo.currentText()
+        dlg = ScheduleDialog(self, game)
         if dlg.exec() == QDialog.Accepted:
-            self.schedule = dlg.get_schedule()
-            save_schedule_config(self.schedule)
-            self.schedule_timer.start(60000)
-            QMessageBox.information(self, "Scheduled", "Backup schedule set successfully.")
+            save_schedule_config(dlg.get_schedule(), game)
+            self.daemon.request("reload")
+            QMessageBox.information(self, "Scheduled", f"Backup schedule for {game} set successfully.")
             self.hide()
 
-    def check_schedule(self):
-        if not self.schedule:
-            return
-        now = QtCore.QTime.currentTime()
-
-        if self.schedule["mode"] == "interval":
-            last = getattr(self, "_last_backup_time", None)
-            interval_seconds = self.schedule.get("hours", 0) * 3600
-            if not last or last.secsTo(now) >= interval_seconds:
-                self._last_backup_time = now
-                self.run_backup(silent=True)
-
-        elif self.schedule["mode"] == "daily":
-            scheduled_hour, scheduled_minute = self.schedule.get("time", (0, 0))
-            if now.hour() == scheduled_hour and now.minute() == scheduled_minute:
-                last_day = getattr(self, "_last_backup_day", None)
-                today_str = QtCore.QDate.currentDate().toString("yyyyMMdd")
-                if last_day != today_str:
-                    self._last_backup_day = today_str
-                    self.run_backup(silent=True)
-
     def show_tray_notification(self, title, message):
         if self.tray:
             self.tray.showMessage(title, message, QSystemTrayIcon.Information, 10000)
\ No newline at end of file
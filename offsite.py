@@ -0,0 +1,458 @@
+import os
+import hmac
+import json
+import time
+import hashlib
+import threading
+import requests
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote, urlparse
+from xml.etree import ElementTree
+from concurrent.futures import ThreadPoolExecutor
+from PySide6.QtCore import QObject, Signal
+
+from paths import APPDATA_DIR
+from config_utils import game_key, get_default_backup_path, get_offsite_settings, write_log_file
+from retention import forget_pruned, load_pruned
+from jobs import Job, PRIORITY_BACKGROUND
+from version import __version__
+
+
+OFFSITE_STATE_PATH = APPDATA_DIR / "offsite_state.json"
+HASH_CHUNK = 1024 * 1024
+SEND_BLOCK = 64 * 1024
+PART_RETRIES = 3
+MIN_PART_SIZE = 5 * 1024 * 1024
+S3_NS = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+
+
+class OffsiteError(Exception):
+    pass
+
+
+class ReplicationCancelled(Exception):
+    pass
+
+
+def sha256_file(path, cancel=None):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b""):
+            if cancel and cancel():
+                raise ReplicationCancelled()
+            h.update(block)
+    return h.hexdigest()
+
+
+def _hmac(key, msg):
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+
+def _uri_encode(value, safe="-_.~"):
+    return quote(str(value), safe=safe)
+
+
+def sign_v4(method, host, path, query, headers, payload_hash, access_key, secret_key,
+            region, now=None, service="s3"):
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    datestamp = now.strftime("%Y%m%d")
+    headers = dict(headers)
+    headers["host"] = host
+    headers["x-amz-date"] = amz_date
+    headers["x-amz-content-sha256"] = payload_hash
+    lowered = {k.lower(): " ".join(str(v).split()) for k, v in headers.items()}
+    signed = sorted(lowered)
+    canonical_query = "&".join(
+        f"{k}={v}" for k, v in sorted((_uri_encode(k), _uri_encode(v)) for k, v in query.items())
+    )
+    canonical_request = "\n".join([
+        method,
+        path,
+        canonical_query,
+        "".join(f"{k}:{lowered[k]}\n" for k in signed),
+        ";".join(signed),
+        payload_hash,
+    ])
+    scope = f"{datestamp}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256", amz_date, scope,
+        hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+    ])
+    key = _hmac(_hmac(_hmac(_hmac(("AWS4" + secret_key).encode("utf-8"), datestamp), region), service),
+                "aws4_request")
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+    headers["Authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+        f"SignedHeaders={';'.join(signed)}, Signature={signature}"
+    )
+    return headers
+
+
+class RateLimiter:
+    def __init__(self, bytes_per_second):
+        self.rate = bytes_per_second
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def consume(self, nbytes):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + nbytes / self.rate
+            delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ThrottledBody:
+    def __init__(self, data, limiter, cancel=None):
+        self.data = memoryview(data)
+        self.limiter = limiter
+        self.cancel = cancel
+        self.offset = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def read(self, size=-1):
+        if self.cancel and self.cancel():
+            raise ReplicationCancelled()
+        if size is None or size < 0:
+            size = len(self.data) - self.offset
+        size = min(size, SEND_BLOCK)
+        block = self.data[self.offset:self.offset + size].tobytes()
+        self.offset += len(block)
+        self.limiter.consume(len(block))
+        return block
+
+
+class S3Client:
+    def __init__(self, endpoint, bucket, region, access_key, secret_key, session=None):
+        parsed = urlparse(endpoint.rstrip("/"))
+        self.scheme = parsed.scheme or "https"
+        self.host = parsed.netloc or parsed.path
+        self.bucket = bucket
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.session = session or requests.Session()
+        self.session.headers.update({"User-Agent": f"SimsBackupUtility/{__version__}"})
+
+    def _path(self, key=""):
+        return f"/{_uri_encode(self.bucket)}/" + _uri_encode(key, safe="/-_.~")
+
+    def request(self, method, key="", query=None, body=b"", headers=None, ok=(200,), payload_hash=None):
+        query = query or {}
+        path = self._path(key)
+        if payload_hash is None:
+            payload_hash = hashlib.sha256(body if isinstance(body, bytes) else b"").hexdigest()
+        signed = sign_v4(method, self.host, path, query, headers or {}, payload_hash,
+                         self.access_key, self.secret_key, self.region)
+        url = f"{self.scheme}://{self.host}{path}"
+        if query:
+            url += "?" + "&".join(f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in sorted(query.items()))
+        response = self.session.request(method, url, data=body, headers=signed, timeout=60)
+        if response.status_code not in ok:
+            raise OffsiteError(f"{method} {key or self.bucket} failed: HTTP {response.status_code} "
+                               f"{response.text[:200]}")
+        return response
+
+    def head_object(self, key):
+        response = self.request("HEAD", key, ok=(200, 404))
+        return None if response.status_code == 404 else response.headers
+
+    def put_object(self, key, body, sha256, limiter, cancel=None):
+        self.request("PUT", key, body=ThrottledBody(body, limiter, cancel),
+                     headers={"x-amz-meta-sha256": sha256},
+                     payload_hash=hashlib.sha256(body).hexdigest())
+
+    def create_multipart_upload(self, key, sha256):
+        response = self.request("POST", key, query={"uploads": ""}, headers={"x-amz-meta-sha256": sha256})
+        root = ElementTree.fromstring(response.content)
+        upload_id = root.findtext(f"{S3_NS}UploadId") or root.findtext("UploadId")
+        if not upload_id:
+            raise OffsiteError(f"No upload id returned for {key}")
+        return upload_id
+
+    def upload_part(self, key, upload_id, number, body, limiter, cancel=None):
+        response = self.request("PUT", key, query={"partNumber": number, "uploadId": upload_id},
+                                body=ThrottledBody(body, limiter, cancel),
+                                payload_hash=hashlib.sha256(body).hexdigest())
+        return response.headers.get("ETag", "")
+
+    def complete_multipart_upload(self, key, upload_id, etags):
+        parts = "".join(
+            f"<Part><PartNumber>{n}</PartNumber><ETag>{etag}</ETag></Part>"
+            for n, etag in sorted(etags.items())
+        )
+        body = f"<CompleteMultipartUpload>{parts}</CompleteMultipartUpload>".encode("utf-8")
+        response = self.request("POST", key, query={"uploadId": upload_id}, body=body)
+        if b"<Error>" in response.content:
+            raise OffsiteError(f"Completing upload of {key} failed: {response.text[:200]}")
+
+    def abort_multipart_upload(self, key, upload_id):
+        self.request("DELETE", key, query={"uploadId": upload_id}, ok=(204, 200, 404))
+
+    def list_objects(self, prefix):
+        objects = {}
+        token = None
+        while True:
+            query = {"list-type": 2, "prefix": prefix}
+            if token:
+                query["continuation-token"] = token
+            root = ElementTree.fromstring(self.request("GET", query=query).content)
+            ns = S3_NS if root.tag.startswith(S3_NS) else ""
+            for item in root.iter(f"{ns}Contents"):
+                objects[item.findtext(f"{ns}Key")] = int(item.findtext(f"{ns}Size") or 0)
+            if root.findtext(f"{ns}IsTruncated") != "true":
+                return objects
+            token = root.findtext(f"{ns}NextContinuationToken")
+
+    def delete_object(self, key):
+        self.request("DELETE", key, ok=(204, 200, 404))
+
+
+class OffsiteState:
+    def __init__(self, path=OFFSITE_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+        self.data.setdefault("uploads", {})
+        self.data.setdefault("objects", {})
+
+    def save(self):
+        with self._lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_suffix(".tmp")
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(self.data, f)
+                os.replace(tmp, self.path)
+            except OSError:
+                pass
+
+    def set_part(self, entry, number, etag):
+        with self._lock:
+            entry["parts"][str(number)] = etag
+        self.save()
+
+    def uploads(self):
+        return self.data["uploads"]
+
+    def objects(self):
+        return self.data["objects"]
+
+
+class Replicator:
+    def __init__(self, settings, client=None, state=None, log=None, cancel=None):
+        self.settings = settings
+        self.client = client or S3Client(
+            settings["endpoint"], settings["bucket"], settings["region"],
+            settings["access_key"], settings["secret_key"]
+        )
+        self.state = state or OffsiteState()
+        self.part_size = max(MIN_PART_SIZE, settings["part_size_mb"] * 1024 * 1024)
+        self.parallel = max(1, settings["parallel_uploads"])
+        self.limiter = RateLimiter(settings["bandwidth_limit_kb"] * 1024)
+        self.log = log or write_log_file
+        self.cancel = cancel
+
+    def game_prefix(self, game_name):
+        prefix = self.settings["prefix"].strip("/")
+        return f"{prefix}/{game_key(game_name)}/" if prefix else f"{game_key(game_name)}/"
+
+    def sync(self, game_name, folder):
+        prefix = self.game_prefix(game_name)
+        pattern = f"{game_key(game_name)}_backup_*.zip"
+        local = {p.name: p for p in Path(folder).glob(pattern)}
+        remote = self.client.list_objects(prefix)
+        uploaded = skipped = deleted = 0
+
+        for name, path in sorted(local.items(), key=lambda item: item[1].stat().st_mtime):
+            if self.cancel and self.cancel():
+                raise ReplicationCancelled()
+            if self.upload(path, prefix + name, remote):
+                uploaded += 1
+            else:
+                skipped += 1
+
+        if self.settings["mirror_deletes"]:
+            deleted = self.mirror_pruned(folder, prefix, local, remote)
+
+        return uploaded, skipped, deleted
+
+    def mirror_pruned(self, folder, prefix, local, remote):
+        pruned = [Path(p) for p in load_pruned() if Path(p).parent == Path(folder)]
+        if not pruned:
+            return 0
+        if not local:
+            self.log(f"[Offsite] {folder} holds no backups, not mirroring deletions.")
+            return 0
+        deleted = 0
+        done = []
+        for path in pruned:
+            key = prefix + path.name
+            if path.name not in local and key in remote:
+                self.client.delete_object(key)
+                self.state.objects().pop(key, None)
+                deleted += 1
+                self.log(f"[Offsite] Deleted {key} (pruned by retention)")
+            done.append(path)
+        self.state.save()
+        forget_pruned(done)
+        return deleted
+
+    def upload(self, path, key, remote):
+        st = path.stat()
+        known = self.state.objects().get(key)
+        if (known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns
+                and remote.get(key) == st.st_size):
+            return False
+
+        digest = sha256_file(path, self.cancel)
+        if remote.get(key) == st.st_size:
+            headers = self.client.head_object(key) or {}
+            if headers.get("x-amz-meta-sha256") == digest:
+                self._remember(key, st, digest)
+                return False
+
+        self.log(f"[Offsite] Uploading {path.name} ({st.st_size // (1024 * 1024)} MB)")
+        if st.st_size <= self.part_size:
+            with open(path, "rb") as f:
+                self.client.put_object(key, f.read(), digest, self.limiter, self.cancel)
+        else:
+            self._multipart(path, key, st, digest)
+        self._remember(key, st, digest)
+        return True
+
+    def _remember(self, key, st, digest):
+        self.state.objects()[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+        self.state.save()
+
+    def _multipart(self, path, key, st, digest):
+        uploads = self.state.uploads()
+        entry = uploads.get(key)
+        if entry and (entry["sha256"] != digest or entry["part_size"] != self.part_size):
+            self.client.abort_multipart_upload(key, entry["upload_id"])
+            entry = None
+        if entry is None:
+            entry = {
+                "upload_id": self.client.create_multipart_upload(key, digest),
+                "sha256": digest,
+                "part_size": self.part_size,
+                "parts": {},
+            }
+            uploads[key] = entry
+            self.state.save()
+        else:
+            self.log(f"[Offsite] Resuming upload of {path.name} ({len(entry['parts'])} parts already sent)")
+
+        count = (st.st_size + self.part_size - 1) // self.part_size
+        missing = [n for n in range(1, count + 1) if str(n) not in entry["parts"]]
+
+        def send(number):
+            with open(path, "rb") as f:
+                f.seek((number - 1) * self.part_size)
+                body = f.read(self.part_size)
+            for attempt in range(PART_RETRIES):
+                try:
+                    etag = self.client.upload_part(key, entry["upload_id"], number, body,
+                                                   self.limiter, self.cancel)
+                    break
+                except (requests.RequestException, OffsiteError):
+                    if attempt == PART_RETRIES - 1:
+                        raise
+                    time.sleep(2 ** attempt)
+            self.state.set_part(entry, number, etag)
+
+        with ThreadPoolExecutor(max_workers=self.parallel) as pool:
+            for future in [pool.submit(send, n) for n in missing]:
+                future.result()
+
+        self.client.complete_multipart_upload(
+            key, entry["upload_id"], {int(n): etag for n, etag in entry["parts"].items()}
+        )
+        uploads.pop(key, None)
+        self.state.save()
+
+
+class ReplicationWorker(Job):
+    done_signal = Signal(str, str)
+    error_signal = Signal(str, str)
+    priority = PRIORITY_BACKGROUND
+
+    def __init__(self, game_name, settings):
+        super().__init__()
+        self.game_name = game_name
+        self.settings = settings
+
+    def title(self):
+        return f"Offsite sync {self.game_name}"
+
+    def run(self):
+        folder = get_default_backup_path(self.game_name)
+        if not folder or not Path(folder).is_dir():
+            return
+        try:
+            replicator = Replicator(self.settings, cancel=lambda: self.cancel_requested)
+            uploaded, skipped, deleted = replicator.sync(self.game_name, folder)
+            summary = (f"Offsite sync for {self.game_name}: {uploaded} uploaded, "
+                       f"{skipped} already present, {deleted} deleted.")
+            write_log_file(f"[Offsite] {summary}")
+            self.done_signal.emit(self.game_name, summary)
+        except ReplicationCancelled:
+            write_log_file(f"[Offsite] Sync for {self.game_name} cancelled, it will resume next time.")
+        except Exception as e:
+            write_log_file(f"[ERROR] Offsite sync for {self.game_name} failed: {e}")
+            self.error_signal.emit(self.game_name, str(e))
+
+
+class OffsiteService(QObject):
+    replicated = Signal(str, str)
+    failed = Signal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.worker = None
+        self.pending = []
+
+    def replicate(self, game_name):
+        if get_offsite_settings() is None:
+            return
+        if game_name not in self.pending:
+            self.pending.append(game_name)
+        self._next()
+
+    def _next(self):
+        if self.worker or not self.pending:
+            return
+        settings = get_offsite_settings()
+        if settings is None:
+            self.pending.clear()
+            return
+        worker = ReplicationWorker(self.pending.pop(0), settings)
+        worker.done_signal.connect(self.replicated.emit)
+        worker.error_signal.connect(self.failed.emit)
+        worker.finished.connect(lambda: self._on_finished(worker))
+        self.worker = worker
+        worker.start()
+
+    def _on_finished(self, worker):
+        if self.worker is worker:
+            self.worker = None
+        worker.deleteLater()
+        self._next()
+
+    def stop(self):
+        self.pending.clear()
+        if self.worker:
+            self.worker.cancel_requested = True
+            self.worker.wait(5000)
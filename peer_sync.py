@@ -0,0 +1,539 @@
+import os
+import hmac
+import json
+import math
+import mmap
+import zlib
+import struct
+import socket
+import hashlib
+import ipaddress
+import threading
+import socketserver
+from pathlib import Path
+from PySide6.QtCore import QObject, QTimer, Signal
+
+from jobs import Job, PRIORITY_BACKGROUND
+from retention import Archive, parse_archive_name, plan_retention, plan_folder, delete_archives
+from config_utils import (
+    GAMES, game_key, get_default_backup_path, get_max_backups, get_peer_settings,
+    get_retention_policy, write_log_file
+)
+
+
+PROTOCOL_VERSION = 1
+MIN_BLOCK = 4 * 1024
+MAX_BLOCK = 128 * 1024
+STRONG_SIZE = 16
+SIG_ENTRY = struct.Struct(">I16s")
+FRAME_HEADER = struct.Struct(">cI")
+COPY_OP = struct.Struct(">II")
+LITERAL_FLUSH = 256 * 1024
+RECV_CHUNK = 256 * 1024
+PREAUTH_MAX_FRAME = 4 * 1024
+MAX_FRAME = 8 * 1024 * 1024
+MAX_REQUEST_HEADER = 4 * 1024
+MAX_SIGNATURE_BYTES = 4 * 1024 * 1024
+ADLER_MOD = 65521
+GIVE_UP_AFTER = 8 * 1024 * 1024
+GIVE_UP_RATIO = 0.9
+PIPELINE_DEPTH = 4
+SOCKET_TIMEOUT_S = 60
+
+HELLO = b"H"
+CHALLENGE = b"N"
+CATALOG_REQUEST = b"Q"
+CATALOG = b"K"
+REQUEST = b"R"
+BEGIN = b"B"
+COPY = b"C"
+LITERAL = b"L"
+END = b"E"
+FAILED = b"X"
+BYE = b"Z"
+
+
+class PeerSyncError(Exception):
+    pass
+
+
+def block_size_for(size):
+    return max(MIN_BLOCK, min(MAX_BLOCK, math.isqrt(max(size, 1)) // 1024 * 1024))
+
+
+def strong_hash(data):
+    return hashlib.blake2b(data, digest_size=STRONG_SIZE).digest()
+
+
+def file_signatures(path, block_size):
+    sigs = bytearray()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sigs += SIG_ENTRY.pack(zlib.adler32(block), strong_hash(block))
+    return bytes(sigs)
+
+
+def parse_signatures(blob):
+    table = {}
+    for index, (weak, strong) in enumerate(SIG_ENTRY.iter_unpack(blob)):
+        table.setdefault(weak, {}).setdefault(strong, index)
+    return table
+
+
+def compute_delta(path, block_size, signatures, emit):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return _delta(b"", block_size, signatures, emit)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return _delta(data, block_size, signatures, emit)
+
+
+def _delta(data, block_size, signatures, emit):
+    table = parse_signatures(signatures) if signatures else {}
+    digest = hashlib.blake2b(digest_size=STRONG_SIZE)
+    digest.update(data)
+    size = len(data)
+    literal = bytearray()
+    run_start = run_len = 0
+    literal_total = 0
+
+    def flush_literal():
+        nonlocal literal
+        if literal:
+            emit(LITERAL, bytes(literal))
+            literal = bytearray()
+
+    def flush_run():
+        nonlocal run_len
+        if run_len:
+            emit(COPY, COPY_OP.pack(run_start, run_len))
+            run_len = 0
+
+    def add_copy(index):
+        nonlocal run_start, run_len
+        if run_len and run_start + run_len == index:
+            run_len += 1
+            return
+        flush_run()
+        run_start, run_len = index, 1
+
+    def add_literal(chunk):
+        nonlocal literal_total
+        flush_run()
+        literal_total += len(chunk)
+        for start in range(0, len(chunk), LITERAL_FLUSH):
+            literal.extend(chunk[start:start + LITERAL_FLUSH])
+            if len(literal) >= LITERAL_FLUSH:
+                flush_literal()
+
+    pos = 0
+    weak = None
+    scan_start = 0
+    while table and pos + block_size <= size:
+        if pos >= GIVE_UP_AFTER and literal_total > pos * GIVE_UP_RATIO:
+            break
+        if weak is None:
+            weak = zlib.adler32(data[pos:pos + block_size])
+            a, b = weak & 0xFFFF, weak >> 16
+        candidates = table.get(weak)
+        if candidates:
+            index = candidates.get(strong_hash(data[pos:pos + block_size]))
+            if index is not None:
+                if scan_start < pos:
+                    add_literal(data[scan_start:pos])
+                flush_literal()
+                add_copy(index)
+                pos += block_size
+                scan_start = pos
+                weak = None
+                continue
+        if pos + block_size >= size:
+            break
+        out_byte = data[pos]
+        in_byte = data[pos + block_size]
+        a = (a - out_byte + in_byte) % ADLER_MOD
+        b = (b - block_size * out_byte + a - 1) % ADLER_MOD
+        weak = (b << 16) | a
+        pos += 1
+        if pos - scan_start >= LITERAL_FLUSH:
+            add_literal(data[scan_start:pos])
+            scan_start = pos
+
+    if scan_start < size:
+        add_literal(data[scan_start:])
+    flush_literal()
+    flush_run()
+    return digest.digest(), size
+
+
+class Channel:
+    def __init__(self, sock):
+        self.sock = sock
+        self.compressor = zlib.compressobj(6)
+        self.decompressor = zlib.decompressobj()
+        self.buffer = bytearray()
+        self.send_lock = threading.Lock()
+        self.max_frame = PREAUTH_MAX_FRAME
+
+    def send(self, kind, payload=b""):
+        frame = FRAME_HEADER.pack(kind, len(payload)) + payload
+        with self.send_lock:
+            data = self.compressor.compress(frame) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.sock.sendall(data)
+
+    def send_json(self, kind, obj):
+        self.send(kind, json.dumps(obj).encode("utf-8"))
+
+    def _fill(self, needed):
+        while len(self.buffer) < needed:
+            data = self.decompressor.unconsumed_tail
+            if not data:
+                data = self.sock.recv(RECV_CHUNK)
+                if not data:
+                    raise PeerSyncError("Connection closed by peer")
+            self.buffer += self.decompressor.decompress(data, max(needed - len(self.buffer), RECV_CHUNK))
+
+    def recv(self):
+        self._fill(FRAME_HEADER.size)
+        kind, length = FRAME_HEADER.unpack_from(self.buffer)
+        if length > self.max_frame:
+            raise PeerSyncError(f"Frame of {length} bytes is over the {self.max_frame} byte limit")
+        self._fill(FRAME_HEADER.size + length)
+        payload = bytes(self.buffer[FRAME_HEADER.size:FRAME_HEADER.size + length])
+        del self.buffer[:FRAME_HEADER.size + length]
+        return kind, payload
+
+    def expect(self, kind):
+        got, payload = self.recv()
+        if got == FAILED:
+            raise PeerSyncError(json.loads(payload).get("error", "Peer reported an error"))
+        if got != kind:
+            raise PeerSyncError(f"Unexpected frame {got!r}, wanted {kind!r}")
+        return payload
+
+
+def _auth_digest(secret, nonce):
+    return hmac.new(secret.encode("utf-8"), nonce, hashlib.sha256).digest()
+
+
+def default_folders():
+    folders = {}
+    for g in GAMES:
+        folder = get_default_backup_path(g)
+        if folder and Path(folder).is_dir():
+            folders[game_key(g)] = Path(folder)
+    return folders
+
+
+def archives_in(folder, key):
+    return sorted(Path(folder).glob(f"{key}_backup_*.zip"), key=lambda p: p.name)
+
+
+def build_catalog(folders):
+    catalog = []
+    for key, folder in folders.items():
+        for path in archives_in(folder, key):
+            st = path.stat()
+            catalog.append({"game": key, "name": path.name, "size": st.st_size, "mtime": st.st_mtime})
+    return catalog
+
+
+def serve_connection(sock, folders, secret):
+    sock.settimeout(SOCKET_TIMEOUT_S)
+    channel = Channel(sock)
+    nonce = os.urandom(16)
+    channel.send(CHALLENGE, nonce)
+    hello = json.loads(channel.expect(HELLO))
+    if not isinstance(hello, dict) or hello.get("version") != PROTOCOL_VERSION:
+        channel.send_json(FAILED, {"error": "Protocol version mismatch"})
+        return
+    auth = hello.get("auth")
+    if not isinstance(auth, str) or not hmac.compare_digest(bytes.fromhex(auth), _auth_digest(secret, nonce)):
+        channel.send_json(FAILED, {"error": "Authentication failed"})
+        return
+    channel.max_frame = MAX_FRAME
+
+    while True:
+        kind, payload = channel.recv()
+        if kind == BYE:
+            return
+        if kind == CATALOG_REQUEST:
+            channel.send_json(CATALOG, build_catalog(folders))
+        elif kind == REQUEST:
+            header_len = struct.unpack_from(">I", payload)[0]
+            if header_len > MAX_REQUEST_HEADER:
+                raise PeerSyncError(f"Request header of {header_len} bytes is too large")
+            request = json.loads(payload[4:4 + header_len])
+            signatures = payload[4 + header_len:]
+            if (not isinstance(request, dict) or not isinstance(request.get("game"), str)
+                    or not isinstance(request.get("name"), str) or not isinstance(request.get("block_size"), int)
+                    or not MIN_BLOCK <= request["block_size"] <= MAX_BLOCK
+                    or len(signatures) % SIG_ENTRY.size or len(signatures) > MAX_SIGNATURE_BYTES):
+                raise PeerSyncError("Malformed archive request")
+            folder = folders.get(request["game"])
+            path = Path(folder) / Path(request["name"]).name if folder else None
+            if path is None or not path.is_file():
+                channel.send_json(FAILED, {"error": f"{request['name']} is not available"})
+                continue
+            channel.send_json(BEGIN, {"name": path.name, "game": request["game"]})
+            digest, size = compute_delta(path, request["block_size"], signatures, channel.send)
+            channel.send_json(END, {"digest": digest.hex(), "size": size, "mtime": path.stat().st_mtime})
+        else:
+            raise PeerSyncError(f"Unexpected frame {kind!r}")
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            serve_connection(self.request, self.server.folders_fn(), self.server.secret)
+        except (OSError, PeerSyncError, ValueError) as e:
+            write_log_file(f"[Peer Sync] Connection from {self.client_address[0]} ended: {e}")
+
+
+def is_lan_address(address):
+    try:
+        ip = ipaddress.ip_address(address.split("%")[0])
+    except ValueError:
+        return False
+    if getattr(ip, "ipv4_mapped", None):
+        ip = ip.ipv4_mapped
+    return ip.is_private or ip.is_loopback or ip.is_link_local
+
+
+class PeerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port, secret, folders_fn=default_folders, host="", allow_public=False):
+        super().__init__((host, port), _Handler)
+        self.secret = secret
+        self.folders_fn = folders_fn
+        self.allow_public = allow_public
+
+    def verify_request(self, request, client_address):
+        if self.allow_public or is_lan_address(client_address[0]):
+            return True
+        write_log_file(f"[Peer Sync] Refused connection from non-local address {client_address[0]}")
+        return False
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def valid_entry(entry, folders):
+    if not isinstance(entry, dict):
+        return False
+    game, name = entry.get("game"), entry.get("name")
+    if not isinstance(game, str) or not isinstance(name, str) or game not in folders:
+        return False
+    parsed = parse_archive_name(name)
+    return Path(name).name == name and parsed is not None and parsed[0] == game
+
+
+def wanted_archives(catalog, folders, max_backups):
+    policy = get_retention_policy()
+    catalog = [e for e in catalog if valid_entry(e, folders)] if isinstance(catalog, list) else []
+    wanted = []
+    for key, folder in folders.items():
+        local = {p.name for p in archives_in(folder, key)}
+        remote = {e["name"]: e for e in catalog if e["game"] == key}
+        merged = []
+        for name in local | set(remote):
+            parsed = parse_archive_name(name)
+            if parsed:
+                merged.append(Archive(Path(name), parsed[1], parsed[0]))
+        kept, _ = plan_retention(merged, policy, max_backups)
+        wanted += [remote[a.path.name] for a in kept if a.path.name not in local]
+    return wanted
+
+
+def choose_basis(folder, key, name):
+    candidates = archives_in(folder, key)
+    older = [p for p in candidates if p.name < name]
+    return (older or candidates or [None])[-1]
+
+
+def apply_delta(channel, basis, block_size, target):
+    part = target.with_name(target.name + ".part")
+    digest = hashlib.blake2b(digest_size=STRONG_SIZE)
+    src = open(basis, "rb") if basis else None
+    try:
+        with open(part, "wb") as out:
+            while True:
+                kind, payload = channel.recv()
+                if kind == LITERAL:
+                    out.write(payload)
+                    digest.update(payload)
+                elif kind == COPY:
+                    start, count = COPY_OP.unpack(payload)
+                    if src is None:
+                        raise PeerSyncError("Peer referenced a basis that was not sent")
+                    src.seek(start * block_size)
+                    remaining = count * block_size
+                    while remaining > 0:
+                        chunk = src.read(min(remaining, RECV_CHUNK))
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                        digest.update(chunk)
+                        remaining -= len(chunk)
+                elif kind == END:
+                    end = json.loads(payload)
+                    break
+                elif kind == FAILED:
+                    raise PeerSyncError(json.loads(payload).get("error", "Peer reported an error"))
+                else:
+                    raise PeerSyncError(f"Unexpected frame {kind!r}")
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+    finally:
+        if src:
+            src.close()
+    if digest.hexdigest() != end["digest"]:
+        part.unlink(missing_ok=True)
+        raise PeerSyncError(f"Checksum mismatch for {target.name}")
+    os.replace(part, target)
+    os.utime(target, (end["mtime"], end["mtime"]))
+    return end["size"]
+
+
+def pull_from_peer(host, port, secret, folders=None, max_backups=None, log=write_log_file):
+    folders = default_folders() if folders is None else folders
+    max_backups = get_max_backups() if max_backups is None else max_backups
+    with socket.create_connection((host, port), timeout=SOCKET_TIMEOUT_S) as sock:
+        channel = Channel(sock)
+        nonce = channel.expect(CHALLENGE)
+        channel.send_json(HELLO, {"version": PROTOCOL_VERSION, "auth": _auth_digest(secret, nonce).hex()})
+        channel.max_frame = MAX_FRAME
+        channel.send(CATALOG_REQUEST)
+        catalog = json.loads(channel.expect(CATALOG))
+        wanted = wanted_archives(catalog, folders, max_backups)
+
+        plans = []
+        for entry in wanted:
+            folder = folders[entry["game"]]
+            basis = choose_basis(folder, entry["game"], entry["name"])
+            block_size = block_size_for(basis.stat().st_size) if basis else MIN_BLOCK
+            if basis and -(-basis.stat().st_size // block_size) * SIG_ENTRY.size > MAX_SIGNATURE_BYTES:
+                basis, block_size = None, MIN_BLOCK
+            plans.append((entry, basis, block_size))
+
+        slots = threading.Semaphore(PIPELINE_DEPTH)
+        send_error = []
+
+        def send_requests():
+            try:
+                for entry, basis, block_size in plans:
+                    slots.acquire()
+                    header = json.dumps({"game": entry["game"], "name": entry["name"],
+                                         "block_size": block_size}).encode("utf-8")
+                    signatures = file_signatures(basis, block_size) if basis else b""
+                    channel.send(REQUEST, struct.pack(">I", len(header)) + header + signatures)
+            except OSError as e:
+                send_error.append(e)
+
+        sender = threading.Thread(target=send_requests, daemon=True)
+        sender.start()
+
+        received = 0
+        try:
+            for entry, basis, block_size in plans:
+                begin = json.loads(channel.expect(BEGIN))
+                if not isinstance(begin, dict) or (begin.get("game"), begin.get("name")) != (entry["game"], entry["name"]):
+                    raise PeerSyncError(f"Peer sent an unexpected archive instead of {entry['name']}")
+                target = folders[entry["game"]] / entry["name"]
+                apply_delta(channel, basis, block_size, target)
+                slots.release()
+                received += 1
+                log(f"[Peer Sync] Received {target.name} from {host}"
+                    + (f" (delta against {basis.name})" if basis else ""))
+        except BaseException:
+            for _ in plans:
+                slots.release()
+            raise
+        sender.join()
+        if send_error:
+            raise send_error[0]
+        channel.send(BYE)
+
+    for folder in folders.values():
+        delete_archives(plan_folder(folder, max_backups=max_backups)[1])
+    return received
+
+
+class PeerSyncWorker(Job):
+    done_signal = Signal(str)
+    priority = PRIORITY_BACKGROUND
+
+    def __init__(self, peers, secret):
+        super().__init__()
+        self.peers = peers
+        self.secret = secret
+
+    def title(self):
+        return "Peer sync"
+
+    def run(self):
+        for host, port in self.peers:
+            if self.cancel_requested:
+                break
+            try:
+                received = pull_from_peer(host, port, self.secret)
+                summary = f"Peer sync with {host}: {received} archive(s) received."
+            except (OSError, PeerSyncError, ValueError, KeyError, TypeError) as e:
+                summary = f"[ERROR] Peer sync with {host} failed: {e}"
+            write_log_file(summary)
+            self.done_signal.emit(summary)
+
+
+class PeerService(QObject):
+    synced = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.server = None
+        self.worker = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.sync_now)
+
+    def start(self):
+        settings = get_peer_settings()
+        if settings is None:
+            return
+        try:
+            self.server = PeerServer(settings["port"], settings["secret"], host=settings["bind"],
+                                     allow_public=settings["allow_public"])
+            self.server.start()
+            write_log_file(f"[Peer Sync] Listening on {settings['bind'] or 'all interfaces'} port {settings['port']}"
+                           + (" (LAN peers only)." if not settings["allow_public"] else "."))
+        except OSError as e:
+            write_log_file(f"[ERROR] Peer sync could not listen on port {settings['port']}: {e}")
+        if settings["peers"]:
+            self.timer.start(settings["interval_minutes"] * 60 * 1000)
+
+    def stop(self):
+        self.timer.stop()
+        if self.server:
+            self.server.stop()
+            self.server = None
+        if self.worker:
+            self.worker.cancel_requested = True
+            self.worker.wait(5000)
+
+    def sync_now(self):
+        settings = get_peer_settings()
+        if settings is None or not settings["peers"] or self.worker:
+            return
+        self.worker = PeerSyncWorker(settings["peers"], settings["secret"])
+        self.worker.done_signal.connect(self.synced.emit)
+        self.worker.finished.connect(self._on_finished)
+        self.worker.start()
+
+    def _on_finished(self):
+        self.worker.deleteLater()
+        self.worker = None
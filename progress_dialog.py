@@ -1,10 +1,55 @@
+import shutil
+from collections import deque
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QLabel, QProgressBar, QPushButton,
-    QPlainTextEdit, QGraphicsOpacityEffect
+    QListView, QGraphicsOpacityEffect, QFileDialog, QMessageBox
+)
+from PySide6.QtCore import (
+    Qt, QPropertyAnimation, QSize, QParallelAnimationGroup,
+    QAbstractListModel, QModelIndex, QTimer
 )
-from PySide6.QtCore import Qt, QPropertyAnimation, QSize, QParallelAnimationGroup
-from PySide6.QtGui import QTextCursor
 from theme import Theme
+from config_utils import LOGFILE_PATH
+
+
+LOG_CAPACITY = 5000
+LOG_FLUSH_MS = 100
+
+
+class LogModel(QAbstractListModel):
+    def __init__(self, capacity=LOG_CAPACITY, parent=None):
+        super().__init__(parent)
+        self.lines = deque(maxlen=capacity)
+        self.capacity = capacity
+        self.pending = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.lines)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self.lines[index.row()]
+        return None
+
+    def append(self, message: str):
+        self.pending.append(message)
+
+    def flush(self) -> bool:
+        if not self.pending:
+            return False
+        batch = self.pending[-self.capacity:]
+        self.pending = []
+        overflow = len(self.lines) + len(batch) - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self.lines.popleft()
+            self.endRemoveRows()
+        start = len(self.lines)
+        self.beginInsertRows(QModelIndex(), start, start + len(batch) - 1)
+        self.lines.extend(batch)
+        self.endInsertRows()
+        return True
 
 
 class ProgressDialog(QDialog):
@@ -30,6 +75,11 @@ class ProgressDialog(QDialog):
         self.percent_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(self.percent_label)
 
+        self.file_label = QLabel("")
+        self.file_label.setAlignment(Qt.AlignCenter)
+        self.file_label.hide()
+        layout.addWidget(self.file_label)
+
         self.cancel_btn = QPushButton("Cancel")
         self.cancel_btn.setStyleSheet(self.theme.button_style())
         self.cancel_btn.clicked.connect(self.cancel)
@@ -40,7 +90,11 @@ class ProgressDialog(QDialog):
         self.toggle_btn.clicked.connect(self.toggle_details)
         layout.addWidget(self.toggle_btn)
 
-        self.details_box = QPlainTextEdit(readOnly=True)
+        self.log_model = LogModel(parent=self)
+        self.details_box = QListView()
+        self.details_box.setModel(self.log_model)
+        self.details_box.setUniformItemSizes(True)
+        self.details_box.setEditTriggers(QListView.NoEditTriggers)
         self.details_box.setStyleSheet(
             f"background-color: {theme.text_bg}; color: {theme.text_fg};"
         )
@@ -55,6 +109,17 @@ class ProgressDialog(QDialog):
         layout.addWidget(self.details_box)
         layout.setStretchFactor(self.details_box, 1)
 
+        self.export_btn = QPushButton("Export Full Log…")
+        self.export_btn.setStyleSheet(self.theme.button_style())
+        self.export_btn.clicked.connect(self.export_log)
+        self.export_btn.hide()
+        layout.addWidget(self.export_btn)
+
+        self.log_timer = QTimer(self)
+        self.log_timer.setInterval(LOG_FLUSH_MS)
+        self.log_timer.timeout.connect(self.flush_log)
+        self.log_timer.start()
+
         self.setLayout(layout)
         self.worker = None
         self.details_visible = False
@@ -66,9 +131,11 @@ class ProgressDialog(QDialog):
 
     def _calc_height_with_details(self, visible: bool) -> int:
         self.details_box.setVisible(visible)
+        self.export_btn.setVisible(visible)
         inner = self.sizeHint().height()
         frame_overhead = self.frameGeometry().height() - self.geometry().height()
         self.details_box.setVisible(self.details_visible)
+        self.export_btn.setVisible(self.details_visible)
         return inner + frame_overhead
 
     def toggle_details(self):
@@ -85,6 +152,8 @@ class ProgressDialog(QDialog):
 
         if self.details_visible:
             self.details_box.show()
+            self.export_btn.show()
+            self.details_box.scrollToBottom()
 
         if self._anim_group:
             self._anim_group.stop()
@@ -108,6 +177,7 @@ class ProgressDialog(QDialog):
             anim_fade.setEndValue(0)
             self.toggle_btn.setText("Show Details ▼")
             anim_group.finished.connect(lambda: self.details_box.hide())
+            self.export_btn.hide()
 
         anim_group.addAnimation(anim_fade)
         anim_group.start()
@@ -138,18 +208,40 @@ class ProgressDialog(QDialog):
 
     def log(self, message: str):
         if message != self._last_log_message:
-            self.log_label.setText(message)
-            self.details_box.appendPlainText(message)
-            self.details_box.moveCursor(QTextCursor.End)
-            self.details_box.ensureCursorVisible()
+            self.log_model.append(message)
             self._last_log_message = message
 
+    def flush_log(self):
+        if not self.log_model.flush():
+            return
+        if not self.details_visible:
+            self.log_label.setText(self._last_log_message)
+        if self.details_visible:
+            self.details_box.scrollToBottom()
+
+    def export_log(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Full Log", "sbu_log.txt", "Text Files (*.txt)")
+        if not path:
+            return
+        try:
+            with open(LOGFILE_PATH, "rb") as src, open(path, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        except OSError as e:
+            QMessageBox.warning(self, "Export Failed", str(e))
+
     def update_progress(self, value: int):
         self.progress_bar.setValue(value)
         max_val = self.progress_bar.maximum() or 1
         percent = int((value / max_val) * 100)
         self.percent_label.setText(f"{percent}%")
 
+    def update_file_progress(self, name: str, percent: int):
+        if percent >= 100:
+            self.file_label.hide()
+            return
+        self.file_label.setText(f"{name} — {percent}%")
+        self.file_label.show()
+
     def set_max(self, value: int):
         self.progress_bar.setMaximum(value)
 
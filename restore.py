@@ -1,11 +1,20 @@
-from PySide6.QtCore import QThread, Signal
+from PySide6.QtCore import Signal
 from pathlib import Path
 import shutil
 import zipfile
-import filecmp
+import json
 
-from paths import get_game_folder, APPDATA_DIR
-from config_utils import write_log_file
+from paths import APPDATA_DIR
+from discovery import find_game_folder
+from fingerprint import FingerprintCache, hash_file
+from streaming import ChunkSizer, StreamCancelled, copy_stream, safe_member_path
+from config_utils import write_log_file, get_cc_backup_enabled
+from cc_store import CCStore, CCCancelled, CC_STORE_DIRNAME, MODS_DIRNAME, restore_mods
+from retention import parse_archive_name
+from backup import save_rotation
+from smallpack import PACK_NAME, unpack
+from jobs import Job, Reply, PRIORITY_INTERACTIVE
+from standby import claim_standby, release_standby
 
 
 INCLUDE_MAP = {
@@ -17,13 +26,16 @@ INCLUDE_MAP = {
 }
 
 
-class RestoreWorker(QThread):
+class RestoreWorker(Job):
     log_signal = Signal(str)
     progress_signal = Signal(int)
     max_signal = Signal(int)
+    file_progress_signal = Signal(str, int)
     done_signal = Signal()
     request_confirmation_signal = Signal()
     confirmation_result_signal = Signal(bool)
+    priority = PRIORITY_INTERACTIVE
+    diagnosable = True
 
     def __init__(self, dialog, zip_file_path, game_name: str):
         super().__init__()
@@ -31,51 +43,46 @@ class RestoreWorker(QThread):
         self.zip_file_path = Path(zip_file_path)
         self.game_name = game_name
         self.game_key = self.game_name.strip().lower()
-        self.cancel_requested = False
+        self.confirmation = Reply()
         self.user_confirmed = None
+        self.archive_meta = {}
+        self.from_standby = False
 
         self.log_signal.connect(dialog.log)
         self.progress_signal.connect(dialog.update_progress)
         self.max_signal.connect(dialog.set_max)
+        self.file_progress_signal.connect(dialog.update_file_progress)
         self.done_signal.connect(self.on_done)
         self.confirmation_result_signal.connect(self.set_confirmation_result)
 
     def run(self):
+        temp_extract_folder = None
+        consumed = False
         try:
             self.log(f"Starting restore for {self.game_name}...")
 
-            temp_extract_folder = APPDATA_DIR / f"temp_restore_{self.game_key.replace(' ', '_')}"
-            temp_extract_folder.mkdir(parents=True, exist_ok=True)
-
-            with zipfile.ZipFile(self.zip_file_path, 'r') as zipf:
-                zip_list = zipf.infolist()
-                self.progress_signal.emit(0)
-                self.max_signal.emit(len(zip_list))
-
-                for step, item in enumerate(zip_list, start=1):
-                    if self.cancel_requested:
-                        self.log("Restore cancelled during extraction.")
-                        shutil.rmtree(temp_extract_folder, ignore_errors=True)
-                        return
-                    zipf.extract(item, temp_extract_folder)
-                    self.log(f"Extracted: {item.filename}")
-                    self.progress_signal.emit(step)
+            temp_extract_folder = claim_standby(self.game_name, self.zip_file_path)
+            self.from_standby = temp_extract_folder is not None
+            if self.from_standby:
+                self.log("Using the pre-staged copy of this backup.")
+                self.read_archive_meta()
+            else:
+                temp_extract_folder = APPDATA_DIR / f"temp_restore_{self.game_key.replace(' ', '_')}"
+                temp_extract_folder.mkdir(parents=True, exist_ok=True)
+                try:
+                    self.extract_archive(temp_extract_folder)
+                except StreamCancelled:
+                    self.log("Restore cancelled during extraction.")
+                    return
 
             self.request_confirmation_signal.emit()
-            while self.user_confirmed is None:
-                self.msleep(50)
+            self.user_confirmed = self.confirmation.wait(self.token)
 
-            if not self.user_confirmed:
-                self.log("Restore cancelled by user.")
-                shutil.rmtree(temp_extract_folder, ignore_errors=True)
+            if not self.user_confirmed or self.cancel_requested:
+                self.log("Restore cancelled by user." if not self.user_confirmed else "Restore cancelled before file copy.")
                 return
 
-            if self.cancel_requested:
-                self.log("Restore cancelled before file copy.")
-                shutil.rmtree(temp_extract_folder, ignore_errors=True)
-                return
-
-            game_root = get_game_folder(self.game_name)
+            game_root = find_game_folder(self.game_name)
             if not game_root.exists():
                 game_root.mkdir(parents=True, exist_ok=True)
 
@@ -92,61 +99,175 @@ class RestoreWorker(QThread):
             self.max_signal.emit(total_files)
             self._copied_files = 0
 
-            def copy_with_smart_delete(src: Path, dst: Path):
-                if src.is_dir():
-                    dst.mkdir(parents=True, exist_ok=True)
-                    for item in src.iterdir():
-                        target = dst / item.name
-                        if item.is_dir():
-                            copy_with_smart_delete(item, target)
-                        else:
-                            if not target.exists() or not filecmp.cmp(item, target, shallow=False):
-                                if target.exists():
-                                    target.unlink()
-                                    self.log(f"Removed existing file: {target.relative_to(game_root)}")
-                                shutil.copy2(item, target)
-                                self.log(f"Copied file: {target.relative_to(game_root)}")
-                            else:
-                                self.log(f"Skipped unchanged file: {target.relative_to(game_root)}")
-                            self._copied_files += 1
-                            self.progress_signal.emit(self._copied_files)
-                else:
-                    dst.parent.mkdir(parents=True, exist_ok=True)
-                    if not dst.exists() or not filecmp.cmp(src, dst, shallow=False):
-                        if dst.exists():
-                            dst.unlink()
-                            self.log(f"Removed existing file: {dst.relative_to(game_root)}")
+            with FingerprintCache() as fingerprints:
+                manifest = fingerprints.archive_manifest(self.zip_file_path)
+
+                def expected_hash(src: Path):
+                    digest = manifest.get(src.relative_to(temp_extract_folder).as_posix())
+                    return digest if digest is not None else hash_file(src)
+
+                def unchanged(src: Path, dst: Path):
+                    if not dst.exists() or src.stat().st_size != dst.stat().st_size:
+                        return False
+                    return fingerprints.fingerprint(dst) == expected_hash(src)
+
+                def copy_file(src: Path, dst: Path):
+                    if self.from_standby:
+                        shutil.move(src, dst)
+                    else:
                         shutil.copy2(src, dst)
-                        self.log(f"Copied file: {dst.relative_to(game_root)}")
+                    digest = manifest.get(src.relative_to(temp_extract_folder).as_posix())
+                    if digest is not None:
+                        fingerprints.put(dst, digest)
+
+                def copy_with_smart_delete(src: Path, dst: Path):
+                    if src.is_dir():
+                        dst.mkdir(parents=True, exist_ok=True)
+                        for item in src.iterdir():
+                            target = dst / item.name
+                            if item.is_dir():
+                                copy_with_smart_delete(item, target)
+                            else:
+                                if not unchanged(item, target):
+                                    if target.exists():
+                                        target.unlink()
+                                        self.log(f"Removed existing file: {target.relative_to(game_root)}")
+                                    copy_file(item, target)
+                                    self.log(f"Copied file: {target.relative_to(game_root)}")
+                                else:
+                                    self.log(f"Skipped unchanged file: {target.relative_to(game_root)}")
+                                self._copied_files += 1
+                                self.progress_signal.emit(self._copied_files)
                     else:
-                        self.log(f"Skipped unchanged file: {dst.relative_to(game_root)}")
-                    self._copied_files += 1
-                    self.progress_signal.emit(self._copied_files)
+                        dst.parent.mkdir(parents=True, exist_ok=True)
+                        if not unchanged(src, dst):
+                            if dst.exists():
+                                dst.unlink()
+                                self.log(f"Removed existing file: {dst.relative_to(game_root)}")
+                            copy_file(src, dst)
+                            self.log(f"Copied file: {dst.relative_to(game_root)}")
+                        else:
+                            self.log(f"Skipped unchanged file: {dst.relative_to(game_root)}")
+                        self._copied_files += 1
+                        self.progress_signal.emit(self._copied_files)
 
-            restored_any = False
+                restored_any = False
+                consumed = True
 
-            for sub in include_dirs:
-                src = temp_extract_folder / sub
-                dst = game_root / sub
-                if src.exists():
-                    copy_with_smart_delete(src, dst)
-                    restored_any = True
+                for sub in include_dirs:
+                    src = temp_extract_folder / sub
+                    dst = game_root / sub
+                    if src.exists():
+                        copy_with_smart_delete(src, dst)
+                        restored_any = True
 
-            if not restored_any:
-                for item in temp_extract_folder.iterdir():
-                    src = item
-                    dst = game_root / item.name
-                    copy_with_smart_delete(src, dst)
+                if not restored_any:
+                    for item in temp_extract_folder.iterdir():
+                        src = item
+                        dst = game_root / item.name
+                        copy_with_smart_delete(src, dst)
+
+                self.reconcile_save_rotations(temp_extract_folder, game_root)
+                self.restore_custom_content(game_root, fingerprints)
 
-            shutil.rmtree(temp_extract_folder, ignore_errors=True)
             self.log("Restore complete.")
             self.done_signal.emit()
 
         except Exception as e:
             self.log(f"[ERROR] Restore failed: {e}")
+        finally:
+            if temp_extract_folder is not None and self.from_standby:
+                release_standby(temp_extract_folder, consumed=consumed)
+            elif temp_extract_folder is not None:
+                shutil.rmtree(temp_extract_folder, ignore_errors=True)
+
+    def reconcile_save_rotations(self, temp_extract_folder: Path, game_root: Path):
+        if self.archive_meta.get("save_rotations") is None:
+            return
+        removed = 0
+        for restored in temp_extract_folder.rglob("*"):
+            rotation = save_rotation(self.game_key, restored.name)
+            if not rotation or rotation[1] is not None or not restored.is_file():
+                continue
+            dest_dir = game_root / restored.parent.relative_to(temp_extract_folder)
+            for existing in dest_dir.glob(restored.name + ".ver*"):
+                stale = save_rotation(self.game_key, existing.name)
+                if stale and stale[1] is not None and not (restored.parent / existing.name).exists():
+                    existing.unlink()
+                    removed += 1
+                    self.log(f"Removed stale save version: {existing.relative_to(game_root)}")
+        if removed:
+            self.log(f"Removed {removed} save version(s) that did not belong to the restored saves.")
+
+    def restore_custom_content(self, game_root: Path, fingerprints):
+        if self.game_key != "sims 4" or not get_cc_backup_enabled():
+            return
+        parsed = parse_archive_name(self.zip_file_path.name)
+        if not parsed:
+            return
+        later = [
+            other[1] for other in map(parse_archive_name, (p.name for p in self.zip_file_path.parent.glob("*.zip")))
+            if other and other[0] == parsed[0] and other[1] > parsed[1]
+        ]
+        store = CCStore(self.zip_file_path.parent / CC_STORE_DIRNAME)
+        manifest = store.manifest_before(min(later) if later else None)
+        if not manifest:
+            return
+        self.log("Restoring Mods and custom content...")
+        try:
+            restored = restore_mods(store, manifest, game_root / MODS_DIRNAME, fingerprints, self.log,
+                                    cancel=lambda: self.cancel_requested)
+        except CCCancelled:
+            self.log("Custom content restore cancelled.")
+            return
+        self.log(f"Custom content restored: {restored} file(s) replaced.")
+
+    def read_archive_meta(self, zipf=None):
+        if zipf is None:
+            with zipfile.ZipFile(self.zip_file_path, 'r') as zipf:
+                return self.read_archive_meta(zipf)
+        try:
+            self.archive_meta = json.loads(zipf.comment or b"{}")
+        except ValueError:
+            self.archive_meta = {}
+
+    def extract_archive(self, temp_extract_folder: Path):
+        sizer = ChunkSizer()
+        cancelled = lambda: self.cancel_requested
+        with zipfile.ZipFile(self.zip_file_path, 'r') as zipf:
+            self.read_archive_meta(zipf)
+            zip_list = zipf.infolist()
+            self.progress_signal.emit(0)
+            self.max_signal.emit(len(zip_list))
+
+            for step, item in enumerate(zip_list, start=1):
+                if self.cancel_requested:
+                    raise StreamCancelled()
+                if item.filename == PACK_NAME:
+                    with zipf.open(item, "r") as src:
+                        count = unpack(src, temp_extract_folder, cancelled)
+                    self.log(f"Extracted {count} packed small file(s).")
+                    self.progress_signal.emit(step)
+                    continue
+                target = safe_member_path(temp_extract_folder, item.filename)
+                if item.is_dir():
+                    target.mkdir(parents=True, exist_ok=True)
+                else:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    with zipf.open(item, "r") as src, open(target, "wb") as dst:
+                        copy_stream(
+                            src, dst, item.file_size, cancelled,
+                            lambda percent, name=item.filename: self.file_progress_signal.emit(name, percent),
+                            sizer
+                        )
+                self.log(f"Extracted: {item.filename}")
+                self.progress_signal.emit(step)
 
     def set_confirmation_result(self, result: bool):
-        self.user_confirmed = result
+        self.confirmation.set(result)
+
+    def title(self):
+        return f"Restore {self.game_name}"
 
     def log(self, message):
         self.log_signal.emit(message)
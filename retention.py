@@ -0,0 +1,187 @@
+import os
+import re
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from paths import APPDATA_DIR
+from config_utils import get_max_backups, get_retention_policy, settings_lock
+from fingerprint import FingerprintCache
+from jobs import get_executor
+
+
+ARCHIVE_NAME = re.compile(r"^(.*)_backup_(\d{8}_\d{6})(?:\.salvaged)?\.zip$")
+SALVAGED_SUFFIX = ".salvaged.zip"
+PRUNED_PATH = APPDATA_DIR / "pruned_archives.json"
+MAX_PRUNED_RECORDS = 5000
+
+TIERS = (
+    ("daily", lambda t: t.date()),
+    ("weekly", lambda t: t.isocalendar()[:2]),
+    ("monthly", lambda t: (t.year, t.month)),
+)
+
+
+class Archive:
+    def __init__(self, path, timestamp, group="", entry=None):
+        self.path = path
+        self.timestamp = timestamp
+        self.group = group
+        self.entry = entry
+        self.salvaged = is_salvaged(Path(path).name)
+
+    def size(self):
+        try:
+            return (self.entry.stat() if self.entry else self.path.stat()).st_size
+        except OSError:
+            return 0
+
+
+def is_salvaged(name):
+    return name.endswith(SALVAGED_SUFFIX)
+
+
+def parse_archive_name(name):
+    match = ARCHIVE_NAME.match(name)
+    if not match:
+        return None
+    try:
+        return match.group(1), datetime.strptime(match.group(2), "%Y%m%d_%H%M%S")
+    except ValueError:
+        return None
+
+
+def scan_archives(folder):
+    archives = []
+    try:
+        entries = list(os.scandir(folder))
+    except OSError:
+        return archives
+    for entry in entries:
+        if not entry.name.endswith(".zip") or not entry.is_file():
+            continue
+        parsed = parse_archive_name(entry.name)
+        if parsed:
+            group, timestamp = parsed
+        else:
+            try:
+                group, timestamp = "", datetime.fromtimestamp(entry.stat().st_mtime)
+            except OSError:
+                continue
+        archives.append(Archive(Path(entry.path), timestamp, group, entry))
+    return archives
+
+
+def plan_retention(archives, policy=None, max_backups=None, now=None):
+    complete = [a for a in archives if not a.salvaged]
+    kept, pruned = plan_complete(complete, policy, max_backups, now)
+    newest = max((a.timestamp for a in complete), default=None)
+    for archive in sorted((a for a in archives if a.salvaged), key=lambda a: a.timestamp, reverse=True):
+        (pruned if newest is not None and archive.timestamp <= newest else kept).append(archive)
+    return kept, pruned
+
+
+def plan_complete(archives, policy=None, max_backups=None, now=None):
+    newest_first = sorted(archives, key=lambda a: a.timestamp, reverse=True)
+    if policy is None:
+        max_backups = get_max_backups() if max_backups is None else max_backups
+        if max_backups <= 0:
+            return newest_first, []
+        return newest_first[:max_backups], newest_first[max_backups:]
+
+    now = now or datetime.now()
+    cutoff = now - timedelta(hours=policy["hours"])
+    keep = {id(a) for a in newest_first if a.timestamp >= cutoff}
+    if newest_first:
+        keep.add(id(newest_first[0]))
+    for tier, bucket_of in TIERS:
+        limit = policy[tier]
+        seen = set()
+        for archive in newest_first:
+            if len(seen) >= limit:
+                break
+            bucket = bucket_of(archive.timestamp)
+            if bucket not in seen:
+                seen.add(bucket)
+                keep.add(id(archive))
+    kept = [a for a in newest_first if id(a) in keep]
+    pruned = [a for a in newest_first if id(a) not in keep]
+    return kept, pruned
+
+
+def plan_folder(folder, policy=None, max_backups=None, now=None):
+    policy = get_retention_policy() if policy is None else policy
+    groups = {}
+    for archive in scan_archives(folder):
+        groups.setdefault(archive.group, []).append(archive)
+    kept, pruned = [], []
+    for archives in groups.values():
+        k, p = plan_retention(archives, policy or None, max_backups, now)
+        kept += k
+        pruned += p
+    return kept, pruned
+
+
+def load_pruned():
+    try:
+        with open(PRUNED_PATH, "r", encoding="utf-8") as f:
+            pruned = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return pruned if isinstance(pruned, list) else []
+
+
+def _save_pruned(pruned):
+    try:
+        APPDATA_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = PRUNED_PATH.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(pruned[-MAX_PRUNED_RECORDS:], f)
+        os.replace(tmp, PRUNED_PATH)
+    except OSError:
+        pass
+
+
+def record_pruned(paths):
+    with settings_lock():
+        pruned = load_pruned()
+        known = set(pruned)
+        pruned += [str(p) for p in paths if str(p) not in known]
+        _save_pruned(pruned)
+
+
+def forget_pruned(paths):
+    drop = {str(p) for p in paths}
+    if not drop:
+        return
+    with settings_lock():
+        _save_pruned([p for p in load_pruned() if p not in drop])
+
+
+def delete_archives(archives):
+    def remove(archive):
+        try:
+            archive.path.unlink()
+            return archive, None
+        except OSError as e:
+            return archive, e
+
+    if not archives:
+        return [], []
+    results = get_executor().run_parallel("Delete old backups", remove, archives)
+    removed = [a for a, error in results if error is None]
+    failed = [(a, error) for a, error in results if error is not None]
+    if removed:
+        record_pruned(a.path for a in removed)
+        with FingerprintCache() as fingerprints:
+            for archive in removed:
+                fingerprints.forget_archive(archive.path)
+    return removed, failed
+
+
+def preview(folders, policy=None, max_backups=None):
+    report = []
+    for folder in folders:
+        _, pruned = plan_folder(folder, policy, max_backups)
+        report.append((Path(folder), len(pruned), sum(a.size() for a in pruned)))
+    return report
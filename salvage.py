@@ -0,0 +1,140 @@
+import os
+import time
+import zlib
+import struct
+import zipfile
+from pathlib import Path
+
+from retention import SALVAGED_SUFFIX, parse_archive_name
+
+
+LOCAL_HEADER = struct.Struct("<4sHHHHHLLLHH")
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+READ_CHUNK = 1024 * 1024
+PART_SUFFIX = ".zip.part"
+STALE_PART_S = 10 * 60
+
+
+def read_member(f, header, copy_to=None):
+    _, _, flags, method, _, _, crc, comp_size, size, _, _ = header
+    if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+        return False
+    if flags & 0x08 and method == zipfile.ZIP_STORED:
+        return False
+    if not flags & 0x08 and 0xFFFFFFFF in (comp_size, size):
+        return False
+    decompressor = zlib.decompressobj(-15) if method == zipfile.ZIP_DEFLATED else None
+    remaining = None if flags & 0x08 else comp_size
+    actual_crc = 0
+    actual_size = 0
+    tail = b""
+    while True:
+        chunk = f.read(READ_CHUNK if remaining is None else min(READ_CHUNK, remaining))
+        if not chunk:
+            if remaining:
+                return False
+            if decompressor is not None and not decompressor.eof:
+                return False
+            break
+        if remaining is not None:
+            remaining -= len(chunk)
+        data = decompressor.decompress(chunk) if decompressor else chunk
+        actual_crc = zlib.crc32(data, actual_crc)
+        actual_size += len(data)
+        if copy_to is not None:
+            copy_to.write(data)
+        if decompressor is not None and decompressor.eof:
+            tail = decompressor.unused_data
+            break
+        if remaining == 0:
+            break
+    f.seek(-len(tail), os.SEEK_CUR)
+    if flags & 0x08:
+        descriptor = f.read(4)
+        if descriptor != DESCRIPTOR_SIGNATURE:
+            f.seek(-len(descriptor), os.SEEK_CUR)
+        fields = f.read(20)
+        if len(fields) < 12:
+            return False
+        crc = struct.unpack_from("<L", fields)[0]
+        size = struct.unpack_from("<Q", fields, 12)[0] if len(fields) == 20 else None
+        if size != actual_size:
+            f.seek(12 - len(fields), os.SEEK_CUR)
+            size = struct.unpack_from("<L", fields, 8)[0]
+    return crc == actual_crc and size == actual_size
+
+
+def scan_members(f):
+    members = []
+    while True:
+        offset = f.tell()
+        raw = f.read(LOCAL_HEADER.size)
+        if len(raw) < LOCAL_HEADER.size or raw[:4] != LOCAL_HEADER_SIGNATURE:
+            break
+        header = LOCAL_HEADER.unpack(raw)
+        flags, mtime, mdate = header[2], header[4], header[5]
+        raw_name = f.read(header[9])
+        f.seek(header[10], os.SEEK_CUR)
+        if len(raw_name) < header[9]:
+            break
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+        if not read_member(f, header):
+            break
+        date_time = ((mdate >> 9) + 1980, (mdate >> 5) & 0xF, mdate & 0x1F,
+                     mtime >> 11, (mtime >> 5) & 0x3F, (mtime & 0x1F) * 2)
+        members.append((offset, header, name, date_time))
+    return members
+
+
+def salvage_archive(part: Path, dest: Path):
+    part = Path(part)
+    dest = Path(dest)
+    with open(part, "rb") as f:
+        members = scan_members(f)
+        if not members:
+            return 0
+        temp = dest.with_name(dest.name + ".salvage")
+        try:
+            with zipfile.ZipFile(temp, "w", zipfile.ZIP_DEFLATED) as out:
+                out.comment = b'{"salvaged": true}'
+                for offset, header, name, date_time in members:
+                    f.seek(offset + LOCAL_HEADER.size + header[9] + header[10])
+                    zinfo = zipfile.ZipInfo(name, date_time)
+                    zinfo.compress_type = zipfile.ZIP_DEFLATED
+                    with out.open(zinfo, "w", force_zip64=True) as writer:
+                        if not read_member(f, header, writer):
+                            raise zipfile.BadZipFile(f"{name} changed while salvaging")
+            os.replace(temp, dest)
+        except BaseException:
+            temp.unlink(missing_ok=True)
+            raise
+    return len(members)
+
+
+def salvage_folder(folder, prefix, log):
+    salvaged = []
+    folder = Path(folder)
+    if not folder.is_dir():
+        return salvaged
+    for part in folder.glob(f"{prefix}_backup_*{PART_SUFFIX}"):
+        complete = part.with_name(part.name[:-len(".part")])
+        dest = complete.with_name(complete.name[:-len(".zip")] + SALVAGED_SUFFIX)
+        try:
+            stale = time.time() - part.stat().st_mtime >= STALE_PART_S
+        except OSError:
+            continue
+        if not stale or dest.exists() or complete.exists() or not parse_archive_name(complete.name):
+            continue
+        try:
+            count = salvage_archive(part, dest)
+        except (OSError, zipfile.BadZipFile) as e:
+            log(f"[ERROR] Could not salvage interrupted backup {part.name}: {e}")
+            continue
+        part.unlink(missing_ok=True)
+        if count:
+            log(f"Recovered {count} file(s) from interrupted backup {dest.name}.")
+            salvaged.append(dest)
+        else:
+            log(f"Removed empty interrupted backup {part.name}.")
+    return salvaged
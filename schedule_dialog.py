@@ -1,26 +1,30 @@
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout,
     QPushButton, QRadioButton, QButtonGroup,
-    QSpinBox, QTimeEdit
+    QSpinBox, QTimeEdit, QLineEdit, QMessageBox
 )
 from PySide6 import QtCore
 from config_utils import get_schedule_config
+from scheduler import CronRule
 
 
 class ScheduleDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, game_name="Sims 4"):
         super().__init__(parent)
-        self.setWindowTitle("Schedule Backup")
-        self.setFixedSize(300, 200)
+        self.game_name = game_name
+        self.setWindowTitle(f"Schedule Backup — {game_name}")
+        self.setFixedSize(300, 260)
 
         layout = QVBoxLayout()
 
         self.interval_radio = QRadioButton("Interval (every X hours)")
         self.daily_radio = QRadioButton("Daily at fixed time")
+        self.cron_radio = QRadioButton("Cron expression (min hour day month weekday)")
 
         self.radio_group = QButtonGroup()
         self.radio_group.addButton(self.interval_radio)
         self.radio_group.addButton(self.daily_radio)
+        self.radio_group.addButton(self.cron_radio)
 
         layout.addWidget(self.interval_radio)
         self.interval_spin = QSpinBox()
@@ -34,6 +38,11 @@ class ScheduleDialog(QDialog):
         self.time_edit.setTime(QtCore.QTime.currentTime())
         layout.addWidget(self.time_edit)
 
+        layout.addWidget(self.cron_radio)
+        self.cron_edit = QLineEdit()
+        self.cron_edit.setPlaceholderText("0 */4 * * *")
+        layout.addWidget(self.cron_edit)
+
         btns = QHBoxLayout()
         ok_btn = QPushButton("OK")
         cancel_btn = QPushButton("Cancel")
@@ -43,10 +52,10 @@ class ScheduleDialog(QDialog):
         layout.addLayout(btns)
         self.setLayout(layout)
 
-        ok_btn.clicked.connect(self.accept)
+        ok_btn.clicked.connect(self.validate_and_accept)
         cancel_btn.clicked.connect(self.reject)
 
-        sched = get_schedule_config()
+        sched = get_schedule_config(game_name)
         if sched:
             if sched["mode"] == "interval":
                 self.interval_radio.setChecked(True)
@@ -55,10 +64,24 @@ class ScheduleDialog(QDialog):
                 self.daily_radio.setChecked(True)
                 h, m = sched["time"]
                 self.time_edit.setTime(QtCore.QTime(h, m))
+            elif sched["mode"] == "cron":
+                self.cron_radio.setChecked(True)
+                self.cron_edit.setText(sched["cron"])
+
+    def validate_and_accept(self):
+        if self.cron_radio.isChecked():
+            try:
+                CronRule(self.cron_edit.text())
+            except ValueError as e:
+                QMessageBox.warning(self, "Invalid Schedule", str(e))
+                return
+        self.accept()
 
     def get_schedule(self):
         if self.interval_radio.isChecked():
             return {"mode": "interval", "hours": self.interval_spin.value()}
+        elif self.cron_radio.isChecked():
+            return {"mode": "cron", "cron": " ".join(self.cron_edit.text().split())}
         else:
             t = self.time_edit.time()
             return {"mode": "daily", "time": (t.hour(), t.minute())}
\ No newline at end of file
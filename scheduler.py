@@ -0,0 +1,177 @@
+from datetime import datetime, timedelta
+from PySide6.QtCore import QObject, QTimer, Signal, Qt
+
+from config_utils import (
+    get_schedule_jobs, set_schedule_last_run, write_log_file
+)
+
+
+MAX_SLEEP_MS = 60 * 60 * 1000
+WAKE_SLACK = timedelta(minutes=2)
+
+CRON_FIELDS = [
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 7),
+]
+
+
+def _parse_field(text, lo, hi):
+    values = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"Invalid step: {step_text}")
+        if part == "*":
+            start, end = lo, hi
+        elif "-" in part:
+            a, b = part.split("-", 1)
+            start, end = int(a), int(b)
+        else:
+            start = int(part)
+            end = hi if step > 1 else start
+        if start < lo or end > hi or start > end:
+            raise ValueError(f"Value out of range: {part}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronRule:
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError("Cron expression needs 5 fields: minute hour day month weekday")
+        self.expression = " ".join(fields)
+        parsed = [_parse_field(f, lo, hi) for f, (_, lo, hi) in zip(fields, CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months, self.weekdays = parsed
+        if 7 in self.weekdays:
+            self.weekdays = (self.weekdays - {7}) | {0}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _day_matches(self, dt):
+        cron_weekday = (dt.weekday() + 1) % 7
+        day_ok = dt.day in self.days
+        weekday_ok = cron_weekday in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        dt = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                year = dt.year + (dt.month // 12)
+                dt = dt.replace(year=year, month=dt.month % 12 + 1, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if dt.hour not in self.hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+                continue
+            if dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+                continue
+            return dt
+        raise ValueError(f"Cron expression never fires: {self.expression}")
+
+
+class IntervalRule:
+    def __init__(self, hours: int):
+        self.interval = timedelta(hours=max(1, int(hours)))
+
+    def next_after(self, after: datetime) -> datetime:
+        return after + self.interval
+
+
+def rule_for_schedule(schedule: dict):
+    mode = schedule.get("mode")
+    if mode == "interval":
+        return IntervalRule(schedule.get("hours", 6))
+    if mode == "daily":
+        h, m = schedule.get("time", (12, 0))
+        return CronRule(f"{m} {h} * * *")
+    if mode == "cron":
+        return CronRule(schedule.get("cron", ""))
+    raise ValueError(f"Unknown schedule mode: {mode}")
+
+
+def next_fire_time(schedule: dict, last_run, now: datetime) -> datetime:
+    rule = rule_for_schedule(schedule)
+    if last_run is None:
+        if isinstance(rule, IntervalRule):
+            return now
+        return rule.next_after(now)
+    return rule.next_after(last_run)
+
+
+class BackupScheduler(QObject):
+    job_due = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.jobs = {}
+        self.next_fire = {}
+        self._expected_wakeup = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self._on_timeout)
+
+    def reload(self):
+        self.jobs = get_schedule_jobs()
+        self._fire_due()
+
+    def stop(self):
+        self.timer.stop()
+
+    def _compute_next(self, now):
+        self.next_fire = {}
+        for game, job in self.jobs.items():
+            try:
+                self.next_fire[game] = next_fire_time(job, job.get("last_run"), now)
+            except ValueError as e:
+                write_log_file(f"[ERROR] Invalid schedule for {game}: {e}")
+
+    def _fire_due(self):
+        now = datetime.now()
+        self._compute_next(now)
+        for game, when in sorted(self.next_fire.items(), key=lambda kv: kv[1]):
+            if when <= now:
+                job = self.jobs[game]
+                if job.get("last_run") and now - when > WAKE_SLACK:
+                    write_log_file(f"Missed scheduled backup for {game} at {when:%Y-%m-%d %H:%M}, running now.")
+                job["last_run"] = now
+                set_schedule_last_run(game, now)
+                self.job_due.emit(game)
+        self._compute_next(now)
+        self._arm(now)
+
+    def _arm(self, now):
+        self.timer.stop()
+        if not self.next_fire:
+            self._expected_wakeup = None
+            return
+        earliest = min(self.next_fire.values())
+        delay_ms = max(0, int((earliest - now).total_seconds() * 1000))
+        delay_ms = min(delay_ms, MAX_SLEEP_MS)
+        self._expected_wakeup = now + timedelta(milliseconds=delay_ms)
+        self.timer.start(delay_ms)
+
+    def _on_timeout(self):
+        now = datetime.now()
+        if self._expected_wakeup and now - self._expected_wakeup > WAKE_SLACK:
+            write_log_file("Detected wake from sleep, checking for missed scheduled backups.")
+        self._fire_due()
+
+    def seconds_until_next(self):
+        if not self.next_fire:
+            return None
+        return max(0, int((min(self.next_fire.values()) - datetime.now()).total_seconds()))
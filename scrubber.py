@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import zipfile
+import threading
+from pathlib import Path
+from PySide6.QtCore import QObject, QTimer, Signal
+
+from paths import APPDATA_DIR
+from jobs import Job, PRIORITY_BACKGROUND
+from config_utils import (
+    GAMES, get_default_backup_path, get_extra_backup_paths, get_scrub_settings, write_log_file
+)
+
+
+SCRUB_STATE_PATH = APPDATA_DIR / "scrub_state.json"
+READ_CHUNK = 1024 * 1024
+SCRUB_INTERVAL_MS = 6 * 60 * 60 * 1000
+SCRUB_STARTUP_DELAY_MS = 10 * 60 * 1000
+
+_state_lock = threading.Lock()
+
+
+class ScrubCancelled(Exception):
+    pass
+
+
+def load_scrub_state():
+    try:
+        with open(SCRUB_STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def record_verification(archive: Path, ok: bool, error: str = ""):
+    with _state_lock:
+        state = load_scrub_state()
+        try:
+            st = archive.stat()
+        except OSError:
+            state.pop(str(archive), None)
+        else:
+            state[str(archive)] = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "last_verified": time.time(),
+                "ok": ok,
+                "error": error,
+            }
+        try:
+            APPDATA_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = SCRUB_STATE_PATH.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=1)
+            os.replace(tmp, SCRUB_STATE_PATH)
+        except OSError:
+            pass
+
+
+def verify_archive(archive: Path, rate_limit=0, cancel=None):
+    started = time.monotonic()
+    total = 0
+    try:
+        with zipfile.ZipFile(archive, "r") as zipf:
+            for info in zipf.infolist():
+                if info.is_dir():
+                    continue
+                with zipf.open(info, "r") as f:
+                    while True:
+                        if cancel and cancel():
+                            raise ScrubCancelled()
+                        block = f.read(READ_CHUNK)
+                        if not block:
+                            break
+                        total += len(block)
+                        if rate_limit > 0:
+                            ahead = total / rate_limit - (time.monotonic() - started)
+                            if ahead > 0:
+                                time.sleep(ahead)
+    except ScrubCancelled:
+        raise
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, OSError, EOFError, ValueError) as e:
+        return False, str(e)
+    return True, ""
+
+
+def backup_folders():
+    folders = []
+    for g in GAMES:
+        for folder in [get_default_backup_path(g)] + get_extra_backup_paths(g):
+            if folder and Path(folder).is_dir() and Path(folder) not in folders:
+                folders.append(Path(folder))
+    return folders
+
+
+def archives_due(folders, cadence_days, state=None):
+    state = load_scrub_state() if state is None else state
+    cutoff = time.time() - cadence_days * 86400
+    due = []
+    for folder in folders:
+        for archive in sorted(folder.glob("*.zip")):
+            entry = state.get(str(archive))
+            try:
+                st = archive.stat()
+            except OSError:
+                continue
+            if (entry and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns
+                    and entry.get("last_verified", 0) >= cutoff):
+                continue
+            due.append(archive)
+    return due
+
+
+class ScrubWorker(Job):
+    archive_checked = Signal(str, bool, str)
+    done_signal = Signal(str)
+    priority = PRIORITY_BACKGROUND
+
+    def __init__(self, folders=None):
+        super().__init__()
+        self.folders = folders
+
+    def title(self):
+        return "Verify backups"
+
+    def run(self):
+        settings = get_scrub_settings()
+        folders = self.folders if self.folders is not None else backup_folders()
+        checked = corrupt = 0
+        try:
+            for archive in archives_due(folders, settings["cadence_days"]):
+                ok, error = verify_archive(
+                    archive, settings["rate_limit_mb"] * 1024 * 1024,
+                    cancel=lambda: self.cancel_requested
+                )
+                record_verification(archive, ok, error)
+                checked += 1
+                if not ok:
+                    corrupt += 1
+                    write_log_file(f"[ERROR] Backup archive failed verification: {archive} ({error})")
+                self.archive_checked.emit(str(archive), ok, error)
+        except ScrubCancelled:
+            write_log_file("Backup verification cancelled.")
+        summary = f"Verified {checked} backup(s), {corrupt} corrupt."
+        if checked:
+            write_log_file(summary)
+        self.done_signal.emit(summary)
+
+
+class ScrubService(QObject):
+    corrupt_found = Signal(str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.worker = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.run_now)
+
+    def start(self):
+        QTimer.singleShot(SCRUB_STARTUP_DELAY_MS, self.run_now)
+        self.timer.start(SCRUB_INTERVAL_MS)
+
+    def stop(self):
+        self.timer.stop()
+        if self.worker:
+            self.worker.cancel_requested = True
+
+    def run_now(self):
+        if self.worker or not self.timer.isActive():
+            return
+        self.worker = ScrubWorker()
+        self.worker.archive_checked.connect(
+            lambda path, ok, error: None if ok else self.corrupt_found.emit(path, error)
+        )
+        self.worker.finished.connect(self._on_finished)
+        self.worker.start()
+
+    def _on_finished(self):
+        self.worker.deleteLater()
+        self.worker = None
@@ -1,6 +1,6 @@
 from PySide6.QtWidgets import (
     QDialog, QLabel, QComboBox, QPushButton, QVBoxLayout, QHBoxLayout,
-    QMessageBox, QFileDialog, QGridLayout
+    QMessageBox, QFileDialog, QGridLayout, QLineEdit
 )
 from config_utils import (
     get_max_backups, save_max_backups,
@@ -8,8 +8,20 @@ from config_utils import (
     get_update_available, set_update_available,
     get_last_installed_version,
     GAMES,
-    get_minimize_to_tray, save_minimize_to_tray
+    get_minimize_to_tray, save_minimize_to_tray,
+    get_verify_after_backup, save_verify_after_backup,
+    get_retention_policy, save_retention_policy, get_extra_backup_paths,
+    get_compaction_settings, save_compact_old_backups,
+    get_cc_backup_enabled, save_cc_backup_enabled,
+    get_save_rotations_kept, save_save_rotations_kept,
+    get_standby_settings, save_warm_standby,
+    get_pack_small_files, save_pack_small_files,
+    get_diagnostics_next_run, save_diagnostics_next_run,
+    save_game_folder_override
 )
+from retention import preview
+from discovery import get_game_folder
+from standby import standby_usage, discard_standby
 from updater import check_updates
 from startup import enable_startup, disable_startup, is_startup_enabled
 from toggle import ToggleSwitch
@@ -22,7 +34,7 @@ class SettingsWindow(QDialog):
         self.theme = theme or Theme()
         self.main_window = main_window
         self.setWindowTitle("Settings")
-        self.setFixedSize(460, 420)
+        self.setFixedSize(460, 720)
         self.setStyleSheet(f"background-color: {self.theme.bg}; color: {self.theme.fg};")
         self.init_ui()
 
@@ -44,6 +56,41 @@ class SettingsWindow(QDialog):
         self.tray_toggle.stateChanged.connect(lambda checked: save_minimize_to_tray(checked))
         layout.addWidget(self.tray_toggle)
 
+        self.verify_toggle = ToggleSwitch("Verify backups after creation", theme=self.theme)
+        self.verify_toggle.setChecked(get_verify_after_backup())
+        self.verify_toggle.stateChanged.connect(lambda checked: save_verify_after_backup(checked))
+        layout.addWidget(self.verify_toggle)
+
+        self.compact_toggle = ToggleSwitch("Compress old backups when idle", theme=self.theme)
+        self.compact_toggle.setChecked(get_compaction_settings()["enabled"])
+        self.compact_toggle.stateChanged.connect(lambda checked: save_compact_old_backups(checked))
+        layout.addWidget(self.compact_toggle)
+
+        self.cc_toggle = ToggleSwitch("Back up Sims 4 Mods and custom content", theme=self.theme)
+        self.cc_toggle.setChecked(get_cc_backup_enabled())
+        self.cc_toggle.stateChanged.connect(lambda checked: save_cc_backup_enabled(checked))
+        layout.addWidget(self.cc_toggle)
+
+        self.pack_toggle = ToggleSwitch("Pack small files with a shared dictionary", theme=self.theme)
+        self.pack_toggle.setChecked(get_pack_small_files())
+        self.pack_toggle.stateChanged.connect(lambda checked: save_pack_small_files(checked))
+        layout.addWidget(self.pack_toggle)
+
+        self.standby_toggle = ToggleSwitch("Keep the latest backup ready for instant restore", theme=self.theme)
+        self.standby_toggle.setChecked(get_standby_settings()["enabled"])
+        self.standby_toggle.stateChanged.connect(lambda checked: save_warm_standby(checked))
+        layout.addWidget(self.standby_toggle)
+
+        self.standby_label = QLabel()
+        self.standby_label.setStyleSheet(f"margin: 0; color: {self.theme.fg};")
+        self.refresh_standby_usage()
+        layout.addWidget(self.standby_label)
+
+        self.diagnostics_toggle = ToggleSwitch("Capture diagnostics on the next backup or restore", theme=self.theme)
+        self.diagnostics_toggle.setChecked(get_diagnostics_next_run())
+        self.diagnostics_toggle.stateChanged.connect(lambda checked: save_diagnostics_next_run(checked))
+        layout.addWidget(self.diagnostics_toggle)
+
         l1 = QHBoxLayout()
         l1.setSpacing(8)
         lbl = QLabel("Maximum number of backups to keep:")
@@ -58,6 +105,45 @@ class SettingsWindow(QDialog):
 
         self.theme.apply_combo_scrollbar_style(self.max_combo)
 
+        l2 = QHBoxLayout()
+        l2.setSpacing(8)
+        lbl = QLabel("Retention:")
+        lbl.setStyleSheet(f"margin: 0; color: {self.theme.fg};")
+        self.retention_combo = QComboBox()
+        self.retention_combo.addItems(["Keep newest", "Tiered"])
+        policy = get_retention_policy()
+        self.retention_combo.setCurrentIndex(1 if policy else 0)
+        self.tiers_edit = QLineEdit(self.format_tiers(policy or {"hours": 24, "daily": 7, "weekly": 4, "monthly": 12}))
+        self.tiers_edit.setPlaceholderText("24h 7d 4w 12m")
+        self.tiers_edit.setToolTip("Keep everything from the last hours, then one backup per day, week and month.")
+        self.tiers_edit.setEnabled(policy is not None)
+        self.retention_combo.currentIndexChanged.connect(lambda i: self.tiers_edit.setEnabled(i == 1))
+        l2.addWidget(lbl)
+        l2.addWidget(self.retention_combo)
+        l2.addWidget(self.tiers_edit, 1)
+        layout.addLayout(l2)
+
+        self.theme.apply_combo_scrollbar_style(self.retention_combo)
+
+        l3 = QHBoxLayout()
+        l3.setSpacing(8)
+        lbl = QLabel("Sims 4 older save versions to keep:")
+        lbl.setStyleSheet(f"margin: 0; color: {self.theme.fg};")
+        self.rotations_combo = QComboBox()
+        self.rotations_combo.addItems(["All", "None", "1", "2", "3", "4"])
+        rotations = get_save_rotations_kept()
+        self.rotations_combo.setCurrentText("All" if rotations < 0 else "None" if rotations == 0 else str(rotations))
+        l3.addWidget(lbl)
+        l3.addWidget(self.rotations_combo, 1)
+        layout.addLayout(l3)
+
+        self.theme.apply_combo_scrollbar_style(self.rotations_combo)
+
+        self.preview_btn = QPushButton("Preview Cleanup")
+        self.preview_btn.setStyleSheet(self.theme.button_style())
+        self.preview_btn.clicked.connect(self.preview_cleanup)
+        layout.addWidget(self.preview_btn)
+
         self.version_label = QLabel(f"Current Version: {get_last_installed_version()}")
         self.version_label.setStyleSheet(f"font-size: 13px; margin: 0; color: {self.theme.fg};")
         layout.addWidget(self.version_label)
@@ -83,6 +169,12 @@ class SettingsWindow(QDialog):
             btn.setStyleSheet(self.theme.button_style())
             btn.clicked.connect(lambda _, game=g: self.choose_path(game))
             grid.addWidget(btn, row, 2)
+
+            saves_btn = QPushButton("Saves")
+            saves_btn.setStyleSheet(self.theme.button_style())
+            saves_btn.setToolTip(f"Game folder: {get_game_folder(g)}")
+            saves_btn.clicked.connect(lambda _, game=g, b=saves_btn: self.choose_game_folder(game, b))
+            grid.addWidget(saves_btn, row, 3)
             row += 1
         layout.addLayout(grid)
 
@@ -117,6 +209,60 @@ class SettingsWindow(QDialog):
             save_default_backup_path(game_name, folder)
             self.path_labels[game_name].setText(folder)
 
+    def choose_game_folder(self, game_name: str, button):
+        folder = QFileDialog.getExistingDirectory(self, f"Select {game_name} Game Folder", str(get_game_folder(game_name)))
+        if folder:
+            save_game_folder_override(game_name, folder)
+            button.setToolTip(f"Game folder: {folder}")
+
+    @staticmethod
+    def format_tiers(policy):
+        return f"{policy['hours']}h {policy['daily']}d {policy['weekly']}w {policy['monthly']}m"
+
+    @staticmethod
+    def parse_tiers(text):
+        units = {"h": "hours", "d": "daily", "w": "weekly", "m": "monthly"}
+        policy = {"hours": 0, "daily": 0, "weekly": 0, "monthly": 0}
+        for token in text.lower().split():
+            if len(token) < 2 or token[-1] not in units or not token[:-1].isdigit():
+                raise ValueError(f"Invalid retention rule: {token}")
+            policy[units[token[-1]]] = int(token[:-1])
+        return policy
+
+    def selected_retention(self):
+        if self.retention_combo.currentIndex() == 0:
+            return None
+        return self.parse_tiers(self.tiers_edit.text())
+
+    def preview_cleanup(self):
+        try:
+            policy = self.selected_retention()
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid Retention", str(e))
+            return
+        val = self.max_combo.currentText()
+        max_backups = 0 if val == "Unlimited" else int(val)
+        folders = []
+        for g in GAMES:
+            for folder in [get_default_backup_path(g)] + get_extra_backup_paths(g):
+                if folder and folder not in folders:
+                    folders.append(folder)
+        lines = []
+        total_count = total_bytes = 0
+        for folder, count, size in preview(folders, policy or {}, max_backups):
+            if count:
+                lines.append(f"{folder}: {count} backup(s), {size / (1024 * 1024):.1f} MB")
+                total_count += count
+                total_bytes += size
+        if not lines:
+            QMessageBox.information(self, "Cleanup Preview", "No backups would be removed.")
+            return
+        lines.append(f"\nTotal: {total_count} backup(s), {total_bytes / (1024 * 1024):.1f} MB would be reclaimed.")
+        QMessageBox.information(self, "Cleanup Preview", "\n".join(lines))
+
+    def refresh_standby_usage(self):
+        self.standby_label.setText(f"Instant restore staging: {standby_usage() / (1024 * 1024):.1f} MB on disk")
+
     def toggle_theme(self):
         self.theme.toggle()
         self.setStyleSheet(f"background-color: {self.theme.bg}; color: {self.theme.fg};")
@@ -124,10 +270,26 @@ class SettingsWindow(QDialog):
 
         self.startup_toggle.theme = self.theme
         self.tray_toggle.theme = self.theme
+        self.verify_toggle.theme = self.theme
+        self.compact_toggle.theme = self.theme
+        self.cc_toggle.theme = self.theme
+        self.pack_toggle.theme = self.theme
+        self.standby_toggle.theme = self.theme
+        self.diagnostics_toggle.theme = self.theme
         self.startup_toggle.update()
         self.tray_toggle.update()
+        self.verify_toggle.update()
+        self.compact_toggle.update()
+        self.cc_toggle.update()
+        self.pack_toggle.update()
+        self.standby_toggle.update()
+        self.diagnostics_toggle.update()
+        self.standby_label.setStyleSheet(f"margin: 0; color: {self.theme.fg};")
 
         self.theme.apply_combo_scrollbar_style(self.max_combo)
+        self.theme.apply_combo_scrollbar_style(self.retention_combo)
+        self.theme.apply_combo_scrollbar_style(self.rotations_combo)
+        self.preview_btn.setStyleSheet(self.theme.button_style())
         self.refresh_update_status()
 
     def refresh_update_status(self):
@@ -154,8 +316,23 @@ class SettingsWindow(QDialog):
         check_updates(callback=finished, silent=False, parent=self)
 
     def save_settings(self):
+        try:
+            save_retention_policy(self.selected_retention())
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid Retention", str(e))
+            return
         val = self.max_combo.currentText()
         save_max_backups(0 if val == "Unlimited" else int(val))
+        rotations = self.rotations_combo.currentText()
+        save_save_rotations_kept(-1 if rotations == "All" else 0 if rotations == "None" else int(rotations))
         save_minimize_to_tray(self.tray_toggle.isChecked())
+        save_verify_after_backup(self.verify_toggle.isChecked())
+        save_compact_old_backups(self.compact_toggle.isChecked())
+        save_cc_backup_enabled(self.cc_toggle.isChecked())
+        save_pack_small_files(self.pack_toggle.isChecked())
+        save_warm_standby(self.standby_toggle.isChecked())
+        if not self.standby_toggle.isChecked():
+            for g in GAMES:
+                discard_standby(g)
         QMessageBox.information(self, "Settings Saved", "Settings have been saved.")
         self.accept()
\ No newline at end of file
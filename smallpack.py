@@ -0,0 +1,179 @@
+import sys
+import time
+import zlib
+import struct
+import zipfile
+from collections import Counter
+from pathlib import Path
+
+from streaming import StreamCancelled, safe_member_path
+
+
+PACK_NAME = "__sbu_pack__/small_files.sbupack"
+PACK_MAGIC = b"SBUPACK1"
+SMALL_FILE_LIMIT = 64 * 1024
+DICT_SIZE = 32 * 1024
+SAMPLE_FILES = 500
+SAMPLE_BYTES = 4 * 1024
+WINDOW = 8
+LEVEL = 6
+MIN_PACK_FILES = 16
+FRAME_HEADER = struct.Struct("<HLLL")
+
+
+def read_sample(path, limit=SAMPLE_BYTES):
+    try:
+        with open(path, "rb") as f:
+            return f.read(limit)
+    except OSError:
+        return b""
+
+
+def train_dictionary(paths, size=DICT_SIZE):
+    paths = sorted(paths)
+    step = max(1, len(paths) // SAMPLE_FILES)
+    samples = [read_sample(path) for path in paths[::step]]
+    seen_in = Counter()
+    for data in samples:
+        seen_in.update({data[i:i + WINDOW] for i in range(len(data) - WINDOW + 1)})
+    threshold = max(2, len(samples) // 50)
+    segments = Counter()
+    for data in samples:
+        i = 0
+        while i <= len(data) - WINDOW:
+            if seen_in[data[i:i + WINDOW]] < threshold:
+                i += 1
+                continue
+            j = i
+            while j <= len(data) - WINDOW and seen_in[data[j:j + WINDOW]] >= threshold:
+                j += 1
+            segments[data[i:j + WINDOW - 1]] += 1
+            i = j
+    chosen = []
+    total = 0
+    for segment, count in sorted(segments.items(), key=lambda s: s[1] * len(s[0]), reverse=True):
+        if total + len(segment) <= size:
+            chosen.append(segment)
+            total += len(segment)
+    chosen.reverse()
+    return b"".join(chosen)
+
+
+def split_small_files(files, keep_separate=()):
+    regular, small = [], []
+    for file_path, root in files:
+        try:
+            is_small = file_path not in keep_separate and file_path.stat().st_size <= SMALL_FILE_LIMIT
+        except OSError:
+            is_small = False
+        (small if is_small else regular).append((file_path, root))
+    if len(small) < MIN_PACK_FILES:
+        return files, []
+    return regular, small
+
+
+def write_pack(dst, files, zdict, cancel=None, progress=None):
+    dst.write(PACK_MAGIC)
+    dst.write(struct.pack("<L", len(zdict)))
+    dst.write(zdict)
+    for step, (path, arcname) in enumerate(files, start=1):
+        if cancel and cancel():
+            raise StreamCancelled()
+        with open(path, "rb") as f:
+            data = f.read()
+        compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, -15, zdict=zdict)
+        packed = compressor.compress(data) + compressor.flush()
+        name = arcname.encode("utf-8")
+        dst.write(FRAME_HEADER.pack(len(name), len(data), zlib.crc32(data), len(packed)))
+        dst.write(name)
+        dst.write(packed)
+        if progress:
+            progress(step, arcname)
+    dst.write(FRAME_HEADER.pack(0, 0, 0, 0))
+
+
+def read_exact(src, size):
+    data = src.read(size)
+    if len(data) != size:
+        raise EOFError("Small file pack is truncated")
+    return data
+
+
+def iter_pack(src, cancel=None, wanted=None):
+    if read_exact(src, len(PACK_MAGIC)) != PACK_MAGIC:
+        raise ValueError("Not a small file pack")
+    zdict = read_exact(src, struct.unpack("<L", read_exact(src, 4))[0])
+    while True:
+        if cancel and cancel():
+            raise StreamCancelled()
+        name_len, size, crc, packed_len = FRAME_HEADER.unpack(read_exact(src, FRAME_HEADER.size))
+        if not name_len:
+            return
+        name = read_exact(src, name_len).decode("utf-8")
+        if wanted and not wanted(name):
+            read_exact(src, packed_len)
+            yield name, None
+            continue
+        decompressor = zlib.decompressobj(-15, zdict=zdict)
+        data = decompressor.decompress(read_exact(src, packed_len)) + decompressor.flush()
+        if len(data) != size or zlib.crc32(data) != crc:
+            raise ValueError(f"Packed file {name} is corrupt")
+        yield name, data
+
+
+def unpack(src, root: Path, cancel=None, log=None):
+    count = 0
+    for name, data in iter_pack(src, cancel):
+        target = safe_member_path(root, name)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(data)
+        count += 1
+        if log:
+            log(f"Extracted: {name}")
+    return count
+
+
+def benchmark(folder):
+    folder = Path(folder)
+    files = [p for p in sorted(folder.rglob("*")) if p.is_file() and p.stat().st_size <= SMALL_FILE_LIMIT]
+    raw = sum(p.stat().st_size for p in files)
+    if not files:
+        print(f"No files of {SMALL_FILE_LIMIT // 1024} KB or less in {folder}")
+        return
+
+    class Counting:
+        size = 0
+
+        def write(self, data):
+            self.size += len(data)
+            return len(data)
+
+        def flush(self):
+            pass
+
+    started = time.perf_counter()
+    per_file = Counting()
+    with zipfile.ZipFile(per_file, "w", zipfile.ZIP_DEFLATED) as zipf:
+        for path in files:
+            zipf.write(path, path.relative_to(folder).as_posix())
+    per_file_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    zdict = train_dictionary(files)
+    train_time = time.perf_counter() - started
+    packed = Counting()
+    write_pack(packed, [(p, p.relative_to(folder).as_posix()) for p in files], zdict)
+    pack_time = time.perf_counter() - started
+
+    print(f"{len(files)} small files, {raw / 1024:.0f} KB")
+    print(f"Per-file deflate: {per_file.size / 1024:.0f} KB (ratio {raw / max(per_file.size, 1):.2f}) in {per_file_time:.2f}s")
+    print(f"Shared dictionary: {packed.size / 1024:.0f} KB (ratio {raw / max(packed.size, 1):.2f}) in {pack_time:.2f}s "
+          f"({len(zdict) // 1024} KB dictionary trained in {train_time:.2f}s)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("usage: python smallpack.py <folder>")
+        sys.exit(2)
+    benchmark(sys.argv[1])
@@ -0,0 +1,248 @@
+import os
+import sys
+import json
+import shutil
+import zipfile
+from pathlib import Path
+from PySide6.QtCore import QObject, Signal
+
+from paths import APPDATA_DIR
+from discovery import get_game_folder
+from fingerprint import FingerprintCache
+from jobs import Job, PRIORITY_BACKGROUND
+from retention import scan_archives
+from smallpack import PACK_NAME, unpack
+from streaming import StreamCancelled, copy_stream, safe_member_path
+from config_utils import GAMES, get_default_backup_path, get_standby_settings, write_log_file
+
+
+STANDBY_MARKER = "standby.json"
+STANDBY_FILES = "files"
+FICLONE = 0x40049409
+
+
+def standby_root(game_name: str) -> Path:
+    key = game_name.strip().lower().replace(" ", "_")
+    return APPDATA_DIR / "standby" / key
+
+
+def legacy_standby_root(game_name: str) -> Path:
+    key = game_name.strip().lower().replace(" ", "_")
+    return get_game_folder(game_name).parent / f".sbu_standby_{key}"
+
+
+def latest_archive(folder, game_name: str):
+    prefix = game_name.strip().lower().replace(" ", "_")
+    archives = [a for a in scan_archives(folder) if a.group == prefix and not a.salvaged]
+    return max(archives, key=lambda a: a.timestamp, default=None)
+
+
+def archive_stamp(path):
+    st = Path(path).stat()
+    return {"archive": str(Path(path).resolve()), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def read_marker(folder: Path):
+    try:
+        with open(folder / STANDBY_MARKER, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def matches(marker, archive):
+    try:
+        stamp = archive_stamp(archive)
+    except OSError:
+        return False
+    return marker is not None and all(marker.get(k) == v for k, v in stamp.items())
+
+
+def claim_standby(game_name: str, archive):
+    current = standby_root(game_name) / "current"
+    if not matches(read_marker(current), archive):
+        return None
+    claimed = current.with_name("restoring")
+    shutil.rmtree(claimed, ignore_errors=True)
+    try:
+        os.replace(current, claimed)
+    except OSError:
+        return None
+    return claimed / STANDBY_FILES
+
+
+def release_standby(files: Path, consumed=False):
+    claimed = files.parent
+    if not consumed:
+        try:
+            os.replace(claimed, claimed.with_name("current"))
+            return
+        except OSError:
+            pass
+    shutil.rmtree(claimed, ignore_errors=True)
+
+
+def discard_standby(game_name: str):
+    shutil.rmtree(standby_root(game_name), ignore_errors=True)
+    shutil.rmtree(legacy_standby_root(game_name), ignore_errors=True)
+
+
+def standby_usage():
+    total = 0
+    for game in GAMES:
+        for dirpath, _, filenames in os.walk(standby_root(game)):
+            for name in filenames:
+                try:
+                    total += os.stat(os.path.join(dirpath, name)).st_size
+                except OSError:
+                    pass
+    return total
+
+
+def clone_file(src, dst):
+    if sys.platform.startswith("linux"):
+        import fcntl
+        try:
+            with open(src, "rb") as s, open(dst, "wb") as d:
+                fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            return True
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+    return False
+
+
+def stage_archive(archive, game_root: Path, staging: Path, previous=None, previous_digests=None, cancel=None):
+    dest = staging / STANDBY_FILES
+    previous_digests = previous_digests or {}
+    counts = {"linked": 0, "cloned": 0, "copied": 0, "extracted": 0}
+    with FingerprintCache() as fingerprints:
+        manifest = fingerprints.archive_manifest(archive)
+        with zipfile.ZipFile(archive, "r") as zipf:
+            for info in zipf.infolist():
+                if cancel and cancel():
+                    raise StreamCancelled()
+                if info.filename == PACK_NAME:
+                    with zipf.open(info, "r") as src:
+                        counts["extracted"] += unpack(src, dest, cancel)
+                    continue
+                target = safe_member_path(dest, info.filename)
+                if info.is_dir():
+                    target.mkdir(parents=True, exist_ok=True)
+                    continue
+                target.parent.mkdir(parents=True, exist_ok=True)
+                digest = manifest.get(info.filename)
+                if digest is not None and previous_digests.get(info.filename) == digest.hex():
+                    try:
+                        os.link(safe_member_path(previous / STANDBY_FILES, info.filename), target)
+                        counts["linked"] += 1
+                        continue
+                    except OSError:
+                        pass
+                live = game_root / info.filename
+                try:
+                    same = (digest is not None and live.is_file() and live.stat().st_size == info.file_size
+                            and fingerprints.fingerprint(live) == digest)
+                except OSError:
+                    same = False
+                if same:
+                    counts["cloned" if clone_file(live, target) else "copied"] += 1
+                    continue
+                with zipf.open(info, "r") as src, open(target, "wb") as dst:
+                    copy_stream(src, dst, info.file_size, cancel)
+                counts["extracted"] += 1
+    marker = archive_stamp(archive)
+    marker["digests"] = {name: digest.hex() for name, digest in manifest.items()}
+    with open(staging / STANDBY_MARKER, "w", encoding="utf-8") as f:
+        json.dump(marker, f)
+    return counts
+
+
+class StandbyWorker(Job):
+    priority = PRIORITY_BACKGROUND
+
+    def __init__(self, game_name: str):
+        super().__init__()
+        self.game_name = game_name
+
+    def title(self):
+        return f"Warm standby {self.game_name}"
+
+    def run(self):
+        shutil.rmtree(legacy_standby_root(self.game_name), ignore_errors=True)
+        settings = get_standby_settings()
+        if not settings["enabled"]:
+            discard_standby(self.game_name)
+            return
+        folder = get_default_backup_path(self.game_name)
+        archive = latest_archive(folder, self.game_name) if folder else None
+        if archive is None:
+            return
+        root = standby_root(self.game_name)
+        current = root / "current"
+        marker = read_marker(current)
+        if matches(marker, archive.path):
+            return
+        (current / STANDBY_MARKER).unlink(missing_ok=True)
+        staging = root / "next"
+        shutil.rmtree(staging, ignore_errors=True)
+        try:
+            with zipfile.ZipFile(archive.path, "r") as zipf:
+                size = sum(info.file_size for info in zipf.infolist())
+            if size > settings["max_mb"] * 1024 * 1024:
+                write_log_file(f"Warm standby skipped for {self.game_name}: {size // (1024 * 1024)} MB is over the "
+                               f"{settings['max_mb']} MB limit.")
+                discard_standby(self.game_name)
+                return
+            staging.mkdir(parents=True)
+            counts = stage_archive(archive.path, get_game_folder(self.game_name), staging, current,
+                                   (marker or {}).get("digests"), lambda: self.cancel_requested)
+            old = root / "old"
+            shutil.rmtree(old, ignore_errors=True)
+            if current.exists():
+                os.replace(current, old)
+            os.replace(staging, current)
+            shutil.rmtree(old, ignore_errors=True)
+        except (StreamCancelled, OSError, zipfile.BadZipFile) as e:
+            shutil.rmtree(staging, ignore_errors=True)
+            if not isinstance(e, StreamCancelled):
+                write_log_file(f"[ERROR] Warm standby failed for {self.game_name}: {e}")
+            return
+        write_log_file(
+            f"Warm standby ready for {archive.path.name}: {counts['linked']} linked, {counts['cloned']} cloned, "
+            f"{counts['copied']} copied, {counts['extracted']} extracted."
+        )
+
+
+class StandbyService(QObject):
+    ready = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.worker = None
+        self.pending = []
+
+    def refresh(self, game: str):
+        if game not in self.pending:
+            self.pending.append(game)
+        self._next()
+
+    def stop(self):
+        self.pending.clear()
+        if self.worker:
+            self.worker.cancel_requested = True
+            self.worker.wait(5000)
+
+    def _next(self):
+        if self.worker or not self.pending:
+            return
+        self.worker = StandbyWorker(self.pending.pop(0))
+        self.worker.finished.connect(self._on_finished)
+        self.worker.start()
+
+    def _on_finished(self):
+        game = self.worker.game_name
+        self.worker.deleteLater()
+        self.worker = None
+        self.ready.emit(game)
+        self._next()
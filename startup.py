@@ -17,7 +17,7 @@ def get_exe_path() -> str:
 def enable_startup():
     exe_path_str = get_exe_path()
     with winreg.OpenKey(winreg.HKEY_CURRENT_USER, RUN_KEY, 0, winreg.KEY_SET_VALUE) as key:
-        winreg.SetValueEx(key, APP_NAME, 0, winreg.REG_SZ, f'"{exe_path_str}" --minimized')
+        winreg.SetValueEx(key, APP_NAME, 0, winreg.REG_SZ, f'"{exe_path_str}" --daemon')
 
 def disable_startup():
     try:
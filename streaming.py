@@ -0,0 +1,58 @@
+import time
+from pathlib import Path
+
+
+MIN_CHUNK = 64 * 1024
+MAX_CHUNK = 4 * 1024 * 1024
+DEFAULT_CHUNK = 1024 * 1024
+CANCEL_LATENCY_S = 0.1
+
+
+class StreamCancelled(Exception):
+    pass
+
+
+class ChunkSizer:
+    def __init__(self, target=CANCEL_LATENCY_S, size=DEFAULT_CHUNK):
+        self.target = target
+        self.size = size
+
+    def observe(self, nbytes, elapsed):
+        if nbytes < self.size:
+            return
+        if elapsed > self.target:
+            self.size = max(MIN_CHUNK, self.size // 2)
+        elif elapsed < self.target / 4:
+            self.size = min(MAX_CHUNK, self.size * 2)
+
+
+def copy_stream(src, dst, total=0, cancel=None, progress=None, sizer=None):
+    sizer = sizer or ChunkSizer()
+    done = 0
+    last_percent = -1
+    while True:
+        if cancel and cancel():
+            raise StreamCancelled()
+        started = time.monotonic()
+        block = src.read(sizer.size)
+        if not block:
+            break
+        dst.write(block)
+        sizer.observe(len(block), time.monotonic() - started)
+        done += len(block)
+        if progress and total > sizer.size:
+            percent = min(100, int(done * 100 / total))
+            if percent != last_percent:
+                last_percent = percent
+                progress(percent)
+    return done
+
+
+def safe_member_path(root: Path, filename: str) -> Path:
+    parts = []
+    for part in filename.replace("\\", "/").split("/"):
+        part = part.split(":")[-1]
+        if part in ("", ".", ".."):
+            continue
+        parts.append(part)
+    return root.joinpath(*parts) if parts else root
@@ -0,0 +1,168 @@
+import io
+import os
+import queue
+import shutil
+import threading
+import time
+from pathlib import Path
+
+
+BLOCK_SIZE = 1024 * 1024
+MAX_PENDING_BLOCKS = 32
+LAG_TIMEOUT_S = 5
+PUT_POLL_S = 0.1
+
+
+def part_path(path: Path) -> Path:
+    return path.with_name(path.name + ".part")
+
+
+class TargetWriter(threading.Thread):
+    def __init__(self, path):
+        super().__init__(daemon=True)
+        self.path = Path(path)
+        self.part = part_path(self.path)
+        self.blocks = queue.Queue(MAX_PENDING_BLOCKS)
+        self.error = None
+        self.detached = False
+
+    @property
+    def active(self):
+        return self.error is None and not self.detached
+
+    def run(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.part, "wb", buffering=0) as f:
+                while True:
+                    block = self.blocks.get()
+                    if block is None or self.detached:
+                        break
+                    if isinstance(block, threading.Event):
+                        os.fsync(f.fileno())
+                        block.set()
+                        continue
+                    f.write(block)
+                if not self.detached:
+                    os.fsync(f.fileno())
+        except OSError as e:
+            self.error = e
+        if not self.active:
+            self.discard()
+
+    def discard(self):
+        try:
+            self.part.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+
+class TeeWriter(io.RawIOBase):
+    def __init__(self, paths):
+        super().__init__()
+        self.targets = [TargetWriter(p) for p in paths]
+        self.buffer = bytearray()
+        self.position = 0
+        for target in self.targets:
+            target.start()
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def tell(self):
+        return self.position
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        if len(self.buffer) >= BLOCK_SIZE:
+            self._dispatch()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _dispatch(self):
+        block = bytes(self.buffer)
+        self.buffer.clear()
+        self._send(block)
+
+    def _send(self, block):
+        for target in self.targets:
+            if target.active:
+                self._send_to(target, block)
+        self._check_targets()
+
+    def _send_to(self, target, block):
+        deadline = time.monotonic() + LAG_TIMEOUT_S
+        while target.active and target.is_alive():
+            try:
+                target.blocks.put(block, timeout=PUT_POLL_S)
+                return
+            except queue.Full:
+                if time.monotonic() > deadline and any(t.active for t in self.targets if t is not target):
+                    target.detached = True
+
+    def _check_targets(self):
+        if any(t.active for t in self.targets):
+            return
+        errors = [t.error for t in self.targets if t.error is not None]
+        if errors:
+            raise errors[0]
+        raise OSError("All backup targets failed")
+
+    def checkpoint(self):
+        if self.buffer:
+            self._dispatch()
+        synced = {}
+        for target in self.targets:
+            if target.active:
+                synced[target] = threading.Event()
+                self._send_to(target, synced[target])
+        deadline = time.monotonic() + LAG_TIMEOUT_S
+        for target, event in synced.items():
+            while target.active and target.is_alive() and not event.wait(0.1):
+                if time.monotonic() > deadline and any(t.active for t in self.targets if t is not target):
+                    target.detached = True
+        self._check_targets()
+        return [t.path for t, event in synced.items() if t.active and event.is_set()]
+
+    def finish(self):
+        if self.buffer:
+            self._dispatch()
+        self._send(None)
+        written, lagging, failed = [], [], {}
+        for target in self.targets:
+            if target.active:
+                target.join()
+            if target.active:
+                os.replace(target.part, target.path)
+                written.append(target.path)
+            elif target.error is not None:
+                failed[target.path] = str(target.error)
+            else:
+                lagging.append(target.path)
+        return written, lagging, failed
+
+    def abort(self):
+        for target in self.targets:
+            target.detached = True
+            try:
+                target.blocks.put_nowait(None)
+            except queue.Full:
+                pass
+
+
+def catch_up(source: Path, dest: Path):
+    dest = Path(dest)
+    part = dest.with_name(dest.name + ".copy")
+    try:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(source, part)
+        os.replace(part, dest)
+    except OSError:
+        part.unlink(missing_ok=True)
+        raise
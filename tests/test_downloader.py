@@ -0,0 +1,154 @@
+import json
+import hashlib
+import os
+import re
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from downloader import ChecksumMismatch, SegmentedDownload, plan_segments
+
+PAYLOAD = os.urandom(9 * 1024 * 1024)
+PAYLOAD_SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+def file_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _headers(self, status, length, extra=()):
+            self.send_response(status)
+            self.send_header("Content-Length", str(length))
+            self.send_header("ETag", '"v1"')
+            if state["ranges"]:
+                self.send_header("Accept-Ranges", "bytes")
+            for name, value in extra:
+                self.send_header(name, value)
+            self.end_headers()
+
+        def do_HEAD(self):
+            self._headers(200, len(PAYLOAD))
+
+        def do_GET(self):
+            header = self.headers.get("Range")
+            state["requests"].append(header)
+            match = re.fullmatch(r"bytes=(\d+)-(\d+)", header or "")
+            if not state["ranges"] or not match:
+                self._headers(200, len(PAYLOAD))
+                self.wfile.write(PAYLOAD)
+                return
+            start, end = int(match.group(1)), int(match.group(2))
+            if start in state["fail_at"]:
+                self._headers(500, 0)
+                return
+            self._headers(206, end - start + 1, [("Content-Range", f"bytes {start}-{end}/{len(PAYLOAD)}")])
+            self.wfile.write(PAYLOAD[start:end + 1])
+
+    return Handler
+
+
+@pytest.fixture
+def server(http_server):
+    state = {"ranges": True, "fail_at": set(), "requests": []}
+    return state, http_server(file_handler(state)) + "/installer.exe"
+
+
+def test_plan_segments_covers_file():
+    segments = plan_segments(len(PAYLOAD))
+    assert segments[0]["start"] == 0
+    assert segments[-1]["end"] == len(PAYLOAD) - 1
+    for a, b in zip(segments, segments[1:]):
+        assert b["start"] == a["end"] + 1
+    assert plan_segments(100) == [{"start": 0, "end": 99, "done": 0}]
+
+
+def test_ranged_download(server, tmp_path):
+    state, url = server
+    dest = tmp_path / "installer.exe"
+    SegmentedDownload(url, dest, PAYLOAD_SHA256).run()
+
+    assert dest.read_bytes() == PAYLOAD
+    assert len(state["requests"]) == 2
+    assert not (tmp_path / "installer.exe.part").exists()
+    assert not (tmp_path / "installer.exe.part.json").exists()
+
+
+def test_resume_requests_only_missing_bytes(server, tmp_path):
+    state, url = server
+    dest = tmp_path / "installer.exe"
+    segments = plan_segments(len(PAYLOAD))
+    segments[0]["done"] = segments[0]["end"] + 1
+    segments[1]["done"] = 1000
+    part = bytearray(len(PAYLOAD))
+    part[:segments[1]["start"] + 1000] = PAYLOAD[:segments[1]["start"] + 1000]
+    (tmp_path / "installer.exe.part").write_bytes(part)
+    (tmp_path / "installer.exe.part.json").write_text(json.dumps(
+        {"url": url, "size": len(PAYLOAD), "validator": '"v1"', "segments": segments}))
+
+    SegmentedDownload(url, dest, PAYLOAD_SHA256).run()
+
+    assert dest.read_bytes() == PAYLOAD
+    assert state["requests"] == [f"bytes={segments[1]['start'] + 1000}-{segments[1]['end']}"]
+
+
+def test_stale_state_restarts_download(server, tmp_path):
+    state, url = server
+    dest = tmp_path / "installer.exe"
+    (tmp_path / "installer.exe.part").write_bytes(b"\0" * len(PAYLOAD))
+    (tmp_path / "installer.exe.part.json").write_text(json.dumps(
+        {"url": url, "size": len(PAYLOAD), "validator": '"old"',
+         "segments": [{"start": 0, "end": len(PAYLOAD) - 1, "done": len(PAYLOAD)}]}))
+
+    SegmentedDownload(url, dest, PAYLOAD_SHA256).run()
+
+    assert dest.read_bytes() == PAYLOAD
+    assert len(state["requests"]) == 2
+
+
+def test_segment_failure_raises_real_error_and_keeps_progress(server, tmp_path):
+    state, url = server
+    dest = tmp_path / "installer.exe"
+    segments = plan_segments(len(PAYLOAD))
+    state["fail_at"].add(segments[1]["start"])
+
+    with pytest.raises(requests.HTTPError, match="500"):
+        SegmentedDownload(url, dest, PAYLOAD_SHA256).run()
+
+    assert not dest.exists()
+    saved = json.loads((tmp_path / "installer.exe.part.json").read_text())
+    assert saved["segments"][1]["done"] == 0
+
+    state["fail_at"].clear()
+    state["requests"].clear()
+    SegmentedDownload(url, dest, PAYLOAD_SHA256).run()
+    assert dest.read_bytes() == PAYLOAD
+    assert f"bytes={segments[1]['start']}-{segments[1]['end']}" in state["requests"]
+
+
+def test_checksum_mismatch_discards_partial(server, tmp_path):
+    state, url = server
+    dest = tmp_path / "installer.exe"
+
+    with pytest.raises(ChecksumMismatch):
+        SegmentedDownload(url, dest, "0" * 64).run()
+
+    assert not dest.exists()
+    assert not (tmp_path / "installer.exe.part").exists()
+    assert not (tmp_path / "installer.exe.part.json").exists()
+
+
+def test_server_without_ranges_downloads_in_one_request(server, tmp_path):
+    state, url = server
+    state["ranges"] = False
+    dest = tmp_path / "installer.exe"
+    progress = []
+
+    SegmentedDownload(url, dest, PAYLOAD_SHA256, progress=lambda done, total: progress.append((done, total))).run()
+
+    assert dest.read_bytes() == PAYLOAD
+    assert state["requests"] == [None]
+    assert progress[-1] == (len(PAYLOAD), len(PAYLOAD))
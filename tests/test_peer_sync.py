@@ -0,0 +1,183 @@
+import os
+import socket
+import struct
+import threading
+import zlib
+
+import pytest
+
+from peer_sync import (
+    COPY, HELLO, LITERAL, LITERAL_FLUSH, MAX_FRAME, MIN_BLOCK, PREAUTH_MAX_FRAME, Channel, PeerServer,
+    PeerSyncError, apply_delta, block_size_for, compute_delta, file_signatures, pull_from_peer,
+)
+
+SECRET = "correct horse battery staple"
+
+
+def delta_roundtrip(basis, target, dest):
+    block_size = block_size_for(basis.stat().st_size) if basis else MIN_BLOCK
+    signatures = file_signatures(basis, block_size) if basis else b""
+    frames = []
+    left, right = socket.socketpair()
+    with left, right:
+        def serve():
+            sender = Channel(left)
+            sender.max_frame = MAX_FRAME
+            digest, size = compute_delta(target, block_size, signatures,
+                                         lambda kind, payload: (frames.append((kind, len(payload))),
+                                                                sender.send(kind, payload)))
+            sender.send_json(b"E", {"digest": digest.hex(), "size": size, "mtime": target.stat().st_mtime})
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        receiver = Channel(right)
+        receiver.max_frame = MAX_FRAME
+        apply_delta(receiver, basis, block_size, dest)
+        thread.join()
+    return frames
+
+
+def literal_bytes(frames):
+    return sum(size for kind, size in frames if kind == LITERAL)
+
+
+@pytest.mark.parametrize("edit", ["identical", "insert", "delete", "append", "replace"])
+def test_delta_reconstructs_target(tmp_path, edit):
+    original = os.urandom(600 * 1024)
+    changed = {
+        "identical": original,
+        "insert": original[:300000] + b"new save data" + original[300000:],
+        "delete": original[:100000] + original[150000:],
+        "append": original + os.urandom(5000),
+        "replace": original[:200000] + os.urandom(20000) + original[220000:],
+    }[edit]
+    basis = tmp_path / "basis.zip"
+    target = tmp_path / "target.zip"
+    basis.write_bytes(original)
+    target.write_bytes(changed)
+
+    frames = delta_roundtrip(basis, target, tmp_path / "out.zip")
+
+    assert (tmp_path / "out.zip").read_bytes() == changed
+    assert any(kind == COPY for kind, _ in frames)
+    assert literal_bytes(frames) <= 64 * 1024
+
+
+def test_delta_without_basis_sends_literals(tmp_path):
+    target = tmp_path / "target.zip"
+    target.write_bytes(os.urandom(100000))
+
+    frames = delta_roundtrip(None, target, tmp_path / "out.zip")
+
+    assert (tmp_path / "out.zip").read_bytes() == target.read_bytes()
+    assert literal_bytes(frames) == 100000
+
+
+def test_literal_frames_stay_bounded(tmp_path):
+    target = tmp_path / "target.zip"
+    target.write_bytes(os.urandom(3 * LITERAL_FLUSH + 123))
+
+    frames = delta_roundtrip(None, target, tmp_path / "out.zip")
+
+    assert (tmp_path / "out.zip").read_bytes() == target.read_bytes()
+    assert max(size for _, size in frames) <= LITERAL_FLUSH
+
+
+def test_empty_file_roundtrip(tmp_path):
+    basis = tmp_path / "basis.zip"
+    target = tmp_path / "target.zip"
+    basis.write_bytes(os.urandom(10000))
+    target.write_bytes(b"")
+
+    delta_roundtrip(basis, target, tmp_path / "out.zip")
+
+    assert (tmp_path / "out.zip").read_bytes() == b""
+
+
+@pytest.fixture
+def peer(tmp_path):
+    folders = {"sims_4": tmp_path / "server" / "sims_4"}
+    folders["sims_4"].mkdir(parents=True)
+    server = PeerServer(0, SECRET, lambda: folders, host="127.0.0.1")
+    server.start()
+    yield folders, server.server_address[1]
+    server.stop()
+
+
+def test_pull_fetches_missing_archives_as_deltas(peer, tmp_path):
+    server_folders, port = peer
+    local = tmp_path / "client" / "sims_4"
+    local.mkdir(parents=True)
+    old = os.urandom(400 * 1024)
+    new = old[:200000] + os.urandom(3000) + old[200000:]
+    (server_folders["sims_4"] / "sims_4_backup_20240101_120000.zip").write_bytes(old)
+    (server_folders["sims_4"] / "sims_4_backup_20240102_120000.zip").write_bytes(new)
+    (server_folders["sims_4"] / "sims_3_backup_20240102_120000.zip").write_bytes(b"other game")
+    (local / "sims_4_backup_20240101_120000.zip").write_bytes(old)
+    messages = []
+
+    received = pull_from_peer("127.0.0.1", port, SECRET, {"sims_4": local}, max_backups=10, log=messages.append)
+
+    assert received == 1
+    pulled = local / "sims_4_backup_20240102_120000.zip"
+    assert pulled.read_bytes() == new
+    assert pulled.stat().st_mtime == pytest.approx(
+        (server_folders["sims_4"] / pulled.name).stat().st_mtime, abs=1e-3)
+    assert messages == [f"[Peer Sync] Received {pulled.name} from 127.0.0.1 "
+                        "(delta against sims_4_backup_20240101_120000.zip)"]
+    assert sorted(p.name for p in local.iterdir()) == [
+        "sims_4_backup_20240101_120000.zip", "sims_4_backup_20240102_120000.zip"]
+
+    assert pull_from_peer("127.0.0.1", port, SECRET, {"sims_4": local}, max_backups=10, log=messages.append) == 0
+
+
+def test_pull_into_empty_folder_sends_full_archives(peer, tmp_path):
+    server_folders, port = peer
+    local = tmp_path / "client" / "sims_4"
+    local.mkdir(parents=True)
+    for day in (1, 2, 3):
+        (server_folders["sims_4"] / f"sims_4_backup_2024010{day}_120000.zip").write_bytes(os.urandom(50000))
+
+    assert pull_from_peer("127.0.0.1", port, SECRET, {"sims_4": local}, max_backups=10, log=lambda m: None) == 3
+    for path in server_folders["sims_4"].iterdir():
+        assert (local / path.name).read_bytes() == path.read_bytes()
+
+
+def test_pull_with_wrong_secret_fails(peer, tmp_path):
+    server_folders, port = peer
+    (server_folders["sims_4"] / "sims_4_backup_20240101_120000.zip").write_bytes(b"data")
+    local = tmp_path / "client" / "sims_4"
+    local.mkdir(parents=True)
+
+    with pytest.raises(PeerSyncError, match="Authentication failed"):
+        pull_from_peer("127.0.0.1", port, "wrong", {"sims_4": local}, max_backups=10, log=lambda m: None)
+    assert list(local.iterdir()) == []
+
+
+def test_oversized_frame_is_rejected_before_reading_it():
+    left, right = socket.socketpair()
+    with left, right:
+        left.sendall(zlib.compress(struct.pack(">cI", HELLO, 1 << 31)))
+        with pytest.raises(PeerSyncError, match="over the"):
+            Channel(right).recv()
+
+
+def test_decompression_is_bounded():
+    left, right = socket.socketpair()
+    with left, right:
+        compressor = zlib.compressobj(9)
+        bomb = compressor.compress(struct.pack(">cI", HELLO, 64) + b"{}".ljust(64) + b"\0" * (64 << 20))
+        left.sendall(bomb + compressor.flush(zlib.Z_SYNC_FLUSH))
+        channel = Channel(right)
+        assert channel.recv() == (HELLO, b"{}".ljust(64))
+        assert len(channel.buffer) <= PREAUTH_MAX_FRAME + 256 * 1024
+
+
+def test_server_drops_unauthenticated_oversized_hello(peer):
+    _, port = peer
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        channel = Channel(sock)
+        channel.recv()
+        channel.send(HELLO, b"x" * (PREAUTH_MAX_FRAME + 1))
+        with pytest.raises((PeerSyncError, OSError)):
+            channel.recv()
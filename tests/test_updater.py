@@ -0,0 +1,98 @@
+import json
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from updater import ReleaseService, is_newer_version
+
+
+@pytest.mark.parametrize("latest, installed, expected", [
+    ("2.1.0", "2.0.9", True),
+    ("2.10.0", "2.9.0", True),
+    ("2.0.0", "2.0.0", False),
+    ("2.0.0", "2.0.1", False),
+    ("2.0.0", "2.0.0rc1", True),
+    ("2.0.0rc1", "1.9.9", True),
+    ("1.0.0", "0.0.0", True),
+])
+def test_is_newer_version(latest, installed, expected):
+    assert is_newer_version(latest, installed) is expected
+
+
+def test_is_newer_version_falls_back_to_string_compare():
+    assert is_newer_version("beta-2", "beta-1")
+    assert not is_newer_version("beta-1", "beta-1")
+
+
+def release_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            state["requests"].append(dict(self.headers))
+            if state.get("status"):
+                self.send_response(state["status"])
+                self.end_headers()
+                return
+            if self.headers.get("If-None-Match") == state["etag"]:
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = json.dumps({"tag_name": state["tag"], "assets": []}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("ETag", state["etag"])
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+@pytest.fixture
+def release_api(http_server):
+    state = {"tag": "v2.1.0", "etag": '"r1"', "requests": []}
+    return state, http_server(release_handler(state)) + "/releases/latest"
+
+
+def test_latest_strips_tag_prefix_and_caches(release_api, tmp_path):
+    state, url = release_api
+    service = ReleaseService(url, tmp_path / "cache.json", ttl=3600)
+
+    version, data = service.latest()
+    assert version == "2.1.0"
+    assert data["tag_name"] == "v2.1.0"
+
+    assert service.latest()[0] == "2.1.0"
+    assert len(state["requests"]) == 1
+
+
+def test_forced_refresh_revalidates_with_etag(release_api, tmp_path):
+    state, url = release_api
+    service = ReleaseService(url, tmp_path / "cache.json", ttl=3600)
+    service.latest()
+
+    assert service.latest(force=True)[0] == "2.1.0"
+    assert state["requests"][-1].get("If-None-Match") == '"r1"'
+
+    state["tag"], state["etag"] = "v2.2.0", '"r2"'
+    assert service.latest(force=True)[0] == "2.2.0"
+    assert len(state["requests"]) == 3
+
+
+def test_expired_cache_survives_server_errors(release_api, tmp_path):
+    state, url = release_api
+    service = ReleaseService(url, tmp_path / "cache.json", ttl=0)
+    service.latest()
+
+    state["status"] = 503
+    assert service.latest()[0] == "2.1.0"
+    assert len(state["requests"]) == 2
+
+
+def test_no_cache_and_no_server_returns_nothing(release_api, tmp_path):
+    state, url = release_api
+    state["status"] = 500
+    service = ReleaseService(url, tmp_path / "cache.json")
+    assert service.latest() == (None, None)
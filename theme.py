@@ -1,4 +1,4 @@
-from config_utils import get_config, CONFIG_PATH
+from config_utils import get_config, set_config_value
 from PySide6.QtWidgets import QComboBox
 
 class Theme:
@@ -16,12 +16,7 @@ class Theme:
         return config.get("Settings", "theme", fallback="dark")
 
     def save_theme(self):
-        config = get_config()
-        if "Settings" not in config:
-            config["Settings"] = {}
-        config["Settings"]["theme"] = self.mode
-        with open(CONFIG_PATH, "w") as f:
-            config.write(f)
+        set_config_value("Settings", "theme", self.mode)
 
     def update(self):
         if self.mode == "dark":
@@ -1,72 +1,170 @@
 import sys
 import os
+import json
+import time
 import tempfile
 import requests
 import threading
+from concurrent.futures import Future
 from packaging.version import Version, InvalidVersion
 from PySide6.QtCore import QThread, Signal
-from PySide6.QtWidgets import QMessageBox, QProgressDialog, QApplication
+from PySide6.QtWidgets import QMessageBox, QProgressDialog
 
 from config_utils import (
     set_last_installed_version,
     set_update_available,
     get_last_installed_version
 )
+from paths import APPDATA_DIR
+from version import __version__
+from downloader import SegmentedDownload, DownloadCancelled
+from jobs import get_executor, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
 
 GITHUB_USER = "J0ttenmiller"
 GITHUB_REPO = "Sims-Backup-Utility"
 INSTALLER_FILENAME = "SimsBackupUtilityInstaller.exe"
+RELEASE_API_URL = f"https://api.github.com/repos/{GITHUB_USER}/{GITHUB_REPO}/releases/latest"
+RELEASE_CACHE_PATH = APPDATA_DIR / "release_cache.json"
+RELEASE_CACHE_TTL = 6 * 60 * 60
 
 _running_threads = []
 
 
-def get_latest_github_release():
+class ReleaseService:
+    def __init__(self, api_url=RELEASE_API_URL, cache_path=RELEASE_CACHE_PATH,
+                 ttl=RELEASE_CACHE_TTL, session=None):
+        self.api_url = api_url
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.session = session or requests.Session()
+        self.session.headers.update({
+            "Accept": "application/vnd.github+json",
+            "User-Agent": f"SimsBackupUtility/{__version__}",
+        })
+        self._lock = threading.Lock()
+        self._inflight = None
+
+    def latest(self, force=False):
+        with self._lock:
+            future = self._inflight
+            owner = future is None
+            if owner:
+                future = self._inflight = Future()
+        if not owner:
+            return future.result()
+        try:
+            result = self._fetch(force)
+        except Exception:
+            result = (None, None)
+        with self._lock:
+            self._inflight = None
+        future.set_result(result)
+        return result
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_cache(self, cache):
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.cache_path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(cache, f)
+            os.replace(tmp, self.cache_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _result(data):
+        return data.get("tag_name", "").lstrip("v"), data
+
+    def _fetch(self, force):
+        cache = self._load_cache()
+        if cache and not force and time.time() - cache.get("fetched_at", 0) < self.ttl:
+            return self._result(cache["data"])
+
+        headers = {}
+        if cache:
+            if cache.get("etag"):
+                headers["If-None-Match"] = cache["etag"]
+            if cache.get("last_modified"):
+                headers["If-Modified-Since"] = cache["last_modified"]
+
+        try:
+            r = self.session.get(self.api_url, headers=headers, timeout=5)
+            if r.status_code == 304 and cache:
+                cache["fetched_at"] = time.time()
+                self._save_cache(cache)
+                return self._result(cache["data"])
+            r.raise_for_status()
+            data = r.json()
+        except (requests.RequestException, ValueError):
+            if cache:
+                return self._result(cache["data"])
+            return None, None
+
+        self._save_cache({
+            "fetched_at": time.time(),
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+            "data": data,
+        })
+        return self._result(data)
+
+
+_release_service = None
+_release_service_lock = threading.Lock()
+
+
+def get_release_service():
+    global _release_service
+    with _release_service_lock:
+        if _release_service is None:
+            _release_service = ReleaseService()
+        return _release_service
+
+
+def get_latest_github_release(force=False):
+    return get_release_service().latest(force=force)
+
+
+def is_newer_version(latest, installed):
     try:
-        api_url = f"https://api.github.com/repos/{GITHUB_USER}/{GITHUB_REPO}/releases/latest"
-        r = requests.get(api_url, timeout=5)
-        r.raise_for_status()
-        return r.json().get("tag_name", "").lstrip("v"), r.json()
-    except Exception:
-        return None, None
+        return Version(latest) > Version(installed)
+    except InvalidVersion:
+        return latest > installed
 
 
 def check_updates(callback=None, silent=False, parent=None):
-    def worker():
-        latest_version, data = get_latest_github_release()
+    def work():
+        latest_version, data = get_latest_github_release(force=not silent)
         installed_version = get_last_installed_version() or "0.0.0"
 
-        update_available = False
-        if latest_version:
-            try:
-                latest_v = Version(latest_version)
-                installed_v = Version(installed_version)
-            except InvalidVersion:
-                latest_v = latest_version
-                installed_v = installed_version
-
-            update_available = latest_v > installed_v
-
+        update_available = bool(latest_version) and is_newer_version(latest_version, installed_version)
         set_update_available(update_available)
+        return latest_version, installed_version, update_available, data
 
+    def on_done(future):
+        if future.exception() is not None:
+            return
+        latest_version, installed_version, update_available, data = future.result()
         if callback:
             callback(latest_version, installed_version, update_available)
-
         if update_available and not silent and parent:
             install_update(parent, latest_version, data)
 
-    threading.Thread(target=worker, daemon=True).start()
+    future = get_executor().submit("Update check", work, priority=PRIORITY_BACKGROUND if silent else PRIORITY_INTERACTIVE)
+    future.add_done_callback(on_done)
+    return future
 
 
 def install_update(parent, latest_version, release_data=None):
     current_version = get_last_installed_version() or "0.0.0"
-    try:
-        latest_v = Version(latest_version)
-        current_v = Version(current_version)
-    except InvalidVersion:
-        latest_v = latest_version
-        current_v = current_version
-
-    if latest_v <= current_v:
+    if not is_newer_version(latest_version, current_version):
         QMessageBox.information(parent, "No Updates", "You already have the latest version.")
         set_update_available(False)
         if hasattr(parent, "hide_settings_red_dot"):
@@ -83,56 +181,106 @@ def install_update(parent, latest_version, release_data=None):
     if reply != QMessageBox.Yes:
         return
 
-    asset_url = None
-    if release_data:
-        for asset in release_data.get("assets", []):
-            if asset.get("name") == INSTALLER_FILENAME:
-                asset_url = asset.get("browser_download_url")
-                break
+    asset_url, expected_sha256 = find_installer_asset(release_data)
     if not asset_url:
         QMessageBox.warning(parent, "Error", "Installer not found in latest GitHub release.")
         return
+    if not expected_sha256:
+        QMessageBox.warning(parent, "Error", "The latest release does not publish a SHA-256 checksum for the installer.")
+        return
 
-    temp_dir = tempfile.gettempdir()
-    installer_path = os.path.join(temp_dir, INSTALLER_FILENAME)
+    installer_path = os.path.join(tempfile.gettempdir(), INSTALLER_FILENAME)
 
     progress = QProgressDialog("Downloading update...", "Cancel", 0, 100, parent)
     progress.setWindowTitle("Downloading Update")
     progress.setWindowModality(progress.WindowModal)
-    progress.show()
 
-    try:
-        with requests.get(asset_url, stream=True) as download:
-            download.raise_for_status()
-            total = int(download.headers.get("content-length", 0))
-            downloaded = 0
-            with open(installer_path, "wb") as f:
-                for chunk in download.iter_content(chunk_size=8192):
-                    if not chunk:
-                        continue
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if total > 0:
-                        progress.setValue(int(downloaded * 100 / total))
-                        QApplication.processEvents()
-                    if progress.wasCanceled():
-                        progress.close()
-                        return
+    worker = DownloadWorker(asset_url, installer_path, expected_sha256)
+    _running_threads.append(worker)
+    worker.progress_signal.connect(progress.setValue)
+    progress.canceled.connect(worker.cancel)
+
+    def on_done(path):
         progress.setValue(100)
         progress.close()
-    except Exception as e:
+        set_update_available(False)
+        if hasattr(parent, "hide_settings_red_dot"):
+            parent.hide_settings_red_dot()
+        os.startfile(path)
+        if parent:
+            parent.close()
+        sys.exit()
+
+    def on_error(message):
         progress.close()
-        QMessageBox.warning(parent, "Download Error", str(e))
-        return
+        QMessageBox.warning(parent, "Download Error", message)
+
+    worker.done_signal.connect(on_done)
+    worker.error_signal.connect(on_error)
+    worker.cancelled_signal.connect(progress.close)
+    worker.finished.connect(lambda: _running_threads.remove(worker))
+    worker.start()
+    progress.show()
+
+
+def find_installer_asset(release_data):
+    if not release_data:
+        return None, None
+    assets = release_data.get("assets", [])
+    asset_url = expected_sha256 = None
+    for asset in assets:
+        if asset.get("name") == INSTALLER_FILENAME:
+            asset_url = asset.get("browser_download_url")
+            digest = asset.get("digest") or ""
+            if digest.startswith("sha256:"):
+                expected_sha256 = digest.split(":", 1)[1]
+            break
+    if asset_url and not expected_sha256:
+        for asset in assets:
+            if asset.get("name") == INSTALLER_FILENAME + ".sha256":
+                try:
+                    r = get_release_service().session.get(asset.get("browser_download_url"), timeout=10)
+                    r.raise_for_status()
+                    expected_sha256 = r.text.split()[0]
+                except (requests.RequestException, IndexError):
+                    pass
+                break
+    return asset_url, expected_sha256
+
+
+class DownloadWorker(QThread):
+    progress_signal = Signal(int)
+    done_signal = Signal(str)
+    error_signal = Signal(str)
+    cancelled_signal = Signal()
+
+    def __init__(self, url, dest, expected_sha256=None):
+        super().__init__()
+        self.download = SegmentedDownload(
+            url, dest, expected_sha256,
+            session=get_release_service().session,
+            progress=self._on_progress
+        )
+        self._last_percent = -1
+
+    def _on_progress(self, done, total):
+        if total > 0:
+            percent = int(done * 100 / total)
+            if percent != self._last_percent:
+                self._last_percent = percent
+                self.progress_signal.emit(percent)
 
-    set_update_available(False)
-    if hasattr(parent, "hide_settings_red_dot"):
-        parent.hide_settings_red_dot()
+    def cancel(self):
+        self.download.cancel()
 
-    os.startfile(installer_path)
-    if parent:
-        parent.close()
-    sys.exit()
+    def run(self):
+        try:
+            path = self.download.run()
+            self.done_signal.emit(str(path))
+        except DownloadCancelled:
+            self.cancelled_signal.emit()
+        except Exception as e:
+            self.error_signal.emit(str(e))
 
 
 def sync_stored_version_on_startup(current_app_version: str):
@@ -0,0 +1,338 @@
+import os
+import sys
+import json
+import time
+import select
+import struct
+import ctypes
+import hashlib
+import threading
+from PySide6.QtCore import QObject, QThread, QTimer, Signal
+
+from paths import APPDATA_DIR
+from config_utils import GAMES, get_quiet_backup_seconds, get_cc_backup_enabled, write_log_file
+from discovery import find_game_folder
+from backup import INCLUDE_MAP
+from cc_store import MODS_DIRNAME
+from jobs import get_executor, PRIORITY_BACKGROUND
+
+
+JOURNAL_PATH = APPDATA_DIR / "change_journal.json"
+POLL_INTERVAL_S = 60
+RESCAN_INTERVAL_MS = 60 * 1000
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_MASK_ADD = 0x20000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def watched_dirs(game_name):
+    root = find_game_folder(game_name)
+    subs = INCLUDE_MAP.get(game_name.strip().lower(), [])
+    dirs = [root / sub for sub in subs if (root / sub).is_dir()]
+    if dirs and game_name.strip().lower() == "sims 4" and get_cc_backup_enabled() and (root / MODS_DIRNAME).is_dir():
+        dirs.append(root / MODS_DIRNAME)
+    return dirs or ([root] if root.is_dir() else [])
+
+
+def tree_signature(dirs):
+    h = hashlib.blake2b(digest_size=16)
+    for base in dirs:
+        for dirpath, dirnames, filenames in os.walk(base):
+            dirnames.sort()
+            for name in sorted(filenames):
+                p = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                h.update(f"{p}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8", "surrogatepass"))
+    return h.hexdigest()
+
+
+class ChangeJournal:
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.generation = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.games = json.load(f)
+        except (OSError, ValueError):
+            self.games = {}
+
+    def _entry(self, game_name):
+        return self.games.setdefault(game_name, {"dirty": True, "signature": None})
+
+    def _save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.games, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def verify_on_start(self, game_name, signature):
+        with self._lock:
+            entry = self._entry(game_name)
+            if entry["signature"] != signature:
+                entry["dirty"] = True
+                self._save()
+
+    def mark_dirty(self, game_name):
+        with self._lock:
+            entry = self._entry(game_name)
+            was_dirty = entry["dirty"]
+            entry["dirty"] = True
+            self.generation[game_name] = self.generation.get(game_name, 0) + 1
+            if not was_dirty:
+                self._save()
+
+    def begin_backup(self, game_name):
+        with self._lock:
+            return self.generation.get(game_name, 0)
+
+    def mark_clean(self, game_name, generation, signature):
+        with self._lock:
+            if self.generation.get(game_name, 0) != generation:
+                return False
+            self.games[game_name] = {"dirty": False, "signature": signature}
+            self._save()
+            return True
+
+    def is_dirty(self, game_name):
+        with self._lock:
+            return self._entry(game_name)["dirty"]
+
+    def flush(self):
+        with self._lock:
+            self._save()
+
+
+class InotifyThread(QThread):
+    changed = Signal(str)
+    layout_changed = Signal()
+
+    def __init__(self, dirs_by_game, journal, parent=None):
+        super().__init__(parent)
+        self.dirs_by_game = dirs_by_game
+        self.journal = journal
+        self.stop_requested = False
+        self.live = set()
+        self.roots = {}
+        self.libc = ctypes.CDLL("libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+
+    def _add_tree(self, game_name, base):
+        complete = True
+        for dirpath, _, _ in os.walk(base):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd >= 0:
+                self.watches[wd] = (game_name, dirpath)
+            else:
+                complete = False
+        return complete
+
+    def _add_root(self, game_name):
+        root = find_game_folder(game_name)
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(str(root)),
+                                           IN_CREATE | IN_MOVED_TO | IN_MASK_ADD)
+        if wd >= 0:
+            self.roots[wd] = game_name
+
+    def run(self):
+        for game_name, dirs in self.dirs_by_game.items():
+            complete = all([self._add_tree(game_name, d) for d in dirs])
+            self._add_root(game_name)
+            self.journal.verify_on_start(game_name, tree_signature(dirs))
+            if complete:
+                self.live.add(game_name)
+            else:
+                write_log_file(f"[ERROR] Could not watch every save folder of {game_name}, "
+                               "scheduled backups will not be skipped.")
+        try:
+            while not self.stop_requested:
+                ready, _, _ = select.select([self.fd], [], [], 1.0)
+                if not ready:
+                    continue
+                try:
+                    data = os.read(self.fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                self._dispatch(data)
+        finally:
+            os.close(self.fd)
+
+    def _dispatch(self, data):
+        changes = set()
+        layout = False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                changes.update(self.dirs_by_game)
+                continue
+            if wd in self.roots and mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                layout = True
+            if wd not in self.watches:
+                continue
+            game_name, dirpath = self.watches[wd]
+            if mask & IN_DELETE_SELF:
+                del self.watches[wd]
+                if dirpath in map(str, self.dirs_by_game.get(game_name, [])):
+                    self.live.discard(game_name)
+                    layout = True
+                continue
+            path = os.path.join(dirpath, os.fsdecode(name)) if name else dirpath
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and not self._add_tree(game_name, path):
+                self.live.discard(game_name)
+            changes.add(game_name)
+        for game_name in changes:
+            self.changed.emit(game_name)
+        if layout:
+            self.layout_changed.emit()
+
+
+class PollingThread(QThread):
+    changed = Signal(str)
+
+    def __init__(self, dirs_by_game, journal, interval=POLL_INTERVAL_S, parent=None):
+        super().__init__(parent)
+        self.dirs_by_game = dirs_by_game
+        self.journal = journal
+        self.interval = interval
+        self.stop_requested = False
+        self.live = set()
+
+    @staticmethod
+    def _snapshot(dirs):
+        snap = {}
+        for base in dirs:
+            for dirpath, _, filenames in os.walk(base):
+                for name in filenames:
+                    p = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(p)
+                    except OSError:
+                        continue
+                    snap[p] = (st.st_size, st.st_mtime_ns)
+        return snap
+
+    def run(self):
+        self.setPriority(QThread.LowPriority)
+        snapshots = {}
+        for game_name, dirs in self.dirs_by_game.items():
+            snapshots[game_name] = self._snapshot(dirs)
+            self.journal.verify_on_start(game_name, tree_signature(dirs))
+            self.live.add(game_name)
+        while not self.stop_requested:
+            deadline = time.monotonic() + self.interval
+            while time.monotonic() < deadline and not self.stop_requested:
+                time.sleep(0.5)
+            if self.stop_requested:
+                break
+            for game_name, dirs in self.dirs_by_game.items():
+                new = self._snapshot(dirs)
+                old = snapshots[game_name]
+                snapshots[game_name] = new
+                if new != old:
+                    self.changed.emit(game_name)
+
+
+class WatcherService(QObject):
+    game_changed = Signal(str)
+    game_quiet = Signal(str)
+
+    def __init__(self, journal=None, parent=None):
+        super().__init__(parent)
+        self.journal = journal or ChangeJournal()
+        self.thread = None
+        self.games = GAMES
+        self.dirs_by_game = {}
+        self.quiet_timers = {}
+        self.rescan_timer = QTimer(self)
+        self.rescan_timer.timeout.connect(self.refresh)
+
+    def start(self, games=None):
+        self.games = games or GAMES
+        self.rescan_timer.start(RESCAN_INTERVAL_MS)
+        self.refresh()
+
+    def refresh(self):
+        dirs_by_game = {}
+        for g in self.games:
+            dirs = watched_dirs(g)
+            if dirs:
+                dirs_by_game[g] = dirs
+        if self.thread and dirs_by_game == self.dirs_by_game:
+            return
+        self._stop_thread()
+        self.dirs_by_game = dirs_by_game
+        if not dirs_by_game:
+            return
+        if sys.platform.startswith("linux"):
+            try:
+                self.thread = InotifyThread(dirs_by_game, self.journal, self)
+                self.thread.layout_changed.connect(self.refresh)
+            except OSError as e:
+                write_log_file(f"[ERROR] inotify unavailable, falling back to polling: {e}")
+        if self.thread is None:
+            self.thread = PollingThread(dirs_by_game, self.journal, parent=self)
+        self.thread.changed.connect(self._on_changed)
+        self.thread.start()
+
+    def is_watching(self, game_name):
+        return (self.thread is not None and game_name in self.thread.live
+                and self.dirs_by_game.get(game_name) == watched_dirs(game_name))
+
+    def _stop_thread(self):
+        if self.thread:
+            self.thread.stop_requested = True
+            self.thread.wait(3000)
+            self.thread = None
+
+    def stop(self):
+        self.rescan_timer.stop()
+        self._stop_thread()
+        self.dirs_by_game = {}
+        self.journal.flush()
+
+    def _on_changed(self, game_name):
+        self.journal.mark_dirty(game_name)
+        self.game_changed.emit(game_name)
+        quiet = get_quiet_backup_seconds()
+        if quiet <= 0:
+            return
+        timer = self.quiet_timers.get(game_name)
+        if timer is None:
+            timer = QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda g=game_name: self.game_quiet.emit(g))
+            self.quiet_timers[game_name] = timer
+        timer.start(quiet * 1000)
+
+    def mark_clean(self, game_name, generation):
+        def work():
+            signature = tree_signature(watched_dirs(game_name))
+            self.journal.mark_clean(game_name, generation, signature)
+        get_executor().submit("Record backed-up saves", work, priority=PRIORITY_BACKGROUND, kind="task")